@@ -0,0 +1,41 @@
+"""
+This file is part of the SpynWave package.
+
+This file contains the clock that is used for all timestamps in the measurements. The clock is
+based on the monotonic, high-resolution performance counter, which is anchored once (at the startup
+of a measurement) to the wall-clock time. As such, the timestamps are expressed in seconds since the
+epoch, but do not jump when the wall-clock time is adjusted and have (sub-)microsecond resolution.
+"""
+
+import logging
+from time import perf_counter_ns, time_ns
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+log.addHandler(logging.NullHandler())
+
+
+class Clock:
+    """ Monotonic high-resolution clock, anchored to the wall-clock time. """
+
+    def __init__(self):
+        self.anchor()
+
+    def anchor(self):
+        """ Anchor the clock to the present wall-clock time. This should be done only once per
+        measurement (before any timestamps are generated), as anchoring resets the clock domain.
+        """
+        self._wall_clock_ns = time_ns()
+        self._counter_ns = perf_counter_ns()
+
+    def time_ns(self):
+        """ Return the present time in integer nanoseconds since the epoch. """
+        return self._wall_clock_ns + (perf_counter_ns() - self._counter_ns)
+
+    def time(self):
+        """ Return the present time in seconds since the epoch. """
+        return self.time_ns() * 1e-9
+
+
+# Clock that is shared by all threads
+clock = Clock()
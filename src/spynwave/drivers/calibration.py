@@ -0,0 +1,89 @@
+"""
+This file is part of the SpynWave package.
+
+This file contains the lookup table that is used for the (field) calibrations, e.g. to convert a
+magnetic field into the current that is required for that field.
+"""
+
+import logging
+from bisect import bisect_right
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+log.addHandler(logging.NullHandler())
+
+
+class CalibrationTable:
+    """ Lookup table that linearly interpolates between calibration points. The table can be
+    evaluated for a single value (which is fast, as the slopes between the points are determined
+    upfront) or for an array of values at once.
+
+    :param x: The values of the independent variable (e.g. the current) of the calibration points.
+    :param y: The values of the dependent variable (e.g. the field) of the calibration points.
+    """
+
+    def __init__(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+
+        if x.ndim != 1 or x.shape != y.shape:
+            raise ValueError("The calibration points should be two one-dimensional arrays of the "
+                             "same length.")
+        if x.size < 2:
+            raise ValueError("At least two calibration points are required.")
+        if not (np.isfinite(x).all() and np.isfinite(y).all()):
+            raise ValueError("The calibration points should be finite.")
+
+        order = np.argsort(x, kind="stable")
+        self.x = x[order]
+        self.y = y[order]
+
+        if not (np.diff(self.x) > 0).all():
+            raise ValueError("The calibration points should have unique x-values.")
+
+        self.slopes = np.diff(self.y) / np.diff(self.x)
+        self.minimum = self.x[0]
+        self.maximum = self.x[-1]
+
+        # Python lists for the fast evaluation of single values
+        self._x = self.x.tolist()
+        self._y = self.y.tolist()
+        self._slopes = self.slopes.tolist()
+
+    def __call__(self, value):
+        """ Evaluate the calibration for a single value or an array of values.
+
+        :param value: A number or an array of numbers within the range of the calibration.
+        :return: A float or an array with the interpolated values.
+        """
+        if isinstance(value, (float, int, np.number)):
+            if not self.minimum <= value <= self.maximum:
+                raise ValueError(f"Value ({value}) out of the calibration range "
+                                 f"[{self.minimum}, {self.maximum}].")
+
+            idx = min(bisect_right(self._x, value), len(self._x) - 1) - 1
+            return self._y[idx] + self._slopes[idx] * (value - self._x[idx])
+
+        value = np.asarray(value, dtype=float)
+        if value.size and (value.min() < self.minimum or value.max() > self.maximum):
+            raise ValueError(f"Values out of the calibration range "
+                             f"[{self.minimum}, {self.maximum}].")
+
+        return np.interp(value, self.x, self.y)
+
+    def is_monotonic(self):
+        """ Return whether the calibration is strictly monotonic (i.e. whether it can be
+        inverted). """
+        return bool((self.slopes > 0).all() or (self.slopes < 0).all())
+
+    def inverse(self):
+        """ Return the inverse calibration table (i.e. with x and y swapped).
+
+        :raises ValueError: if the calibration is not strictly monotonic.
+        """
+        if not self.is_monotonic():
+            raise ValueError("The calibration is not strictly monotonic and cannot be inverted.")
+
+        return CalibrationTable(self.y, self.x)
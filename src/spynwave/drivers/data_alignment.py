@@ -0,0 +1,151 @@
+"""
+This file is part of the SpynWave package.
+
+This file contains the strategies that are used by the DataThread to align (match) the data of
+multiple data-producing threads (streams) onto the timestamps of one of the streams (the master).
+"""
+
+import logging
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+log.addHandler(logging.NullHandler())
+
+
+class AlignmentBase:
+    """ Base class for alignment strategies.
+
+    :param master: The index of the stream whose timestamps are used for the aligned data.
+    """
+    name = "alignment base"
+
+    def __init__(self, master=0):
+        self.master = master
+
+    def align(self, structs, max_rows=None):
+        """ Align the data of all streams onto the timestamps of the master stream. The data that
+        is no longer required for future alignments is removed from the streams.
+
+        :param structs: List of DataStructure instances, one for each stream.
+        :param max_rows: The maximum number of rows to align; if None, all rows that can be
+            aligned are aligned.
+        :return: A tuple of an array with the timestamps and a dict with, for each column, an array
+            with the aligned values; or None if no rows can be aligned.
+        """
+        raise NotImplementedError("Should be implemented for a specific alignment strategy")
+
+
+class WindowMeanAlignment(AlignmentBase):
+    """ Average the data of every stream over windows that are defined by the master stream; each
+    window runs up to the midpoint between two consecutive timestamps of the master stream. A row
+    can only be aligned if every stream contains at least two datapoints.
+    """
+    name = "window-mean"
+
+    def align(self, structs, max_rows=None):
+        times = structs[self.master].buffer.times
+        if len(times) < 2:
+            return None
+
+        midpoints = ((times[:-1] + times[1:]) / 2)[:max_rows]
+        edges = [np.searchsorted(s.buffer.times, midpoints, side="right") for s in structs]
+
+        # A row can only be aligned if, before aligning this row, each of the streams contains at
+        # least two datapoints
+        possible = np.ones(len(midpoints), dtype=bool)
+        for struct, struct_edges in zip(structs, edges):
+            possible &= len(struct.buffer) - np.concatenate(([0], struct_edges[:-1])) >= 2
+
+        number_of_rows = len(possible) if possible.all() else int(np.argmin(possible))
+        if number_of_rows == 0:
+            return None
+
+        row_times = times[:number_of_rows].copy()
+
+        columns = {}
+        for struct, struct_edges in zip(structs, edges):
+            struct_edges = np.concatenate(([0], struct_edges[:number_of_rows]))
+            columns.update(struct.window_means(struct_edges))
+            struct.remove_first_n_datapoints(struct_edges[-1])
+
+        return row_times, columns
+
+
+class PointwiseAlignmentBase(AlignmentBase):
+    """ Base class for strategies that produce one row for every datapoint of the master stream,
+    evaluating the other streams at the timestamp of that datapoint. A row can only be aligned once
+    every other stream contains a datapoint at or after its timestamp.
+    """
+
+    def align(self, structs, max_rows=None):
+        master = structs[self.master]
+        others = [struct for idx, struct in enumerate(structs) if idx != self.master]
+
+        times = master.buffer.times
+        number_of_rows = len(times) if max_rows is None else min(len(times), max_rows)
+        for struct in others:
+            if len(struct.buffer) == 0:
+                return None
+            last_time = struct.buffer.times[-1]
+            number_of_rows = min(number_of_rows, np.searchsorted(times, last_time, side="right"))
+
+        if number_of_rows == 0:
+            return None
+
+        row_times, columns = master.buffer.head(number_of_rows)
+        master.remove_first_n_datapoints(number_of_rows)
+
+        for struct in others:
+            columns.update(self.evaluate(struct.buffer.times, struct.buffer.columns, row_times))
+
+            # Keep the last datapoint before the last aligned timestamp, as it can still be
+            # required for aligning the next rows
+            idx = np.searchsorted(struct.buffer.times, row_times[-1], side="right") - 1
+            struct.remove_first_n_datapoints(max(idx, 0))
+
+        return row_times, columns
+
+    def evaluate(self, times, columns, row_times):
+        """ Evaluate the columns of a stream at the requested timestamps.
+
+        :param times: Array with the timestamps of the stream.
+        :param columns: Dict with the data-columns of the stream.
+        :param row_times: Array with the timestamps at which the stream should be evaluated.
+        :return: A dict with the evaluated columns.
+        """
+        raise NotImplementedError("Should be implemented for a specific alignment strategy")
+
+
+class NearestAlignment(PointwiseAlignmentBase):
+    """ Take, for every datapoint of the master stream, the datapoint of the other streams that is
+    closest in time.
+    """
+    name = "nearest"
+
+    def evaluate(self, times, columns, row_times):
+        right = np.minimum(np.searchsorted(times, row_times), len(times) - 1)
+        left = np.maximum(right - 1, 0)
+        nearest = np.where(np.abs(times[left] - row_times) <= np.abs(times[right] - row_times),
+                           left, right)
+
+        return {key: column[nearest] for key, column in columns.items()}
+
+
+class LinearAlignment(PointwiseAlignmentBase):
+    """ Linearly interpolate the other streams onto the timestamps of the master stream. Values
+    before the first datapoint of a stream are nan.
+    """
+    name = "linear"
+
+    def evaluate(self, times, columns, row_times):
+        return {key: np.interp(row_times, times, column, left=np.nan)
+                for key, column in columns.items()}
+
+
+alignment_strategies = {
+    WindowMeanAlignment.name: WindowMeanAlignment,
+    NearestAlignment.name: NearestAlignment,
+    LinearAlignment.name: LinearAlignment,
+}
@@ -4,32 +4,71 @@ This file is part of the SpynWave package.
 
 import logging
 import queue
+import threading
 
+import numpy as np
 import pandas as pd
-from time import sleep
 
 from pymeasure.thread import StoppableThread, InterruptableEvent
 
+from spynwave.clock import clock
+from spynwave.drivers.data_alignment import alignment_strategies
+from spynwave.drivers.instrument_thread import drain_queue
+from spynwave.drivers.telemetry import ThreadTelemetry
+
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 log.addHandler(logging.NullHandler())
 
 
 class DataThread(StoppableThread):
+    """ Thread that collects the data of the data-producing threads, matches (aligns) the data of
+    these threads and emits the matched data to the procedure.
+
+    :param procedure: The procedure to which the data is emitted.
+    :param data_queues: List of the data-queues of the data-producing threads.
+    :param static_data: A dict with data that is added to every emitted row.
+    :param time_column: The name of the column in which the timestamps are stored.
+    :param batch_mode: If True, all data that can be matched is emitted as a single DataFrame;
+        otherwise the data is emitted row by row.
+    :param alignment: The alignment strategy, either the name of one of the strategies in
+        :data:`~spynwave.drivers.data_alignment.alignment_strategies` ("window-mean", "nearest",
+        or "linear") or an instance of an alignment strategy.
+    :param master: The index of the data-queue whose timestamps are used for the matched data;
+        only used if the alignment is specified by name.
+    """
     static_data = {}
     _should_really_stop = False
 
-    def __init__(self, procedure, data_queues, static_data=None, time_column="Timestamp (s)"):
+    # Maximum time (in s) to wait for new data before checking the queues anyway
+    wake_timeout = 0.1
+
+    # Function that is called every telemetry_interval (in s) to report the telemetry (if not None)
+    telemetry_callback = None
+    telemetry_interval = 10
+
+    def __init__(self, procedure, data_queues, static_data=None, time_column="Timestamp (s)",
+                 batch_mode=False, alignment="window-mean", master=0):
         super().__init__()
         self._static_data_queue = queue.Queue()
         self._all_data_processed = InterruptableEvent()
 
+        # Event that is set by the data-producing threads whenever new data is available
+        self.data_event = threading.Event()
+
         self.procedure = procedure
 
         self.data_structs = [DataStructure(q) for q in data_queues]
 
         self.get_new_static_data(static_data)
         self.time_column = time_column
+        self.batch_mode = batch_mode
+
+        if isinstance(alignment, str):
+            alignment = alignment_strategies[alignment](master=master)
+        self.alignment = alignment
+
+        self.telemetry = ThreadTelemetry()
 
         # TODO: Check whether this is required in within the thread
         global log
@@ -44,6 +83,7 @@ class DataThread(StoppableThread):
     def update_static_data(self, new_data):
         assert isinstance(new_data, dict), "Static data should be supplied as a dict."
         self._static_data_queue.put(new_data)
+        self.data_event.set()
 
     def get_new_static_data(self, new_data=None):
         if new_data is None:
@@ -55,31 +95,51 @@ class DataThread(StoppableThread):
             self.static_data = new_data
 
     def emit_data(self, data):
-        self.procedure.emit_data(data | self.static_data)
+        if isinstance(data, pd.DataFrame):
+            self.telemetry.record_samples(len(data))
+            self.telemetry.record_merge_lag(clock.time() - data[self.time_column].iloc[-1])
+            self.procedure.emit_data(data.assign(**self.static_data))
+        else:
+            self.telemetry.record_samples()
+            self.telemetry.record_merge_lag(clock.time() - data[self.time_column])
+            self.procedure.emit_data(data | self.static_data)
+
+    def telemetry_snapshot(self):
+        """ Return a dict with the live metrics of the thread and the number of datapoints that are
+        waiting to be merged. """
+        return self.telemetry.snapshot() | {
+            "queue size": sum(len(s.buffer) + s.queue.qsize() for s in self.data_structs),
+        }
+
+    def get_matched_data(self):
+        """ Match a single row of data using the alignment strategy.
 
-    def matching_possible(self):
-        """ Check if all structs sufficient data for matching
+        :return: A dict with the matched data, or None if no row can be matched.
         """
-        return all(s.could_be_merged() for s in self.data_structs)
+        matched = self.alignment.align(self.data_structs, max_rows=1)
+        if matched is None:
+            return None
 
-    def get_matched_data(self):
-        # V2: assuming that the first column is the slowest one
-        # TODO: generalise this a bit
-        mainstruct = self.data_structs[0]
-        matching_time, midpoint = mainstruct.get_matching_timedata()
-
-        matched_data = []
-        for struct in self.data_structs:
-            idx = struct.index_until_timestamp(midpoint)
-            _, data = struct.pop_first_n_datapoints(idx)
-            matched_data.append(pd.DataFrame(data).mean().to_dict())
-
-        data = {k: v for d in matched_data for k, v in d.items()}
-        data[self.time_column] = matching_time
+        times, columns = matched
+        data = {key: column[0] for key, column in columns.items()}
+        data[self.time_column] = times[0]
         return data
 
+    def get_matched_data_block(self):
+        """ Match all data that can presently be matched in one go using the alignment strategy.
+
+        :return: A pandas DataFrame with the matched rows, or None if no row can be matched.
+        """
+        matched = self.alignment.align(self.data_structs)
+        if matched is None:
+            return None
+
+        times, columns = matched
+        columns[self.time_column] = times
+        return pd.DataFrame(columns)
+
     def data_available(self):
-        return any([s.data_available for s in self.data_structs])
+        return any([s.data_available() for s in self.data_structs])
 
     def should_stop(self):
         should_stop = super().should_stop() and self._should_really_stop
@@ -87,21 +147,42 @@ class DataThread(StoppableThread):
 
         return should_stop
 
+    def stop(self):
+        super().stop()
+        # Wake up the thread such that it can finish
+        self.data_event.set()
+
     def run(self):
+        last_telemetry_report = clock.time()
+
         while not self.should_stop():
+            # Sleep until new data is available or the thread is stopped; if the thread is stopped,
+            # the remaining data is processed directly
+            if not super().should_stop():
+                self.data_event.wait(self.wake_timeout)
+            self.data_event.clear()
+
+            loop_start = clock.time()
+            if self.telemetry_callback is not None and \
+                    loop_start - last_telemetry_report >= self.telemetry_interval:
+                self.telemetry_callback()
+                last_telemetry_report = loop_start
+
             self.get_new_static_data()
 
             for struct in self.data_structs:
                 struct.pull_data_from_queue()
 
-            while self.matching_possible():
-                data = self.get_matched_data()
+            if self.batch_mode:
+                data = self.get_matched_data_block()
 
                 if data is not None:
                     self.emit_data(data)
+            else:
+                while (data := self.get_matched_data()) is not None:
+                    self.emit_data(data)
 
-            # Need a sleep to ensure smooth function of the gui, threads and communication
-            sleep(0.001)
+            self.telemetry.record_loop_latency(clock.time() - loop_start)
 
         self.set_all_data_processed()
 
@@ -113,50 +194,244 @@ class DataThread(StoppableThread):
                 log.error(exc)
 
 
+def mean_per_window(values, edges):
+    """ Calculate the means of consecutive windows of values; nan-values are ignored.
+
+    :param values: 1D array of values.
+    :param edges: Sorted indices of the window edges; window i spans values[edges[i]:edges[i+1]].
+    :return: Array with the mean of each window; nan for windows without (non-nan) values.
+    """
+    edges = np.asarray(edges)
+    values = values[:edges[-1]]
+
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.], np.cumsum(np.where(valid, values, 0.))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sums[edges[1:]] - sums[edges[:-1]]) / (counts[edges[1:]] - counts[edges[:-1]])
+
+
+class ColumnarBuffer:
+    """ Buffer that stores timestamped datapoints column-wise in preallocated numpy (float64)
+    arrays: one array for the timestamps and one array per data column.
+
+    Appending a datapoint and dropping datapoints from the head of the buffer are (amortised) O(1)
+    operations. The stored datapoints always occupy a contiguous slice of the arrays, such that they
+    can be accessed as views without copying. When the end of the arrays is reached, the stored
+    datapoints are moved to the start of the arrays if at least half of the capacity is unused;
+    otherwise the capacity is doubled.
+
+    Timestamps should be monotonically increasing; this is checked upon inserting a datapoint.
+    Columns are created when they first appear in a datapoint; columns that are missing in a
+    datapoint are filled with nan.
+
+    :param capacity: The initial number of datapoints that can be stored.
+    """
+
+    def __init__(self, capacity=1024):
+        self._capacity = capacity
+        self._start = 0
+        self._stop = 0
+        self._times = np.empty(capacity)
+        self._columns = {}
+
+    def __len__(self):
+        return self._stop - self._start
+
+    @property
+    def times(self):
+        """ View of the timestamps of the stored datapoints. """
+        return self._times[self._start:self._stop]
+
+    @property
+    def columns(self):
+        """ Dict with views of the stored data-columns. """
+        return {key: column[self._start:self._stop] for key, column in self._columns.items()}
+
+    def append(self, timestamp, data):
+        """ Add a single datapoint to the end of the buffer.
+
+        :param timestamp: The timestamp of the datapoint; should not be earlier than the timestamp
+            of the last datapoint in the buffer.
+        :param data: A dict with {'column': value} pairs.
+        """
+        if self._stop > self._start and timestamp < self._times[self._stop - 1]:
+            raise ValueError(f"Timestamp {timestamp} is earlier than the last timestamp in the "
+                             f"buffer ({self._times[self._stop - 1]}); timestamps should be "
+                             f"monotonically increasing.")
+
+        if self._stop == self._capacity:
+            self._make_room(1)
+
+        idx = self._stop
+        self._times[idx] = timestamp
+
+        for key, value in data.items():
+            if key not in self._columns:
+                self._add_column(key)
+            self._columns[key][idx] = value
+
+        if len(data) < len(self._columns):
+            for key, column in self._columns.items():
+                if key not in data:
+                    column[idx] = np.nan
+
+        self._stop += 1
+
+    def extend(self, timestamps, data):
+        """ Add a block of datapoints to the end of the buffer.
+
+        :param timestamps: Array with the timestamps of the datapoints; should be monotonically
+            increasing and not earlier than the timestamp of the last datapoint in the buffer.
+        :param data: A dict with {'column': array of values} pairs.
+        """
+        number_of_datapoints = len(timestamps)
+        if number_of_datapoints == 0:
+            return
+
+        if np.any(np.diff(timestamps) < 0) or \
+                (self._stop > self._start and timestamps[0] < self._times[self._stop - 1]):
+            raise ValueError("Timestamps should be monotonically increasing.")
+
+        if self._stop + number_of_datapoints > self._capacity:
+            self._make_room(number_of_datapoints)
+
+        start, stop = self._stop, self._stop + number_of_datapoints
+        self._times[start:stop] = timestamps
+
+        for key, values in data.items():
+            if key not in self._columns:
+                self._add_column(key)
+            self._columns[key][start:stop] = values
+
+        if len(data) < len(self._columns):
+            for key, column in self._columns.items():
+                if key not in data:
+                    column[start:stop] = np.nan
+
+        self._stop = stop
+
+    def head(self, n):
+        """ Return copies of the timestamps and data-columns of the first n datapoints. """
+        stop = self._start + min(n, len(self))
+        times = self._times[self._start:stop].copy()
+        columns = {key: column[self._start:stop].copy() for key, column in self._columns.items()}
+        return times, columns
+
+    def drop(self, n):
+        """ Remove the first n datapoints from the buffer. """
+        self._start += min(n, len(self))
+
+        # Start again at the beginning of the arrays if the buffer is empty
+        if self._start == self._stop:
+            self._start = self._stop = 0
+
+    def _add_column(self, key):
+        column = np.empty(self._capacity)
+        column[self._start:self._stop] = np.nan
+        self._columns[key] = column
+
+    def _make_room(self, n):
+        size = len(self)
+
+        if size + n <= self._capacity // 2:
+            # Enough space is available: move the stored datapoints to the start of the arrays
+            self._times[:size] = self._times[self._start:self._stop]
+            for column in self._columns.values():
+                column[:size] = column[self._start:self._stop]
+        else:
+            # Not enough space is available: allocate larger arrays
+            self._capacity = max(2 * self._capacity, size + n)
+
+            times = np.empty(self._capacity)
+            times[:size] = self._times[self._start:self._stop]
+            self._times = times
+
+            for key, column in self._columns.items():
+                new_column = np.empty(self._capacity)
+                new_column[:size] = column[self._start:self._stop]
+                self._columns[key] = new_column
+
+        self._start = 0
+        self._stop = size
+
+
 class DataStructure:
     def __init__(self, data_queue):
         self.queue = data_queue
-        self.time_lst = []
-        self.data_lst = []
+        self.buffer = ColumnarBuffer()
 
     def data_available(self):
         return not self.queue.empty()
 
     def pull_data_from_queue(self):
-        while self.data_available():
-            t, d = self.queue.get()
-            self.time_lst.append(t)
-            self.data_lst.append(d)
+        """ Move all data from the queue to the buffer. The queue can contain single datapoints
+        (a timestamp and a dict of values) and blocks of datapoints (an array of timestamps and a
+        dict of arrays); consecutive single datapoints are added to the buffer as a single block.
+        """
+        singles = []
+        for timestamps, data in drain_queue(self.queue):
+            if np.ndim(timestamps) == 0:
+                singles.append((timestamps, data))
+                continue
+
+            self._extend_with_singles(singles)
+            singles = []
+            self.buffer.extend(timestamps, data)
+
+        self._extend_with_singles(singles)
+
+    def _extend_with_singles(self, singles):
+        if len(singles) == 1:
+            self.buffer.append(*singles[0])
+        elif len(singles) > 1:
+            keys = {key: None for _, data in singles for key in data}
+            self.buffer.extend(
+                np.array([timestamp for timestamp, _ in singles], dtype=float),
+                {key: np.array([data.get(key, np.nan) for _, data in singles], dtype=float)
+                 for key in keys},
+            )
 
     def could_be_merged(self):
-        assert self.time_lst == sorted(self.time_lst)
-        assert len(self.time_lst) == len(self.data_lst)
-        return len(self.time_lst) >= 2
+        return len(self.buffer) >= 2
 
     def index_until_timestamp(self, timestamp):
-        for idx, time_value in enumerate(self.time_lst):
-            if time_value > timestamp:
-                return idx
+        """ Return the index of the first datapoint with a timestamp later than the given
+        timestamp, or the number of datapoints if there is no such datapoint.
+        """
+        return int(np.searchsorted(self.buffer.times, timestamp, side="right"))
+
+    def window_means(self, edges):
+        """ Return a dict with, for every column, the mean values of the windows of datapoints
+        defined by edges (see :func:`mean_per_window`).
+        """
+        return {key: mean_per_window(column, edges) for key, column in self.buffer.columns.items()}
 
     def get_first_interval(self):
         # TODO: can maybe be used to generalise this a bit
         if not self.could_be_merged():
             return False
 
-        return abs(self.time_lst[1] - self.time_lst[0])
+        times = self.buffer.times
+        return abs(times[1] - times[0])
 
     def get_matching_timedata(self):
         if not self.could_be_merged():
             return None
 
-        return self.time_lst[0], (self.time_lst[0] + self.time_lst[1]) / 2
+        times = self.buffer.times
+        return times[0], (times[0] + times[1]) / 2
 
     def get_first_n_datapoints(self, idx):
-        return self.time_lst[:idx], self.data_lst[:idx]
+        if idx is None:
+            idx = len(self.buffer)
+        return self.buffer.head(idx)
 
     def remove_first_n_datapoints(self, idx):
-        del self.time_lst[:idx]
-        del self.data_lst[:idx]
+        if idx is None:
+            idx = len(self.buffer)
+        self.buffer.drop(idx)
 
     def pop_first_n_datapoints(self, idx):
         data = self.get_first_n_datapoints(idx)
@@ -0,0 +1,116 @@
+"""
+This file is part of the SpynWave package.
+
+This file contains the scheduler for timed loops (such as sweeps). The steps of the loop are
+scheduled at absolute deadlines that are computed from the start of the loop, such that the jitter
+of single steps does not accumulate.
+"""
+
+import logging
+from time import perf_counter, sleep
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+log.addHandler(logging.NullHandler())
+
+
+class DeadlineScheduler:
+    """ Schedules the steps of a timed loop at fixed deadlines (start + step * interval).
+
+    If a step starts late, the scheduler either catches up by starting the next steps without
+    sleeping until it is back on schedule ('catch-up'), skips the steps whose deadlines have
+    already passed ('skip'; the last step is never skipped), or shifts the deadlines of all next
+    steps by the delay ('rebase'), such that never more than one step is started per interval.
+
+    :param interval: The time (in s) between the deadlines of two steps.
+    :param policy: The policy for late steps; one of 'catch-up' or 'skip'.
+    :param sleep_fn: Function that is used for sleeping until the next deadline.
+    :param time_fn: Function that returns the (monotonic) present time in s.
+    """
+    policies = ["catch-up", "skip", "rebase"]
+
+    def __init__(self, interval, policy="catch-up", sleep_fn=lambda x: sleep(x),
+                 time_fn=perf_counter):
+        if policy not in self.policies:
+            raise ValueError(f"Policy {policy} unknown; not one of {self.policies}.")
+        if interval < 0:
+            raise ValueError(f"Interval ({interval} s) should not be negative.")
+
+        self.interval = interval
+        self.policy = policy
+        self.sleep_fn = sleep_fn
+        self.time_fn = time_fn
+
+        self.start_time = None
+        self.end_time = None
+        self.overruns = 0
+        self.skipped_steps = 0
+        self.schedule_shift = 0.
+        self._jitter = []
+
+    def steps(self, number_of_steps):
+        """ Generator that yields the indices of the steps, each at (or as soon as possible after)
+        its deadline. The first step is yielded immediately.
+
+        :param number_of_steps: The number of steps of the loop.
+        """
+        self.start_time = self.time_fn()
+        self.end_time = None
+        self.overruns = 0
+        self.skipped_steps = 0
+        self.schedule_shift = 0.
+        self._jitter = []
+
+        idx = 0
+        try:
+            while idx < number_of_steps:
+                deadline = self.start_time + idx * self.interval
+
+                if (delay := deadline - self.time_fn()) > 0:
+                    self.sleep_fn(delay)
+                elif idx > 0:
+                    self.overruns += 1
+                    if self.policy == "skip" and self.interval > 0 and -delay >= self.interval:
+                        behind = min(int(-delay // self.interval), number_of_steps - 1 - idx)
+                        self.skipped_steps += behind
+                        idx += behind
+                        deadline = self.start_time + idx * self.interval
+                    elif self.policy == "rebase":
+                        # The jitter of this step is still determined relative to its deadline
+                        self.start_time -= delay
+                        self.schedule_shift -= delay
+
+                self.end_time = self.time_fn()
+                self._jitter.append(self.end_time - deadline)
+                yield idx
+                idx += 1
+        finally:
+            # Also when the loop is stopped early
+            self._log_statistics()
+
+    def statistics(self):
+        """ Return a dict with the jitter statistics (i.e. the time between the deadline and the
+        actual start of the steps) of the last loop. """
+        jitter = np.array(self._jitter, dtype=float)
+        return {
+            "steps": jitter.size,
+            "overruns": self.overruns,
+            "skipped steps": self.skipped_steps,
+            "schedule shift (s)": self.schedule_shift,
+            "mean jitter (s)": jitter.mean() if jitter.size else np.nan,
+            "max jitter (s)": jitter.max() if jitter.size else np.nan,
+            "duration (s)": (self.end_time - self.start_time
+                             if self.end_time is not None else np.nan),
+        }
+
+    def _log_statistics(self):
+        statistics = self.statistics()
+        message = ", ".join(f"{key}: {value:.4g}" for key, value in statistics.items())
+
+        if self.overruns:
+            log.warning(f"Timed loop did not keep up with the interval of {self.interval} s; "
+                        f"{message}")
+        else:
+            log.debug(f"Timed loop finished; {message}")
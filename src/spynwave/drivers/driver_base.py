@@ -3,10 +3,9 @@ This file is part of the SpynWave package.
 """
 
 import logging
-from time import sleep, time
-import math
+from time import sleep
 
-import numpy as np
+from spynwave.drivers.sweep_trajectory import SweepTrajectory
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
@@ -18,20 +17,13 @@ class DriverBase:
               sleep_fn=lambda x: sleep(x), should_stop=lambda: False,
               callback_fn=lambda x: None, **kwargs):
 
-        sweep_duration = abs((start - stop) / ramp_rate)
-        number_of_updates = math.ceil(sweep_duration / update_delay)
-        value_list = np.linspace(start, stop, number_of_updates + 1)
+        # The whole sweep is planned upfront, such that only setting the values remains in the loop
+        values, interval = SweepTrajectory.linear(start, stop, ramp_rate, update_delay)
+        trajectory = SweepTrajectory(values, interval=interval)
 
-        t0 = 0
-        for value in value_list:
-            if (delay := update_delay + (t0 - time())) > 0:
-                sleep_fn(delay)
-            else:
-                log.debug(f"Setting next value in sweep took {-delay} longer than update delay "
-                          f"({update_delay - delay}s vs {update_delay} s")
-            t0 = time()
-
-            set_fn(value, **kwargs)
-            callback_fn(value)
-            if should_stop():
-                break
+        trajectory.execute(
+            lambda idx, value: set_fn(value, **kwargs),
+            sleep_fn=sleep_fn,
+            should_stop=should_stop,
+            callback_fn=callback_fn,
+        )
@@ -4,36 +4,232 @@ This file is part of the SpynWave package.
 
 import logging
 import queue
-from time import time
+
+import numpy as np
 
 from pymeasure.thread import StoppableThread, InterruptableEvent
 
+from spynwave.clock import clock
+from spynwave.drivers.telemetry import ThreadTelemetry
+
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 log.addHandler(logging.NullHandler())
 
 
 class InstrumentThread(StoppableThread):
-    def __init__(self, procedure, instrument, **kwargs):
+    """ Base class for threads that control an instrument and/or produce data.
+
+    The produced data is put in a bounded data-queue; when this queue is full, the queue-policy
+    determines what happens with new datapoints:
+
+    ===========  ===============================================================================
+    policy       description
+    ===========  ===============================================================================
+    block        Wait until there is space in the queue (the datapoint is counted as late)
+    drop-oldest  Remove the oldest datapoint from the queue to make space for the new one
+    drop-newest  Discard the new datapoint
+    decimate     Only keep every n-th datapoint, where n doubles every time the queue is full and
+                 is reset when the queue is less than half full; oldest datapoints are removed
+                 if still required
+    ===========  ===============================================================================
+
+    Datapoints are timestamped at the midpoint of their acquisition-window (the times at which the
+    request was sent to and the reply was received from the instrument) if this window is known, and
+    otherwise at the moment they are put in the queue. A per-stream timestamp-offset is added to
+    compensate for any remaining (calibrated) latency of the instrument.
+
+    :param procedure: The procedure that runs the thread.
+    :param instrument: The instrument that is controlled by the thread.
+    :param max_queue_size: The maximum number of items in the data-queue; 0 for an unbounded queue.
+    :param queue_policy: The policy for handling new datapoints when the data-queue is full.
+    :param timestamp_offset: The offset (in s) that is added to the timestamps of the datapoints.
+    :param \\**kwargs: Settings for the thread, stored in the settings attribute.
+    """
+    QUEUE_POLICIES = ["block", "drop-oldest", "drop-newest", "decimate"]
+
+    max_queue_size = 100000
+    queue_policy = "block"
+    timestamp_offset = 0.
+
+    # Event that is set whenever new data is put in the data-queue (e.g. to wake up a DataThread)
+    data_event = None
+
+    def __init__(self, procedure, instrument, max_queue_size=None, queue_policy=None,
+                 timestamp_offset=None, **kwargs):
         super().__init__()
         self.procedure = procedure
         self.instrument = instrument
         self.settings = kwargs
 
+        if max_queue_size is not None:
+            self.max_queue_size = max_queue_size
+        if queue_policy is not None:
+            self.queue_policy = queue_policy
+        if timestamp_offset is not None:
+            self.timestamp_offset = timestamp_offset
+        if self.queue_policy not in self.QUEUE_POLICIES:
+            raise ValueError(f"Queue policy {self.queue_policy} unknown; not one of "
+                             f"{', '.join(self.QUEUE_POLICIES)}.")
+
+        # Counters of datapoints that were discarded or had to wait for space in the queue
+        self.dropped_samples = 0
+        self.late_samples = 0
+        self.decimation = 1
+        self._decimation_count = 0
+
+        self.telemetry = ThreadTelemetry()
+        self._last_put_time = None
+
         self._finished = InterruptableEvent()
-        self.data_queue = queue.Queue()
+        self.data_queue = queue.Queue(maxsize=self.max_queue_size)
 
         # TODO: Check whether this is required in within the thread
         global log
         log = logging.getLogger()
 
-    def put_datapoint(self, data):
-        """ Here the data is timestamped and added to the queue for processing and storing. """
+    def put_datapoint(self, data, acquisition_window=None):
+        """ Here the data is timestamped and added to the queue for processing and storing.
+
+        :param data: A dict with {'column': value} pairs.
+        :param acquisition_window: Tuple with the times (from spynwave.clock) at which the request
+            was sent to and the reply was received from the instrument; if None, the data is
+            timestamped at the present time.
+        """
 
         if not isinstance(data, dict):
             raise TypeError("data should be formatted as a dict with {'column': value} pairs.")
 
-        self.data_queue.put((time(), data))
+        if acquisition_window is None:
+            timestamp = clock.time()
+        else:
+            timestamp = (acquisition_window[0] + acquisition_window[1]) / 2
+            self.telemetry.record_acquisition_latency(acquisition_window[1] - acquisition_window[0])
+
+        self.put_in_queue((timestamp + self.timestamp_offset, data))
+
+    def put_datapoints(self, timestamps, data):
+        """ Here a block of datapoints is added to the queue as a single item for processing and
+        storing.
+
+        :param timestamps: Array with the timestamps of the datapoints (the timestamp-offset is
+            added to these).
+        :param data: A dict with {'column': array of values} pairs, with one value for each
+            timestamp.
+        """
+        if not isinstance(data, dict):
+            raise TypeError("data should be formatted as a dict with {'column': values} pairs.")
+
+        timestamps = np.asarray(timestamps, dtype=float)
+        data = {key: np.asarray(values, dtype=float) for key, values in data.items()}
+
+        if any(values.shape != timestamps.shape for values in data.values()):
+            raise ValueError("Each column in data should have one value for each timestamp.")
+
+        self.put_in_queue((timestamps + self.timestamp_offset, data))
+
+    def put_in_queue(self, item):
+        """ Put an item in the data-queue, taking into account the queue-policy when the queue is
+        full, and notify that new data is available. """
+        self.record_telemetry(self._number_of_samples(item))
+
+        if self.queue_policy == "block":
+            self._put_blocking(item)
+        elif self.queue_policy == "drop-oldest":
+            self._put_replacing_oldest(item)
+        elif self.queue_policy == "drop-newest":
+            try:
+                self.data_queue.put_nowait(item)
+            except queue.Full:
+                self.dropped_samples += self._number_of_samples(item)
+        elif self.queue_policy == "decimate":
+            self._put_decimated(item)
+
+        self.notify_data_available()
+
+    def record_telemetry(self, number_of_samples=1):
+        """ Record in the telemetry that a number of samples was produced; the time since the
+        previous samples were produced is recorded as the put interval. """
+        now = clock.time()
+        if self._last_put_time is not None:
+            self.telemetry.record_put_interval(now - self._last_put_time)
+        self._last_put_time = now
+
+        self.telemetry.record_samples(number_of_samples)
+
+    def notify_data_available(self):
+        if self.data_event is not None:
+            self.data_event.set()
+
+    def _put_blocking(self, item):
+        try:
+            self.data_queue.put_nowait(item)
+            return
+        except queue.Full:
+            self.late_samples += self._number_of_samples(item)
+
+        while True:
+            try:
+                self.data_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                # Do not wait indefinitely if the thread is stopped
+                if self.should_stop():
+                    self.dropped_samples += self._number_of_samples(item)
+                    return
+
+    def _put_replacing_oldest(self, item):
+        while True:
+            try:
+                self.data_queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.dropped_samples += self._number_of_samples(self.data_queue.get_nowait())
+                except queue.Empty:
+                    pass
+
+    def _put_decimated(self, item):
+        if self.data_queue.qsize() < self.max_queue_size // 2:
+            self.decimation = 1
+
+        self._decimation_count = (self._decimation_count + 1) % self.decimation
+        if self._decimation_count != 0:
+            self.dropped_samples += self._number_of_samples(item)
+            return
+
+        if self.data_queue.full():
+            self.decimation *= 2
+
+        self._put_replacing_oldest(item)
+
+    @staticmethod
+    def _number_of_samples(item):
+        """ Return the number of datapoints in a queue item (a single datapoint or a block). """
+        return np.size(item[0])
+
+    def queue_statistics(self):
+        """ Return a dict with the present size of the data-queue and the number of dropped and late
+        datapoints. """
+        return {
+            "queue size": self.data_queue.qsize(),
+            "dropped samples": self.dropped_samples,
+            "late samples": self.late_samples,
+        }
+
+    def telemetry_snapshot(self):
+        """ Return a dict with the live metrics of the thread and the statistics of its
+        data-queue. """
+        return self.telemetry.snapshot() | self.queue_statistics()
+
+    def log_queue_statistics(self):
+        message = (f"{self.__class__.__name__}: {self.dropped_samples} datapoints dropped, "
+                   f"{self.late_samples} datapoints late (queue policy '{self.queue_policy}', "
+                   f"maximum queue size {self.max_queue_size}).")
+        if self.dropped_samples or self.late_samples:
+            log.warning(message)
+        else:
+            log.info(message)
 
     def get_datapoint(self):
         if not self.data_queue.empty():
@@ -41,6 +237,11 @@ class InstrumentThread(StoppableThread):
         else:
             return False
 
+    def get_datapoints(self):
+        """ Remove all items (single datapoints and blocks of datapoints) from the data-queue and
+        return them as a list. """
+        return drain_queue(self.data_queue)
+
     def finished(self):
         self._finished.set()
 
@@ -51,8 +252,20 @@ class InstrumentThread(StoppableThread):
         raise NotImplementedError("Should be implemented for a specific purpose")
 
     def shutdown(self, timeout=2):
+        self.log_queue_statistics()
+
         if self.is_alive():
             try:
                 self.join(timeout)
             except RuntimeError as exc:
                 log.error(exc)
+
+
+def drain_queue(data_queue):
+    """ Remove all items that are presently in a queue and return them as a list. """
+    items = []
+    while True:
+        try:
+            items.append(data_queue.get_nowait())
+        except queue.Empty:
+            return items
@@ -8,9 +8,10 @@ from abc import ABCMeta, abstractmethod
 
 import numpy as np
 import pandas as pd
-from scipy.interpolate import interp1d
 
 from spynwave.constants import config, look_for_file
+from spynwave.drivers.calibration import CalibrationTable
+from spynwave.drivers.sweep_trajectory import SweepTrajectory
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
@@ -30,6 +31,19 @@ class MagnetBase(metaclass=ABCMeta):
 
     calibration = None
 
+    # The last applied current and the direction in which it was changed (+1 or -1, 0 if unknown)
+    applied_current = None
+    current_direction = 0
+
+    # Whether the magnet regulates the field itself (i.e. the field is set instead of the current)
+    regulates_field = False
+
+    # Running offsets (in T) between the measured field and the calibration, for closed-loop
+    # setting; kept over all instances as {magnet name: (calibration identity, offset)} pairs
+    _field_offsets = {}
+    field_offset_weight = 0.5
+    _calibration_identity = None
+
     def __init__(self,
                  mirror_fields=False,
                  measurement_type=None,
@@ -54,19 +68,26 @@ class MagnetBase(metaclass=ABCMeta):
             source_type=source_type,
             source=source,
         )
+        calibration_identity = (source_type, source)
 
         if source_type is None:
+            i_to_b = CalibrationTable(
+                [-conf["power-supply"]["max current"], +conf["power-supply"]["max current"]],
+                [-conf["max field"], +conf["max field"]],
+            )
+
             calibration.update(dict(
                 source="system extrema",
                 min_field=-conf["max field"],
                 max_field=+conf["max field"],
                 min_current=-conf["power-supply"]["max current"],
                 max_current=+conf["power-supply"]["max current"],
-                I_to_B=lambda i: (i * conf["max field"] / conf["power-supply"]["max current"]),
-                B_to_I=lambda b: (b * conf["power-supply"]["max current"] / conf["max field"]),
+                I_to_B=i_to_b,
+                B_to_I=i_to_b.inverse(),
             ))
         elif source_type == "file":
             file = look_for_file(source)
+            calibration_identity = (source_type, str(file.resolve()), file.stat().st_mtime)
             # Load the data from file
             cal_data = pd.read_csv(file, comment="#", sep=",")
 
@@ -78,28 +99,52 @@ class MagnetBase(metaclass=ABCMeta):
                 # Ensure everything is in SI base units; should be automated/checked with the file
                 cal_data["Field (T)"] *= 1e-3
 
-            # Average multiple scans, if any
-            cal_data = cal_data[["Current (A)", "Field (T)"]]\
+            cal_data = cal_data[["Current (A)", "Field (T)"]].dropna()
+
+            # Average multiple scans (and both sweep directions), if any
+            averaged_data = cal_data\
                 .groupby("Current (A)", as_index=False)\
                 .mean()\
                 .sort_values(by="Current (A)")\
                 .reset_index(drop=True)
+            i_to_b, b_to_i = _calibration_tables(averaged_data)
+
+            # Separate branches for increasing and decreasing currents, to account for hysteresis
+            branches = _direction_branches(cal_data)
 
-            i_to_b = interp1d(cal_data["Current (A)"], cal_data["Field (T)"])
-            b_to_i = interp1d(cal_data["Field (T)"], cal_data["Current (A)"])
+            # Limit the calibration to the range in which all branches are valid
+            tables = [(i_to_b, b_to_i)] + list((branches or {}).values())
 
             calibration.update(dict(
-                data=cal_data,
-                min_field=cal_data["Field (T)"].min(),
-                max_field=cal_data["Field (T)"].max(),
-                min_current=cal_data["Current (A)"].min(),
-                max_current=cal_data["Current (A)"].max(),
+                data=averaged_data,
+                min_field=max(table[1].minimum for table in tables),
+                max_field=min(table[1].maximum for table in tables),
+                min_current=max(table[0].minimum for table in tables),
+                max_current=min(table[0].maximum for table in tables),
                 I_to_B=i_to_b,
                 B_to_I=b_to_i,
+                branches=branches,
             ))
 
         self.calibration = calibration
 
+        # The running field offset only applies to the calibration for which it was determined
+        self._calibration_identity = calibration_identity
+        if self._field_offsets.get(self.name, (calibration_identity,))[0] != calibration_identity:
+            log.info(f"Calibration of {self.name} changed; the running field offset is reset.")
+            del self._field_offsets[self.name]
+
+    @property
+    def field_offset(self):
+        """ The running offset (in T) between the measured field and the calibration, which is
+        kept over all instances of this magnet (as long as the calibration is the same). """
+        calibration_identity, offset = self._field_offsets.get(self.name, (None, 0.))
+        return offset if calibration_identity == self._calibration_identity else 0.
+
+    @field_offset.setter
+    def field_offset(self, offset):
+        self._field_offsets[self.name] = (self._calibration_identity, offset)
+
     @abstractmethod
     def startup(self):
         pass
@@ -109,8 +154,7 @@ class MagnetBase(metaclass=ABCMeta):
         pass
 
     def set_field(self, field, **kwargs):
-        if self.mirror_fields:
-            field *= -1
+        field = self._mirror_field(field)
 
         applied_field, current = self._set_field(field, **kwargs)
 
@@ -123,14 +167,56 @@ class MagnetBase(metaclass=ABCMeta):
     def _set_field(self, field, **kwargs):
 
         current = self._field_to_current(field)
-        applied_current = self._set_current(current, **kwargs)
-
-        if applied_current != current:
-            raise ValueError(f"Applied current ({applied_current} T) differs from provided value"
-                             f"({current} T).")
+        self._apply_current(current, **kwargs)
 
         return field, current
 
+    def _record_applied_current(self, current):
+        """ Store the applied current and the direction in which the current was changed, which
+        determine the calibration branch that is used for the next field. """
+        if self.applied_current is not None and current != self.applied_current:
+            self.current_direction = 1 if current > self.applied_current else -1
+        self.applied_current = current
+
+    def _mirror_field(self, field):
+        """ Return the field that is to be applied for a requested field, i.e. the mirrored field if
+        the fields are mirrored. """
+        return -field if self.mirror_fields else field
+
+    def _sweep_currents(self, fields):
+        """ Compute the currents for all fields of a sweep upfront (taking mirroring into account).
+        This checks at once that all fields are within the bounds of the calibration.
+
+        :param fields: Array with the (requested) fields of the sweep.
+        :return: Array with the corresponding currents.
+        """
+        return self._field_to_current(self._mirror_field(np.asarray(fields, dtype=float)))
+
+    def plan_field_sweep(self, start, stop, ramp_rate, update_delay=0.1):
+        """ Plan a linear field sweep: the currents (and polarity switches) for all steps are
+        determined before the sweep is started, and the sweep is validated against the bounds of
+        the calibration and, if the magnet defines a max_current_step, against the maximum step in
+        current. As such, invalid sweeps fail before anything is applied to the magnet.
+
+        :param start: The field (in T) at the start of the sweep.
+        :param stop: The field (in T) at the end of the sweep.
+        :param ramp_rate: The rate (in T/s) of the sweep.
+        :param update_delay: The (maximum) time (in s) between two steps of the sweep.
+        :return: A SweepTrajectory with the fields as values and the currents as setpoints.
+        """
+        fields, interval = SweepTrajectory.linear(start, stop, ramp_rate, update_delay)
+        trajectory = SweepTrajectory(fields, self._sweep_currents(fields), interval=interval)
+
+        if hasattr(self, "max_current_step"):
+            trajectory.check_step_size(self.max_current_step,
+                                       initial=getattr(self, "last_current", None))
+
+        if trajectory.polarity_switches.size:
+            log.info(f"Field sweep from {start} T to {stop} T requires "
+                     f"{trajectory.polarity_switches.size} polarity switch(es).")
+
+        return trajectory
+
     def _set_current(self, current, **kwargs):
         raise NotImplementedError("If this method is needed, it should be implemented by the"
                                   "sub-class.")
@@ -203,15 +289,92 @@ class MagnetBase(metaclass=ABCMeta):
     def field_ramp_rate(self):
         pass
 
+    def set_field_closed_loop(self, field, tolerance=0.0002, max_corrections=3, timeout=60,
+                              sleep_fn=sleep, should_stop=lambda: False, **kwargs):
+        """ Set a field using feedback from the gauss-meter. The field is first applied via the
+        calibration (corrected with the offset that was observed earlier with this magnet and
+        calibration); after the field is stable, the offset between the measured field and the
+        calibration is used to update the running offset, and a few correction steps in the
+        current are made until the measured field is within tolerance of the target. The steps are
+        limited to max_current_step (if the magnet defines it).
+
+        Magnets that regulate the field themselves are set without feedback.
+
+        :param field: The field (in T) to set.
+        :param tolerance: The tolerance (in T) within which the field is considered correct.
+        :param max_corrections: The maximum number of correction steps.
+        :param timeout: The maximum time (in s) to wait for a stable field after every step.
+        :param sleep_fn: The sleep function to use for sleeping
+        :param should_stop: A function that returns True to abort the process
+        :return: A tuple of the field, the applied current, and the last measured field.
+        """
+        if self.regulates_field:
+            field, current = self.set_field(field, **kwargs)
+            measured = self.wait_for_stable_field(interval=3, timeout=timeout, sleep_fn=sleep_fn,
+                                                  should_stop=should_stop)
+            return field, current, measured
+
+        target = self._mirror_field(field)
+        calibrated_field = self._bounded_field(target - self.field_offset)
+        current = self._field_to_current(calibrated_field)
+        self._apply_current(current, **kwargs)
+
+        for correction in range(max_corrections + 1):
+            measured = self.wait_for_stable_field(tolerance=tolerance, timeout=timeout,
+                                                  sleep_fn=sleep_fn, should_stop=should_stop)
+            if correction == 0 and not np.isnan(measured):
+                # The deviation of the calibration (for the present history of the magnet)
+                self._update_field_offset(measured - calibrated_field)
+
+            error = measured - target
+            if np.isnan(measured) or abs(error) < tolerance or correction == max_corrections:
+                break
+
+            # Convert the error in field into a step in current using the calibration
+            step = self.calibration["B_to_I"](target) - \
+                self.calibration["B_to_I"](self._bounded_field(measured))
+            if (max_step := getattr(self, "max_current_step", None)) is not None:
+                step = min(max(step, -max_step), max_step)
+
+            current += step
+            self._check_current_within_bounds(current)
+            self._apply_current(current, **kwargs)
+            log.info(f"Field correction {correction + 1}: measured {measured} T for a target of "
+                     f"{target} T; current changed by {step} A to {current} A.")
+
+        log.info(f"Closed-loop field: {measured} T for a target of {target} T "
+                 f"(running offset {self.field_offset} T).")
+
+        return field, current, measured
+
+    def _apply_current(self, current, **kwargs):
+        applied_current = self._set_current(current, **kwargs)
+
+        if applied_current != current:
+            raise ValueError(f"Applied current ({applied_current} T) differs from provided value"
+                             f"({current} T).")
+
+        self._record_applied_current(current)
+
+    def _bounded_field(self, field):
+        """ Return the field, limited to the range of the calibration. """
+        return min(max(field, self.calibration["min_field"]), self.calibration["max_field"])
+
+    def _update_field_offset(self, offset):
+        """ Update the running offset (in T) between the measured field and the calibration. """
+        self.field_offset += self.field_offset_weight * (offset - self.field_offset)
+
     def _field_to_current(self, field):
+        """ Convert a field, or an array of fields, into the corresponding current(s). """
         # Check if value within range of calibration
-        if not self.calibration["min_field"] <= field <= self.calibration["max_field"]:
+        lowest, highest = _extrema(field)
+        if not self.calibration["min_field"] <= lowest <= highest <= self.calibration["max_field"]:
             raise ValueError(f"Field value ({field} T) out of bounds; should be between "
                              f"{self.calibration['min_field']} T and "
                              f"{self.calibration['max_field']} T (with the present calibration).")
 
         if self.calibration is not None:
-            current = self.calibration["B_to_I"](field)
+            current = self._calibrated_current(field)
         else:
             raise NotImplementedError("No field calibration loaded.")
 
@@ -219,9 +382,41 @@ class MagnetBase(metaclass=ABCMeta):
 
         return current
 
+    def _calibrated_current(self, field):
+        """ Convert a field, or an array of (successive) fields, into current(s) using the
+        calibration branch that corresponds to the direction in which the current changes (with
+        respect to the last applied current). """
+        average = self.calibration["B_to_I"]
+        branches = self.calibration.get("branches")
+        if not branches:
+            return average(field)
+
+        tables = {0: average, **{direction: b_to_i for direction, (_, b_to_i) in branches.items()}}
+
+        if not isinstance(field, np.ndarray):
+            current, _ = _follow_branches(lambda direction: tables[direction](field),
+                                          self.applied_current, self.current_direction)
+            return current
+
+        # Evaluate all branches at once, and then follow the branches through the fields
+        candidates = {direction: table(field).tolist() for direction, table in tables.items()}
+        applied_current, direction = self.applied_current, self.current_direction
+
+        currents = []
+        for idx in range(field.size):
+            current, direction = _follow_branches(lambda d: candidates[d][idx],
+                                                  applied_current, direction)
+            currents.append(current)
+            applied_current = current
+
+        return np.array(currents)
+
     def _current_to_field(self, current):
+        """ Convert a current, or an array of currents, into the corresponding field(s). """
         # Check if value within range of calibration
-        if not self.calibration["min_current"] <= current <= self.calibration["max_current"]:
+        lowest, highest = _extrema(current)
+        if not (self.calibration["min_current"] <= lowest <= highest
+                <= self.calibration["max_current"]):
             raise ValueError(f"Current value ({current} A) out of bounds; should be between "
                              f"{self.calibration['min_current']} A and "
                              f"{self.calibration['max_current']} A (with the present calibration).")
@@ -240,6 +435,74 @@ class MagnetBase(metaclass=ABCMeta):
         else:
             max_current = self.calibration["max_current"]
 
-        if abs(current) > max_current:
+        if max(map(abs, _extrema(current))) > max_current:
             raise ValueError(f"Current value ({current} A) out of bounds for power supply (maximum "
                              f"{max_current} A).")
+
+
+def _extrema(values):
+    """ Return the minimum and maximum of an array, or twice the value for a single value. """
+    if isinstance(values, np.ndarray):
+        return values.min(), values.max()
+    return values, values
+
+
+def _follow_branches(lookup, applied_current, direction):
+    """ Determine the current for a field from the calibration branch of the present direction
+    (+1 for increasing, -1 for decreasing currents, 0 if unknown), switching to the branch of the
+    opposite direction if the current has to change in that direction.
+
+    :param lookup: Function that returns the current for the field for a given direction.
+    :return: A tuple of the current and the direction.
+    """
+    current = lookup(direction)
+    if applied_current is not None and current != applied_current:
+        if (new_direction := 1 if current > applied_current else -1) != direction:
+            direction = new_direction
+            current = lookup(direction)
+    return current, direction
+
+
+def _calibration_tables(data):
+    """ Return the I_to_B and B_to_I lookup tables for the calibration data. Repeated currents are
+    averaged, as are repeated fields for the inverse (e.g. due to the resolution of the
+    gauss-meter).
+
+    :raises ValueError: if the field is not monotonic in the current.
+    """
+    data = data.groupby("Current (A)", as_index=False).mean()
+    i_to_b = CalibrationTable(data["Current (A)"], data["Field (T)"])
+
+    data = data.groupby("Field (T)", as_index=False).mean()
+    b_to_i = CalibrationTable(data["Field (T)"], data["Current (A)"])
+
+    if not b_to_i.is_monotonic():
+        raise ValueError("The field in the calibration is not monotonic in the current, the "
+                         "calibration cannot be inverted.")
+
+    return i_to_b, b_to_i
+
+
+def _direction_branches(data):
+    """ Split the calibration data (in the order in which it was measured) into a branch for
+    increasing (+1) and for decreasing currents (-1); the turning points belong to both branches.
+
+    :return: A dict with {direction: (I_to_B, B_to_I)} or None if the data does not provide
+        (invertible) branches for both directions.
+    """
+    steps = np.sign(np.diff(data["Current (A)"].to_numpy()))
+    step_in = np.concatenate(([0], steps))
+    step_out = np.concatenate((steps, [0]))
+
+    branches = {}
+    for direction in (+1, -1):
+        branch = data[(step_in == direction) | (step_out == direction)]
+        try:
+            branches[direction] = _calibration_tables(branch)
+        except ValueError as exc:
+            log.warning(f"Using the averaged calibration for both sweep directions; the branch "
+                        f"for {'increasing' if direction > 0 else 'decreasing'} currents is not "
+                        f"usable: {exc}")
+            return None
+
+    return branches
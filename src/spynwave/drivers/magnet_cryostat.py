@@ -28,6 +28,9 @@ class MagnetCryostat(MagnetBase):
     """
     name = "cryo magnet"
 
+    # The power supply is controlled by the gauss-meter
+    regulates_field = True
+
     max_field = config[name]["max field"]
     field_ramp_rate = config[name]["ramp rate"]
 
@@ -4,10 +4,9 @@ This file is part of the SpynWave package.
 
 import logging
 import math
-from time import time, sleep
+from time import sleep
 
 from pyvisa.errors import VisaIOError, VI_ERROR_TMO
-import numpy as np
 
 try:
     import u12  # LabJack library from labjackpython
@@ -170,27 +169,20 @@ class MagnetInPlane(LakeShore421Mixin, DriverBase, MagnetBase):
     def sweep_field(self, start, stop, ramp_rate, update_delay=0.1,
                     sleep_fn=lambda x: sleep(x), should_stop=lambda: False,
                     callback_fn=lambda x: None):
-        # Check if fields are within bounds
-        self._field_to_current(start)
-        self._field_to_current(stop)
-
-        sweep_duration = abs((start - stop) / ramp_rate)
-        number_of_updates = math.ceil(sweep_duration / update_delay)
-        field_list = np.linspace(start, stop, number_of_updates + 1)
-
-        t0 = 0
-        for field in field_list:
-            if (delay := update_delay + (t0 - time())) > 0:
-                sleep_fn(delay)
-            else:
-                log.debug(f"Setting field took {-delay} longer than update delay "
-                          f"({update_delay - delay}s vs {update_delay} s")
-            t0 = time()
-
-            self.set_field(field, controlled=False)
-            callback_fn(field)
-            if should_stop():
-                break
+        # Plan (and validate) the whole sweep upfront, such that only writing the current remains
+        trajectory = self.plan_field_sweep(start, stop, ramp_rate, update_delay)
+        magnitudes = trajectory.magnitudes.tolist()
+        polarities = trajectory.polarities.tolist()
+
+        def write_current(idx, current):
+            if self._polarity_needs_changing(polarities[idx]):
+                self._set_polarity(polarities[idx])
+
+            self.power_supply.current = magnitudes[idx]
+            self.last_current = magnitudes[idx]
+            self._record_applied_current(current)
+
+        trajectory.execute(write_current, sleep_fn, should_stop, callback_fn)
 
     def _clear_powersupply_buffer(self):
         timeout = self.power_supply.adapter.connection.timeout
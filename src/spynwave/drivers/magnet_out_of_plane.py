@@ -3,10 +3,7 @@ This file is part of the SpynWave package.
 """
 
 import logging
-import math
-from time import time, sleep
-
-import numpy as np
+from time import sleep
 
 from spynwave.constants import config
 from spynwave.drivers.magnet_base import MagnetBase
@@ -84,29 +81,15 @@ class MagnetOutOfPlane(LakeShore421Mixin, MagnetBase):
     def sweep_field(self, start, stop, ramp_rate, update_delay=0.1,
                     sleep_fn=lambda x: sleep(x), should_stop=lambda: False,
                     callback_fn=lambda x: True):
+        # Plan (and validate) the whole sweep upfront, such that only writing the current remains
+        trajectory = self.plan_field_sweep(start, stop, ramp_rate, update_delay)
+
+        def write_current(idx, current):
+            self.power_supply.current = current
+            self._record_applied_current(current)
 
         self.power_supply.current_check_set_errors = False
-        # Check if fields are within bounds
-        self._field_to_current(start)
-        self._field_to_current(stop)
-
-        sweep_duration = abs((start - stop) / ramp_rate)
-        number_of_updates = math.ceil(sweep_duration / update_delay)
-
-        field_list = np.linspace(start, stop, number_of_updates + 1)
-
-        t0 = 0
-        for field in field_list:
-            if (delay := update_delay + (t0 - time())) > 0:
-                sleep_fn(delay)
-            else:
-                log.debug(f"Setting field took {-delay} longer than update delay "
-                          f"({update_delay - delay}s vs {update_delay} s")
-            t0 = time()
-
-            self.set_field(field)
-            callback_fn(field)
-            if should_stop():
-                break
-
-        self.power_supply.current_check_set_errors = True
+        try:
+            trajectory.execute(write_current, sleep_fn, should_stop, callback_fn)
+        finally:
+            self.power_supply.current_check_set_errors = True
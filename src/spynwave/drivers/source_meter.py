@@ -7,6 +7,7 @@ from time import sleep
 
 from pymeasure.instruments.keithley import Keithley2400
 
+from spynwave.clock import clock
 from spynwave.drivers.driver_base import DriverBase
 from spynwave.constants import config
 
@@ -76,7 +77,7 @@ class SourceMeter(DriverBase):
     def set_voltage(self, voltage):
         self.source_meter.source_voltage = voltage
 
-    def sweep(self, *args, regulate="voltage", callback_fn=lambda v, data: {}, **kwargs):
+    def sweep(self, *args, regulate="voltage", callback_fn=lambda v, data, **kw: {}, **kwargs):
         regulate = regulate.lower()
         set_fn = {"current": self.set_current,
                   "voltage": self.set_voltage}[regulate]
@@ -84,19 +85,21 @@ class SourceMeter(DriverBase):
         if self.source_meter.source_mode == "voltage":
             def cbfn(v):
                 sleep(0.05)
+                t_request = clock.time()
                 data = {
                     "DC voltage (V)": self.source_meter.source_voltage,
                     "DC current (A)": self.source_meter.current,
                 }
-                callback_fn(v, data=data)
+                callback_fn(v, data=data, acquisition_window=(t_request, clock.time()))
         else:
             def cbfn(v):
                 sleep(0.05)
+                t_request = clock.time()
                 data = {
                     "DC current (A)": self.source_meter.source_current,
                     "DC voltage (V)": self.source_meter.voltage,
                 }
-                callback_fn(v, data=data)
+                callback_fn(v, data=data, acquisition_window=(t_request, clock.time()))
 
         super().sweep(*args, set_fn=set_fn, callback_fn=cbfn, **kwargs)
 
@@ -0,0 +1,124 @@
+"""
+This file is part of the SpynWave package.
+
+This file contains the planning of sweeps: all setpoints of a sweep are determined (and validated)
+before the sweep is started, such that only the writing to the instrument remains in the timed loop.
+"""
+
+import logging
+import math
+from time import perf_counter, sleep
+
+import numpy as np
+
+from spynwave.drivers.deadline_scheduler import DeadlineScheduler
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+log.addHandler(logging.NullHandler())
+
+
+class SweepTrajectory:
+    """ The planned trajectory of a sweep, i.e. the values that are swept (e.g. the field) together
+    with the setpoints that are written to the instrument (e.g. the current) for every step.
+
+    :param values: The values of the sweep, in the order in which they are applied.
+    :param setpoints: The setpoints that correspond to the values; if None, the values themselves
+        are used as setpoints.
+    :param interval: The time (in s) between two steps of the sweep.
+    """
+
+    def __init__(self, values, setpoints=None, interval=0.1):
+        self.values = np.asarray(values, dtype=float)
+        self.setpoints = self.values if setpoints is None else np.asarray(setpoints, dtype=float)
+        self.interval = interval
+
+        if self.values.ndim != 1 or self.values.shape != self.setpoints.shape:
+            raise ValueError("The values and setpoints of a sweep should be two one-dimensional "
+                             "arrays of the same length.")
+
+        self.magnitudes = np.abs(self.setpoints)
+        self.polarities = np.copysign(1, self.setpoints).astype(int)
+
+        # Indices of the steps at which the sign of the setpoint changes
+        self.polarity_switches = np.flatnonzero(np.diff(self.polarities)) + 1
+
+    @classmethod
+    def linear(cls, start, stop, ramp_rate, update_delay=0.1):
+        """ Return the values of a linear sweep from start to stop, together with the interval
+        between the steps. The interval is at most update_delay, and is chosen such that the sweep
+        takes exactly abs(stop - start) / ramp_rate.
+
+        :param start: The value at the start of the sweep.
+        :param stop: The value at the end of the sweep.
+        :param ramp_rate: The rate at which the value changes (in units per s).
+        :param update_delay: The (maximum) time (in s) between two steps of the sweep.
+        :return: A tuple of an array with the values and the interval (in s).
+        """
+        sweep_duration = abs((start - stop) / ramp_rate)
+        number_of_updates = math.ceil(sweep_duration / update_delay)
+        interval = sweep_duration / number_of_updates if number_of_updates else update_delay
+        return np.linspace(start, stop, number_of_updates + 1), interval
+
+    @property
+    def duration(self):
+        """ The duration (in s) of the sweep, if all steps are applied on time. """
+        return max(len(self) - 1, 0) * self.interval
+
+    def __len__(self):
+        return self.values.size
+
+    def check_step_size(self, max_step, initial=None):
+        """ Check that the magnitude of the setpoint does not change by more than max_step between
+        two steps of the sweep.
+
+        :param max_step: The maximum change of the magnitude of the setpoint per step.
+        :param initial: The magnitude of the setpoint before the sweep is started; if not None, the
+            step to the start of the sweep is checked as well.
+        :raises ValueError: if a step is too large.
+        """
+        magnitudes = self.magnitudes
+        if initial is not None:
+            magnitudes = np.concatenate(([abs(initial)], magnitudes))
+
+        steps = np.abs(np.diff(magnitudes))
+        if steps.size and steps.max() > max_step:
+            idx = int(np.argmax(steps))
+            raise ValueError(f"Step in sweep too large: from {magnitudes[idx]} to "
+                             f"{magnitudes[idx + 1]}; maximum step-size is {max_step}.")
+
+    def execute(self, write_fn, sleep_fn=lambda x: sleep(x), should_stop=lambda: False,
+                callback_fn=lambda x: None, policy="rebase", time_fn=perf_counter):
+        """ Run through the sweep, writing the setpoint of every step at its deadline (computed from
+        the start of the sweep, such that the jitter of the steps does not accumulate).
+
+        If a step is late (e.g. because writing a setpoint required switching the polarity), the
+        deadlines of the next steps are shifted, such that never more than one step is written per
+        interval and the ramp rate of the sweep is not exceeded.
+
+        :param write_fn: Function that is called with the index of the step and the setpoint,
+            and that writes the setpoint to the instrument.
+        :param sleep_fn: Function that is used for sleeping between the steps.
+        :param should_stop: Function that returns True if the sweep should be stopped.
+        :param callback_fn: Function that is called with the value after every step.
+        :param policy: The policy for steps that are late; either 'rebase' or 'catch-up' (see
+            :class:`DeadlineScheduler`). Note that catching up exceeds the ramp rate of the sweep.
+        :param time_fn: Function that returns the (monotonic) present time in s.
+        :return: The DeadlineScheduler, which holds the jitter statistics of the sweep.
+        """
+        if policy == "skip":
+            # Skipping steps would result in steps of the setpoint that are not validated
+            raise ValueError("Steps of a sweep cannot be skipped.")
+
+        values = self.values.tolist()
+        setpoints = self.setpoints.tolist()
+
+        scheduler = DeadlineScheduler(self.interval, policy=policy, sleep_fn=sleep_fn,
+                                      time_fn=time_fn)
+        for idx in scheduler.steps(len(values)):
+            write_fn(idx, setpoints[idx])
+            callback_fn(values[idx])
+            if should_stop():
+                break
+
+        return scheduler
@@ -0,0 +1,127 @@
+"""
+This file is part of the SpynWave package.
+
+This file contains the telemetry (live performance metrics) of the threads that are used in the
+threaded sweeps, such as the number of samples per second, the loop latency, the interval between
+puts in the data-queue and the merge lag.
+"""
+
+import logging
+from collections import deque
+
+import numpy as np
+
+from spynwave.clock import clock
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+log.addHandler(logging.NullHandler())
+
+
+class ThreadTelemetry:
+    """ Collects the live metrics of a thread. Rates and latencies are determined over the most
+    recent records only, such that the metrics reflect the present performance of the thread.
+
+    :param window: The number of most recent records that is used for the rates and latencies.
+    """
+
+    def __init__(self, window=1000):
+        self.samples = 0
+        self.merge_lag = np.nan
+
+        self._sample_records = deque(maxlen=window)
+        self._loop_latencies = deque(maxlen=window)
+        self._put_intervals = deque(maxlen=window)
+        self._acquisition_latencies = deque(maxlen=window)
+
+    def record_samples(self, number_of_samples=1):
+        """ Record that a number of samples was produced (or processed) at the present time. """
+        self.samples += number_of_samples
+        self._sample_records.append((clock.time(), number_of_samples))
+
+    def record_loop_latency(self, latency):
+        """ Record the duration (in s) of a single iteration of the loop of the thread. """
+        self._loop_latencies.append(latency)
+
+    def record_put_interval(self, interval):
+        """ Record the time (in s) between two consecutive puts of data in the data-queue. """
+        self._put_intervals.append(interval)
+
+    def record_acquisition_latency(self, latency):
+        """ Record the time (in s) between sending a request to and receiving a reply from the
+        instrument. """
+        self._acquisition_latencies.append(latency)
+
+    def record_merge_lag(self, merge_lag):
+        """ Record the time (in s) between the timestamp of the most recently merged data and the
+        moment it is merged. """
+        self.merge_lag = merge_lag
+
+    def samples_per_second(self):
+        records = list(self._sample_records)
+        if len(records) < 2:
+            return np.nan
+
+        duration = records[-1][0] - records[0][0]
+        if duration <= 0:
+            return np.nan
+
+        # The samples of the first record were produced before the start of the duration
+        return sum(number for _, number in records[1:]) / duration
+
+    def snapshot(self):
+        """ Return a dict with the present metrics. """
+        loop_latencies = np.array(self._loop_latencies, dtype=float)
+        put_intervals = np.array(self._put_intervals, dtype=float)
+        acquisition_latencies = np.array(self._acquisition_latencies, dtype=float)
+
+        return {
+            "samples": self.samples,
+            "samples/s": self.samples_per_second(),
+            "mean loop latency (s)": _mean(loop_latencies),
+            "p99 loop latency (s)": _percentile(loop_latencies, 99),
+            "mean put interval (s)": _mean(put_intervals),
+            "p99 put interval (s)": _percentile(put_intervals, 99),
+            "mean acquisition latency (s)": _mean(acquisition_latencies),
+            "merge lag (s)": self.merge_lag,
+        }
+
+
+def _mean(values):
+    return values.mean() if values.size else np.nan
+
+
+def _percentile(values, percentile):
+    return np.percentile(values, percentile) if values.size else np.nan
+
+
+def format_telemetry(metrics):
+    """ Format a dict of metrics as a single line of text, omitting metrics that are not available
+    (nan). """
+    return ", ".join(f"{key}: {value:.4g}" for key, value in metrics.items()
+                     if not np.isnan(value))
+
+
+def store_telemetry_summary(results, summary):
+    """ Insert a summary of the telemetry of the threads into the header of the data-file(s) of a
+    (finished) measurement, analogous to how pymeasure stores the metadata.
+
+    :param results: The pymeasure Results object of the measurement.
+    :param summary: A dict with {'thread name': metrics} pairs.
+    """
+    lines = ["Telemetry:"]
+    for name, metrics in summary.items():
+        lines.extend(f"\t{name} {key}: {value:.6g}" for key, value in metrics.items()
+                     if not np.isnan(value))
+
+    header = results.LINE_BREAK.join(results.COMMENT + line for line in lines) + results.LINE_BREAK
+
+    for filename in results.data_filenames:
+        with open(filename, "r+") as f:
+            contents = f.readlines()
+            contents.insert(results._header_count - 1, header)
+
+            f.seek(0)
+            f.writelines(contents)
+
+    results._header_count += len(lines)
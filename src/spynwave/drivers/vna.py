@@ -2,15 +2,16 @@
 This file is part of the SpynWave package.
 """
 import logging
-import struct
 from time import sleep
 from io import StringIO
 
+import numpy as np
 import pandas as pd
 import nidaqmx.constants
 import nidaqmx
 import pyvisa.constants
 
+from spynwave.clock import clock
 from spynwave.constants import config
 
 # TODO: should be contributed to pymeasure
@@ -21,15 +22,98 @@ log.setLevel(logging.DEBUG)
 log.addHandler(logging.NullHandler())
 
 
+# Binary (headerless) format of a single S-parameter in the output of the O<param>C commands: the
+# real and imaginary parts as big-endian doubles, followed by a single separator byte
+OSC_DTYPE = np.dtype([("real", ">f8"), ("imag", ">f8"), ("separator", "u1")])
+
+
+def decode_osc_headerless(raw, params):
+    """ Decode the binary (headerless) output of the O<param>C commands in one go.
+
+    :param raw: The bytes returned by the VNA.
+    :param params: List of the names of the S-parameters in the output (in order).
+    :return: A dict with the real and imaginary parts of each of the S-parameters.
+    """
+    values = np.frombuffer(raw, dtype=OSC_DTYPE, count=len(params))
+
+    data = {}
+    for param, real, imag in zip(params, values["real"].tolist(), values["imag"].tolist()):
+        data[param + " real"] = real
+        data[param + " imag"] = imag
+    return data
+
+
+def frequency_segments(frequency_start, frequency_stop, frequency_stepsize,
+                       dense_start, dense_stop, dense_stepsize):
+    """ Divide a frequency sweep into segments: a dense segment (with a small step size), e.g.
+    around an expected resonance, and sparse segments (with the regular step size) below and above
+    the dense segment.
+
+    :param frequency_start: The start frequency of the sweep in Hz.
+    :param frequency_stop: The stop frequency of the sweep in Hz.
+    :param frequency_stepsize: The step size of the sparse segments in Hz.
+    :param dense_start: The start frequency of the dense segment in Hz.
+    :param dense_stop: The stop frequency of the dense segment in Hz.
+    :param dense_stepsize: The step size of the dense segment in Hz.
+    :return: List of (start frequency, stop frequency, number of points) tuples, one for each
+        segment.
+    """
+    dense_start = max(dense_start, frequency_start)
+    dense_stop = min(dense_stop, frequency_stop)
+    if dense_start >= dense_stop:
+        raise ValueError("The dense segment does not overlap with the frequency sweep.")
+
+    # Small tolerance for the rounding of the frequencies
+    tolerance = 1e-6
+
+    segments = []
+
+    points = int(np.ceil((dense_start - frequency_start) / frequency_stepsize - tolerance))
+    if points > 0:
+        segments.append((frequency_start,
+                         frequency_start + (points - 1) * frequency_stepsize,
+                         points))
+
+    points = int(round((dense_stop - dense_start) / dense_stepsize)) + 1
+    dense_stop = dense_start + (points - 1) * dense_stepsize
+    segments.append((dense_start, dense_stop, points))
+
+    sparse_start = dense_stop + frequency_stepsize
+    points = int(np.floor((frequency_stop - sparse_start) / frequency_stepsize + tolerance)) + 1
+    if points > 0:
+        segments.append((sparse_start,
+                         sparse_start + (points - 1) * frequency_stepsize,
+                         points))
+
+    return segments
+
+
 class VNA:
     vectorstar = None
     trigger_task = None
+    pulse_task = None
     counter_task = None
     counter_task_reference = 0
 
+    # Tasks and settings for free-running triggering (see start_free_running)
+    pulse_train_task = None
+    timestamp_task = None
+    timestamp_timebase_rate = 1e5  # Hz
+
+    # Time (from spynwave.clock) at which the last measurement was triggered
+    trigger_time = None
+
     cached_average_count = 0
     cached_measurement_port = "2-port"
 
+    # Transfer the data of frequency sweeps in binary format (falls back to ASCII if this fails)
+    binary_sweep_transfer = True
+    cached_frequencies = None
+
+    # Number of points acquired per trigger in CW mode, and the (estimated) duration of each point
+    cw_number_of_points = 1
+    cw_point_duration = 0.
+
     def __init__(self, use_DAQmx=None, **kwargs):
 
         self.vectorstar = self.connect_vectorstar(**kwargs)
@@ -41,16 +125,15 @@ class VNA:
 
         if self.use_DAQmx:
             try:
-                self.trigger_task = nidaqmx.Task("Trigger task")
-                self.trigger_task.do_channels.add_do_chan(config['vna']['daqmx']["trigger line"])
-                self.trigger_task.write(False)
-
-                self.counter_task = nidaqmx.Task("Counter task")
-                channel = self.counter_task.ci_channels.add_ci_count_edges_chan(
-                    config['vna']['daqmx']["counter channel"], edge=nidaqmx.constants.Edge.FALLING)
-                channel.ci_count_edges_term = config['vna']['daqmx']["counter edge"]
-                self.counter_task.start()
-
+                if config['vna']['daqmx'].get("trigger pulse counter") is not None:
+                    self.pulse_task = self.create_trigger_pulse_task()
+                else:
+                    self.trigger_task = nidaqmx.Task("Trigger task")
+                    self.trigger_task.do_channels.add_do_chan(
+                        config['vna']['daqmx']["trigger line"])
+                    self.trigger_task.write(False)
+
+                self.counter_task = self.create_counter_task()
                 self.daqmx_update_reference_count()
 
             except Exception as exc:
@@ -61,6 +144,45 @@ class VNA:
                 log.info("Could not find DAQmx, attemping measurement without it.")
                 self.use_DAQmx = False
 
+    @property
+    def hardware_trigger_available(self):
+        """ Whether the VNA is triggered by hardware-timed pulses from a DAQmx counter output,
+        which is required for pipelined (and free-running) triggering. """
+        return bool(self.use_DAQmx and
+                    config['vna']['daqmx'].get("trigger pulse counter") is not None)
+
+    @staticmethod
+    def create_counter_task():
+        """ Create and start a DAQmx task that counts the completed measurements of the VNA. """
+        task = nidaqmx.Task("Counter task")
+        channel = task.ci_channels.add_ci_count_edges_chan(
+            config['vna']['daqmx']["counter channel"], edge=nidaqmx.constants.Edge.FALLING)
+        channel.ci_count_edges_term = config['vna']['daqmx']["counter edge"]
+        task.start()
+        return task
+
+    @staticmethod
+    def create_trigger_pulse_task():
+        """ Create a DAQmx task that generates a single hardware-timed trigger pulse on a counter
+        output every time it is started. """
+        daqmx_config = config['vna']['daqmx']
+        pulse_width = daqmx_config.get("trigger pulse width", 0.001)
+
+        task = nidaqmx.Task("Trigger pulse task")
+        channel = task.co_channels.add_co_pulse_chan_time(
+            daqmx_config["trigger pulse counter"],
+            idle_state=nidaqmx.constants.Level.LOW,
+            initial_delay=0.,
+            low_time=pulse_width,
+            high_time=pulse_width,
+        )
+        channel.co_pulse_term = daqmx_config["trigger pulse terminal"]
+        task.timing.cfg_implicit_timing(
+            sample_mode=nidaqmx.constants.AcquisitionType.FINITE,
+            samps_per_chan=1,
+        )
+        return task
+
     @staticmethod
     def connect_vectorstar(**kwargs):
         vectorstar = AnritsuMS4644B(
@@ -80,14 +202,16 @@ class VNA:
         # *SRE 48: enables message available, standard event bits in the status byte
         self.vectorstar.service_request_enable_bits = 48
         self.vectorstar.clear()
-        self.vectorstar.binary_data_byte_order = "NORM"
 
-        # Configure single active channel for transmission/reflection measurements
-        self.vectorstar.number_of_channels = 1
-        self.vectorstar.active_channel = 1
-        self.vectorstar.ch_1.application_type = "TRAN"
+        with self.vectorstar.batch_settings():
+            self.vectorstar.binary_data_byte_order = "NORM"
+
+            # Configure single active channel for transmission/reflection measurements
+            self.vectorstar.number_of_channels = 1
+            self.vectorstar.active_channel = 1
+            self.vectorstar.ch_1.application_type = "TRAN"
 
-        self.vectorstar.ch_1.hold_function = "CONT"
+            self.vectorstar.ch_1.hold_function = "CONT"
 
         # self.vectorstar.data_drawing_enabled = False
 
@@ -96,63 +220,74 @@ class VNA:
         # self.vectorstar.ch_1.bandwidth
         # self.vectorstar.ch_1.pt_1.power_level
 
+    def measurement_parameters(self):
+        """ Return the list of measured S-parameters, in order of the traces. """
+        return {
+            "1-port: S11": ["S11"],
+            "1-port: S22": ["S22"],
+            "2-port": ["S11", "S12", "S21", "S22"],
+        }[self.cached_measurement_port]
+
     def set_measurement_ports(self, measurement_ports):
         self.cached_measurement_port = measurement_ports
 
-        if measurement_ports == "2-port":
-            self.vectorstar.ch_1.number_of_traces = 4
-            self.vectorstar.ch_1.display_layout = "R2C2"
-            self.vectorstar.ch_1.tr_1.measurement_parameter = "S11"
-            self.vectorstar.ch_1.tr_2.measurement_parameter = "S12"
-            self.vectorstar.ch_1.tr_3.measurement_parameter = "S21"
-            self.vectorstar.ch_1.tr_4.measurement_parameter = "S22"
+        with self.vectorstar.batch(check_errors=True):
+            if measurement_ports == "2-port":
+                self.vectorstar.ch_1.number_of_traces = 4
+                self.vectorstar.ch_1.display_layout = "R2C2"
+                self.vectorstar.ch_1.tr_1.measurement_parameter = "S11"
+                self.vectorstar.ch_1.tr_2.measurement_parameter = "S12"
+                self.vectorstar.ch_1.tr_3.measurement_parameter = "S21"
+                self.vectorstar.ch_1.tr_4.measurement_parameter = "S22"
 
-        else:  # 1-port measurement
-            self.vectorstar.ch_1.number_of_traces = 1
-            self.vectorstar.ch_1.display_layout = "R1C1"
-            self.vectorstar.ch_1.tr_1.measurement_parameter = measurement_ports[-3:]
-
-        self.vectorstar.check_errors()
+            else:  # 1-port measurement
+                self.vectorstar.ch_1.number_of_traces = 1
+                self.vectorstar.ch_1.display_layout = "R1C1"
+                self.vectorstar.ch_1.tr_1.measurement_parameter = measurement_ports[-3:]
 
     def general_measurement_settings(self, power_level, bandwidth):
-        self.vectorstar.bandwidth_enhancer_enabled = True
-        self.vectorstar.ch_1.bandwidth = bandwidth
+        with self.vectorstar.batch_settings():
+            self.vectorstar.bandwidth_enhancer_enabled = True
+            self.vectorstar.ch_1.bandwidth = bandwidth
 
-        self.vectorstar.ch_1.pt_1.power_level = power_level
+            self.vectorstar.ch_1.pt_1.power_level = power_level
 
-        self.vectorstar.check_errors()
+            self.vectorstar.check_errors()
 
     def configure_averaging(self, enabled, average_count=None, averaging_type=None):
-        self.vectorstar.ch_1.averaging_enabled = enabled
-        if enabled:
-            if average_count is not None:
-                self.vectorstar.ch_1.average_count = average_count
-            if averaging_type is not None:
-                self.vectorstar.ch_1.average_type = {
-                    "point-by-point": "POIN",
-                    "sweep-by-sweep": "SWE",
-                }[averaging_type]
+        with self.vectorstar.batch_settings():
+            self.vectorstar.ch_1.averaging_enabled = enabled
+            if enabled:
+                if average_count is not None:
+                    self.vectorstar.ch_1.average_count = average_count
+                if averaging_type is not None:
+                    self.vectorstar.ch_1.average_type = {
+                        "point-by-point": "POIN",
+                        "sweep-by-sweep": "SWE",
+                    }[averaging_type]
 
-        self.vectorstar.check_errors()
+            self.vectorstar.check_errors()
 
     def configure_external_trigger(self):
-        if self.use_DAQmx:
-            # Configure trigger for external (DAQmx) trigger
-            self.vectorstar.trigger_source = "EXT"
-            self.vectorstar.external_trigger_type = "CHAN"
-            self.vectorstar.external_trigger_delay = 0
-            self.vectorstar.external_trigger_edge = "POS"
-            self.vectorstar.external_trigger_handshake = True
-        else:
-            self.vectorstar.trigger_source = "REM"
-            self.vectorstar.remote_trigger_type = "CHAN"
+        with self.vectorstar.batch_settings():
+            if self.use_DAQmx:
+                # Configure trigger for external (DAQmx) trigger
+                self.vectorstar.trigger_source = "EXT"
+                self.vectorstar.external_trigger_type = "CHAN"
+                self.vectorstar.external_trigger_delay = 0
+                self.vectorstar.external_trigger_edge = "POS"
+                self.vectorstar.external_trigger_handshake = True
+            else:
+                self.vectorstar.trigger_source = "REM"
+                self.vectorstar.remote_trigger_type = "CHAN"
 
-        self.vectorstar.check_errors()
+            self.vectorstar.check_errors()
 
     def configure_internal_trigger(self):
-        self.vectorstar.trigger_source = "AUTO"
+        with self.vectorstar.batch_settings():
+            self.vectorstar.trigger_source = "AUTO"
 
-        self.vectorstar.check_errors()
+            self.vectorstar.check_errors()
 
     def reset_to_measure(self):
         self.vectorstar.ch_1.tr_1.activate()
@@ -167,52 +302,215 @@ class VNA:
 
         self.vectorstar.check_errors()
 
-    def prepare_cw_sweep(self, cw_frequency, headerless=False):
-        self.vectorstar.ch_1.cw_mode_enabled = True
-        self.vectorstar.ch_1.frequency_CW = cw_frequency
-        self.vectorstar.ch_1.cw_number_of_points = 1
+    def prepare_cw_sweep(self, cw_frequency, headerless=False, number_of_points=1):
+        """ Prepare the VNA for measuring at a single (CW) frequency.
+
+        :param cw_frequency: The CW frequency in Hz.
+        :param headerless: Whether single points are transferred in binary format without a header.
+        :param number_of_points: The number of points that is acquired per trigger; if larger than
+            1, the points are transferred as a single (binary) block.
+        """
+        # The duration of a single point is mainly determined by the IF bandwidth
+        self.cw_point_duration = 1 / self.vectorstar.ch_1.bandwidth
+        self.cw_number_of_points = number_of_points
+
+        with self.vectorstar.batch_settings():
+            self.vectorstar.ch_1.cw_mode_enabled = True
+            self.vectorstar.ch_1.frequency_CW = cw_frequency
+            self.vectorstar.ch_1.cw_number_of_points = number_of_points
+
+            if self.use_DAQmx:
+                self.configure_averaging(False)
+                self.configure_external_trigger()
+            else:
+                self.configure_averaging(True, 1, "sweep-by-sweep")
+                self.configure_internal_trigger()
+
+            if number_of_points > 1:
+                self.vectorstar.datablock_header_format = 1
+                self.vectorstar.datablock_numeric_format = "8byte"
+            elif headerless:
+                self.vectorstar.datablock_header_format = 2
+                self.vectorstar.datablock_numeric_format = "8byte"
 
-        if self.use_DAQmx:
-            self.configure_averaging(False)
-            self.configure_external_trigger()
-        else:
-            self.configure_averaging(True, 1, "sweep-by-sweep")
-            self.configure_internal_trigger()
+            self.vectorstar.check_errors()
 
-        if headerless:
-            self.vectorstar.datablock_header_format = 2
-            self.vectorstar.datablock_numeric_format = "8byte"
+    def cw_point_timestamps(self, trigger_time, done_time):
+        """ Reconstruct the timestamps of the points of a buffered CW measurement; the points are
+        evenly spaced from the trigger on, but cannot be later than the end of the measurement.
 
-        self.vectorstar.check_errors()
+        :param trigger_time: The time at which the measurement was triggered.
+        :param done_time: The time at which the end of the measurement was detected.
+        :return: Array with the timestamp (the middle) of each point.
+        """
+        point_duration = min(self.cw_point_duration,
+                             (done_time - trigger_time) / self.cw_number_of_points)
+        return trigger_time + (np.arange(self.cw_number_of_points) + 0.5) * point_duration
 
     def prepare_frequency_sweep(self, frequency_start, frequency_stop, frequency_stepsize):
-        self.vectorstar.ch_1.cw_mode_enabled = False
-
         frequency_span = frequency_stop - frequency_start
         frequency_points = int(round(frequency_span / frequency_stepsize))
 
-        self.vectorstar.ch_1.frequency_start = frequency_start
-        self.vectorstar.ch_1.frequency_stop = frequency_stop
-        self.vectorstar.ch_1.number_of_points = frequency_points
+        with self.vectorstar.batch_settings():
+            self.vectorstar.ch_1.cw_mode_enabled = False
+            self.vectorstar.ch_1.sweep_type = "LIN"
 
-        self.configure_internal_trigger()
+            self.vectorstar.ch_1.frequency_start = frequency_start
+            self.vectorstar.ch_1.frequency_stop = frequency_stop
+            self.vectorstar.ch_1.number_of_points = frequency_points
 
-        self.vectorstar.check_errors()
+            self.configure_internal_trigger()
+
+            self.vectorstar.check_errors()
+
+        # The frequencies of the sweep are known, such that they do not have to be transferred
+        self.cached_frequencies = np.linspace(frequency_start, frequency_stop, frequency_points)
+
+    def prepare_segmented_frequency_sweep(self, segments):
+        """ Prepare the VNA for a frequency-based segmented sweep.
+
+        :param segments: List of (start frequency, stop frequency, number of points) tuples, one
+            for each segment (see :func:`frequency_segments`).
+        """
+        channel = self.vectorstar.ch_1
+        if len(segments) > channel.SEGMENTS[1]:
+            raise ValueError(f"At most {channel.SEGMENTS[1]} segments are supported.")
+
+        with self.vectorstar.batch_settings():
+            channel.cw_mode_enabled = False
+
+            number_of_segments = channel.number_of_frequency_segments
+            for idx in range(number_of_segments, len(segments), -1):
+                channel.segments[idx].delete()
+            for _ in range(number_of_segments, len(segments)):
+                channel.add_frequency_segment()
+
+            for idx, (start, stop, points) in enumerate(segments, start=1):
+                segment = channel.segments[idx]
+                segment.frequency_start = start
+                segment.frequency_stop = stop
+                segment.number_of_points = points
+                segment.enabled = True
+
+            channel.sweep_type = "FSEGM"
+
+            self.configure_internal_trigger()
+
+            self.vectorstar.check_errors()
+
+        # The frequencies of the sweep are known, such that they do not have to be transferred
+        self.cached_frequencies = np.concatenate([
+            np.linspace(start, stop, points) for start, stop, points in segments
+        ])
 
     def trigger_measurement(self):
         # TODO: check why this is not stable, especially for frequency sweeps
         log.log(0, f"Triggering measurement using {'DAQmx' if self.use_DAQmx else 'SCPI'}.")
-        if self.use_DAQmx:
+        if self.use_DAQmx and self.pulse_task is not None:
+            self.daqmx_update_reference_count()
+            # A finite task has to be stopped before it can be started (i.e. pulse) again
+            self.pulse_task.stop()
+            self.pulse_task.start()
+            self.trigger_time = clock.time()
+        elif self.use_DAQmx:
             self.daqmx_update_reference_count()
             self.trigger_task.write(True)
+            self.trigger_time = clock.time()
             sleep(0.05)
             self.trigger_task.write(False)
         else:
             # When nog using the DAQmx, the system "triggers" by resetting the average count
             self.reset_average_count()
+            self.trigger_time = clock.time()
             # sleep(0.01)
             # self.vectorstar.trigger_continuous()
 
+    def start_free_running(self, rate):
+        """ Start free-running triggering: the VNA is triggered by a hardware-timed pulse train from
+        a counter output, and the completion of each measurement is timestamped in hardware by
+        latching a counter (that counts a timebase) on the measurement-done edge. The timestamps are
+        buffered by DAQmx and can be read in blocks using read_completed_timestamps.
+
+        :param rate: The trigger rate in Hz.
+        """
+        if not self.use_DAQmx:
+            raise NotImplementedError("Free-running triggering requires DAQmx.")
+
+        daqmx_config = config['vna']['daqmx']
+        if daqmx_config.get("trigger pulse counter") is None:
+            raise ValueError("Free-running triggering requires a 'trigger pulse counter' and "
+                             "'trigger pulse terminal' in the daqmx configuration.")
+
+        # The counters are used for the pulse train and the timestamps instead
+        for task in [self.pulse_task, self.counter_task]:
+            if task is not None:
+                task.close()
+        self.pulse_task = self.counter_task = None
+
+        device = daqmx_config["counter channel"].split("/")[0]
+        self.timestamp_task = nidaqmx.Task("Timestamp task")
+        channel = self.timestamp_task.ci_channels.add_ci_count_edges_chan(
+            daqmx_config["counter channel"], edge=nidaqmx.constants.Edge.RISING)
+        channel.ci_count_edges_term = daqmx_config.get("timestamp timebase",
+                                                       f"/{device}/100kHzTimebase")
+        self.timestamp_timebase_rate = daqmx_config.get("timestamp timebase rate",
+                                                        self.timestamp_timebase_rate)
+        self.timestamp_task.timing.cfg_samp_clk_timing(
+            rate,
+            source=daqmx_config["counter edge"],
+            active_edge=nidaqmx.constants.Edge.FALLING,
+            sample_mode=nidaqmx.constants.AcquisitionType.CONTINUOUS,
+        )
+
+        self.pulse_train_task = nidaqmx.Task("Trigger pulse-train task")
+        channel = self.pulse_train_task.co_channels.add_co_pulse_chan_freq(
+            daqmx_config["trigger pulse counter"],
+            idle_state=nidaqmx.constants.Level.LOW,
+            freq=rate,
+            duty_cycle=0.5,
+        )
+        channel.co_pulse_term = daqmx_config["trigger pulse terminal"]
+        self.pulse_train_task.timing.cfg_implicit_timing(
+            sample_mode=nidaqmx.constants.AcquisitionType.CONTINUOUS,
+        )
+
+        self.timestamp_task.start()
+        self._timestamp_reference = clock.time()
+        self._last_ticks = 0
+        self._tick_overflows = 0
+
+        self.pulse_train_task.start()
+
+    def read_completed_timestamps(self):
+        """ Read the timestamps of the measurements that were completed since the previous call,
+        when free-running triggering is used.
+
+        :return: Array with the timestamps (in the spynwave.clock domain).
+        """
+        ticks = np.array(self.timestamp_task.read(
+            number_of_samples_per_channel=nidaqmx.constants.READ_ALL_AVAILABLE), dtype=np.int64)
+
+        if ticks.size:
+            # Unwrap the 32-bit counter
+            overflows = np.cumsum(np.diff(ticks, prepend=self._last_ticks) < 0)
+            overflows += self._tick_overflows
+            self._last_ticks, self._tick_overflows = ticks[-1], overflows[-1]
+            ticks = ticks + overflows * 2 ** 32
+
+        return self._timestamp_reference + ticks / self.timestamp_timebase_rate
+
+    def stop_free_running(self):
+        """ Stop free-running triggering and restore the tasks for triggering single measurements.
+        """
+        for task in [self.pulse_train_task, self.timestamp_task]:
+            if task is not None:
+                task.close()
+        self.pulse_train_task = self.timestamp_task = None
+
+        self.pulse_task = self.create_trigger_pulse_task()
+        self.counter_task = self.create_counter_task()
+        self.daqmx_update_reference_count()
+
     def reset_average_count(self):
         return self.vectorstar.ch_1.clear_average_count()
 
@@ -242,10 +540,20 @@ class VNA:
         return self.vectorstar.ch_1.average_sweep_count
 
     def grab_data(self, CW_mode=False, **kwargs):
-        if CW_mode:
+        if CW_mode and self.cw_number_of_points > 1:
+            return self.grab_data_CW_buffer()
+        elif CW_mode:
             return self.grab_data_OSC(**kwargs)
-        else:
-            return self.grab_data_S2P()
+        elif self.binary_sweep_transfer:
+            try:
+                return self.grab_data_binary()
+            except (pyvisa.errors.VisaIOError, ValueError) as exc:
+                log.warning(f"Binary transfer of the sweep data failed ({exc}); falling back to "
+                            f"the ASCII transfer.")
+                self.binary_sweep_transfer = False
+                self.vectorstar.clear()
+
+        return self.grab_data_S2P()
 
     def grab_data_OSC(self, headerless=False):
         params = {
@@ -262,17 +570,9 @@ class VNA:
         data = {}
 
         if headerless:
-            number_of_values = number_of_traces * 2
-            number_of_bytes = number_of_values * 8 + number_of_traces
-            # TODO: why the + number_of_traces (or +8 according to labview)
-            raw = self.vectorstar.read_bytes(number_of_bytes)
-            for param in params:
-                subset = raw[:16]
-                data.update({
-                    param + " real": struct.unpack(">d", subset[:8])[0],
-                    param + " imag": struct.unpack(">d", subset[8:])[0],
-                })
-                raw = raw[17:]
+            # Each trace consists of two doubles and a separator byte
+            raw = self.vectorstar.read_bytes(number_of_traces * OSC_DTYPE.itemsize)
+            data = decode_osc_headerless(raw, params)
 
         else:
             for param in params:
@@ -289,19 +589,74 @@ class VNA:
 
         return data
 
-    def grab_data_S2P(self):
-        # TODO: check if this can be done using SCPI commands
+    def _read_block(self):
+        """ Read a (binary) data block with a block header from the VNA, and return its contents.
+        """
+        length = int(self.vectorstar.read_bytes(2).decode('latin')[1])
+        length = int(self.vectorstar.read_bytes(length).decode('latin')) + 1
 
+        # Remove the terminating character
+        return self.vectorstar.read_bytes(length)[:-1]
+
+    def _query_binary_values(self, command):
+        self.vectorstar.write(command)
+        return np.frombuffer(self._read_block(), dtype=">f8")
+
+    def grab_data_binary(self):
+        """ Transfer the data of a frequency sweep in binary format: for every trace the real and
+        imaginary parts as 8-byte floats. The frequencies of the sweep are determined when the
+        sweep is prepared; if they are not known, they are transferred once and cached until the
+        sweep is changed.
+        """
         # Set output format
         self.vectorstar.datablock_header_format = 1
-        self.vectorstar.datablock_numeric_format = "ASCII"
-        self.vectorstar.datafile_include_heading = True
-        self.vectorstar.datafile_frequency_unit = "HZ"
-        self.vectorstar.datafile_parameter_format = "REIM"
+        self.vectorstar.datablock_numeric_format = "8byte"
+
+        if self.cached_frequencies is None:
+            self.cached_frequencies = self._query_binary_values(":SENS1:FREQ:DATA?")
+
+        data = {"Frequency (Hz)": self.cached_frequencies}
+        data.update(self._grab_traces_binary(self.cached_frequencies.size))
 
-        # Check for errors before continuing
         self.vectorstar.check_errors()
 
+        return pd.DataFrame(data)
+
+    def grab_data_CW_buffer(self):
+        """ Transfer the points of a buffered CW measurement as a single binary block per trace.
+
+        :return: A dict with an array of values for the real and imaginary parts of each of the
+            S-parameters.
+        """
+        return self._grab_traces_binary(self.cw_number_of_points)
+
+    def _grab_traces_binary(self, number_of_points):
+        data = {}
+        for trace, param in enumerate(self.measurement_parameters(), start=1):
+            values = self._query_binary_values(f":CALC1:PAR{trace}:DATA:SDAT?")
+            if values.size != 2 * number_of_points:
+                raise ValueError(f"Received {values.size} values for {param}, expected "
+                                 f"{2 * number_of_points}.")
+
+            data[param + " real"] = values[0::2]
+            data[param + " imag"] = values[1::2]
+
+        return data
+
+    def grab_data_S2P(self):
+        # TODO: check if this can be done using SCPI commands
+
+        with self.vectorstar.batch_settings():
+            # Set output format
+            self.vectorstar.datablock_header_format = 1
+            self.vectorstar.datablock_numeric_format = "ASCII"
+            self.vectorstar.datafile_include_heading = True
+            self.vectorstar.datafile_frequency_unit = "HZ"
+            self.vectorstar.datafile_parameter_format = "REIM"
+
+            # Check for errors before continuing
+            self.vectorstar.check_errors()
+
         if self.vectorstar.datablock_header_format == 2:
             # Output the S2P file data.
             raw = self.vectorstar.ask("OS2P")
@@ -367,5 +722,12 @@ class VNA:
         if self.trigger_task is not None:
             self.trigger_task.close()
 
+        if self.pulse_task is not None:
+            self.pulse_task.close()
+
+        for task in [self.pulse_train_task, self.timestamp_task]:
+            if task is not None:
+                task.close()
+
         if self.counter_task is not None:
             self.counter_task.close()
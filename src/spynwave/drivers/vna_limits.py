@@ -0,0 +1,110 @@
+"""
+This file is part of the SpynWave package.
+
+This file contains the discovery of the limits of the VNA (the frequency range within the
+calibration, the bandwidth and the power level), and an on-disk cache of the last-known limits per
+instrument, such that the interface can be populated without waiting for the VNA.
+"""
+
+import logging
+from pathlib import Path
+
+from yaml import safe_dump, safe_load
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+log.addHandler(logging.NullHandler())
+
+
+# File in the Spynwave folder in the user home directory
+CACHE_FILE = Path.home() / "spynwave" / "vna_limits.yaml"
+
+
+def query_vna_limits(vectorstar):
+    """ Inquire the frequency range within the calibration, the bandwidth, and the power level from
+    the VNA. The VNA is returned to its original sweep settings afterwards.
+
+    :param vectorstar: A connected AnritsuMS4644B instance.
+    :return: A dict with the limits; frequencies in Hz, the bandwidth in Hz, and the power level in
+        dBm.
+    """
+    channel = vectorstar.ch_1
+
+    # First get current state, such that it can be returned to afterwards
+    cw_mode_enabled = channel.cw_mode_enabled
+    frequency_cw = channel.frequency_CW
+    number_of_points = channel.number_of_points
+    frequency_start = channel.frequency_start
+    frequency_stop = channel.frequency_stop
+
+    # Set widest possible range
+    channel.cw_mode_enabled = False
+    channel.frequency_start = channel.FREQUENCY_RANGE[0]
+    channel.frequency_stop = channel.FREQUENCY_RANGE[1]
+    channel.number_of_points = 100000
+
+    # Get the values that are within the calibration
+    limits = {
+        "frequency_min": channel.frequency_start,
+        "frequency_max": channel.frequency_stop,
+        "frequency_points": channel.number_of_points,
+        "frequency_cw": frequency_cw,
+        "bandwidth": channel.bandwidth,
+        "power_level": channel.pt_1.power_level,
+    }
+
+    # Return to the original values
+    channel.cw_mode_enabled = cw_mode_enabled
+    channel.frequency_CW = frequency_cw
+    channel.number_of_points = number_of_points
+    channel.frequency_start = frequency_start
+    channel.frequency_stop = frequency_stop
+
+    return limits
+
+
+def load_cached_vna_limits(filename=CACHE_FILE):
+    """ Load the limits of the most recently used VNA from the cache.
+
+    :param filename: The cache file.
+    :return: A tuple of the identification of the VNA and a dict with the limits, or None if no
+        limits are cached.
+    """
+    try:
+        with open(filename, "r") as file:
+            cache = safe_load(file)
+        identity = cache["last"]
+        return identity, cache["limits"][identity]
+    except FileNotFoundError:
+        return None
+    except Exception as exc:  # The cache is only a convenience, it should never break anything
+        log.warning(f"Could not load the cached VNA limits from {filename}: {exc}")
+        return None
+
+
+def store_vna_limits(identity, limits, filename=CACHE_FILE):
+    """ Store the limits of a VNA in the cache and mark it as the most recently used VNA.
+
+    :param identity: The identification (*IDN?) of the VNA.
+    :param limits: A dict with the limits, as returned by :func:`query_vna_limits`.
+    :param filename: The cache file.
+    """
+    filename = Path(filename)
+    try:
+        with open(filename, "r") as file:
+            cache = safe_load(file) or {}
+    except FileNotFoundError:
+        cache = {}
+    except Exception as exc:
+        log.warning(f"Discarding the cached VNA limits in {filename}: {exc}")
+        cache = {}
+
+    cache.setdefault("limits", {})[identity] = {key: float(value) for key, value in limits.items()}
+    cache["last"] = identity
+
+    try:
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        with open(filename, "w") as file:
+            safe_dump(cache, file)
+    except OSError as exc:
+        log.warning(f"Could not store the VNA limits in {filename}: {exc}")
@@ -4,11 +4,8 @@ This file is part of the SpynWave package.
 
 import logging
 
-from pyvisa import VisaIOError
-from pyvisa.constants import VI_ERROR_TMO
-
 from pymeasure.experiment import Results, unique_filename
-from pymeasure.display.Qt import QtGui
+from pymeasure.display.Qt import QtCore, QtGui
 from pymeasure.display.widgets.dock_widget import DockWidget
 from pymeasure.display.widgets import ImageWidget
 
@@ -16,8 +13,9 @@ from pymeasure.display.widgets import ImageWidget
 from pymeasure.display.curves import ResultsImage
 
 from spynwave.procedure import PSWSProcedure
-from spynwave.drivers import VNA
+from spynwave.drivers.vna_limits import load_cached_vna_limits, store_vna_limits
 from spynwave.widgets import SpynWaveWindowBase
+from spynwave.widgets.vna_limits_worker import VNALimitsWorker
 from spynwave.pymeasure_patches.pandas_formatter import CSVFormatterPandas
 
 
@@ -44,9 +42,14 @@ class PSWSWindow(SpynWaveWindowBase):
                 "measurement_type",
                 "rf_frequency",
                 "magnetic_field",
+                "field_feedback",
                 "frequency_start",
                 "frequency_end",
                 "frequency_step",
+                "frequency_dense_segment",
+                "frequency_dense_center",
+                "frequency_dense_span",
+                "frequency_dense_step",
                 "frequency_averages",
                 "field_start",
                 "field_end",
@@ -70,6 +73,9 @@ class PSWSWindow(SpynWaveWindowBase):
                 "measurement_ports",
                 "rf_power",
                 "rf_bandwidth",
+                "rf_cw_points",
+                "rf_pipelined",
+                "rf_free_running_rate",
             ),
             x_axis="Field (T)",
             y_axis="S11 real",
@@ -82,8 +88,21 @@ class PSWSWindow(SpynWaveWindowBase):
             widget_list=(self.dock_widget, self.image_widget)
         )
 
-        # TODO: this should somehow be done, but not upon initialisation
-        # self.update_inputs_from_vna()
+        # Populate the limits of the VNA from the cache; the VNA is only queried (in the background,
+        # once the window is shown) if no limits are cached, or on demand via the menu
+        if not self.update_inputs_from_cache():
+            QtCore.QTimer.singleShot(0, self.update_inputs_from_vna)
+
+        vna_menu = self.menuBar().addMenu("&VNA")
+        self.action_refresh_vna_limits = QtGui.QAction("Refresh limits from VNA", self)
+        self.action_refresh_vna_limits.triggered.connect(self.update_inputs_from_vna)
+        vna_menu.addAction(self.action_refresh_vna_limits)
+
+        # Querying the limits reconfigures the VNA, so it is not allowed during a measurement
+        self.manager.running.connect(self._update_vna_menu)
+        self.manager.finished.connect(self._update_vna_menu)
+        self.manager.failed.connect(self._update_vna_menu)
+        self.manager.abort_returned.connect(self._update_vna_menu)
 
         # Link the dc excitation checkbox to the measurement type
         # Required for some dc-sweep parameters to show up
@@ -94,6 +113,9 @@ class PSWSWindow(SpynWaveWindowBase):
         if procedure is None:
             procedure = self.make_procedure()
 
+        if self._queue_after_vna_limits(procedure):
+            return
+
         folder = self.directory
         filename = self.filename
         measurement_type = procedure.measurement_type
@@ -144,55 +166,96 @@ class PSWSWindow(SpynWaveWindowBase):
             self.inputs.dc_excitation.setChecked(self._old_dc_checked_state)
             self._old_dc_checked_state = None
 
+    # Limits of the VNA
+    vna_limits_timeout = 30  # s
+    _vna_limits_worker = None
+
+    def update_inputs_from_cache(self):
+        """ Set the last-known values for the frequency range and bandwidth of the VNA as new
+        default values in the interface.
+
+        :return: True if cached limits were found, False otherwise.
+        """
+        cached = load_cached_vna_limits()
+        if cached is None:
+            return False
+
+        identity, limits = cached
+        log.info(f"Using the cached limits of VNA {identity}.")
+        self._set_inputs_from_vna_limits(limits)
+        return True
+
     def update_inputs_from_vna(self):
         """ Inquire values for the frequency range and bandwidth from the VNA and set them as new
-        default values in the interface. """
-        # TODO: see if this can be made asynchronous
-
-        try:
-            with VNA.connect_vectorstar() as vectorstar:
-
-                # First get current state, such that it can be returned to afterwards
-                cw_mode_enabled = vectorstar.ch_1.cw_mode_enabled
-                frequency_cw = vectorstar.ch_1.frequency_CW
-                number_of_points = vectorstar.ch_1.number_of_points
-                frequency_start = vectorstar.ch_1.frequency_start
-                frequency_stop = vectorstar.ch_1.frequency_stop
-
-                # Set widest possible range
-                vectorstar.ch_1.cw_mode_enabled = False
-                vectorstar.ch_1.frequency_start = vectorstar.ch_1.FREQUENCY_RANGE[0]
-                vectorstar.ch_1.frequency_stop = vectorstar.ch_1.FREQUENCY_RANGE[1]
-                vectorstar.ch_1.number_of_points = 100000
-
-                # Get the values that are within the calibration
-                frequency_min = vectorstar.ch_1.frequency_start * 1e-9
-                frequency_max = vectorstar.ch_1.frequency_stop * 1e-9
-                frequency_steps = vectorstar.ch_1.number_of_points
-                bandwidth = vectorstar.ch_1.bandwidth
-                power_level = vectorstar.ch_1.pt_1.power_level
-
-                # Return to the original values
-                vectorstar.ch_1.cw_mode_enabled = cw_mode_enabled
-                vectorstar.ch_1.frequency_CW = frequency_cw
-                vectorstar.ch_1.number_of_points = number_of_points
-                vectorstar.ch_1.frequency_start = frequency_start
-                vectorstar.ch_1.frequency_stop = frequency_stop
-
-                vectorstar.return_to_local()
-        except VisaIOError as exc:
-            if not exc.error_code == VI_ERROR_TMO:
-                raise exc
-            log.warning("Could not retrieve limits from VNA: timed out.")
+        default values in the interface. The VNA is queried in the background; the interface is
+        updated (and the limits are cached) once the values are received.
+
+        Querying the limits reconfigures the VNA, hence the VNA is not queried while a measurement
+        is running.
+        """
+        if self.manager.is_running():
+            log.warning("Cannot retrieve the limits from the VNA while a measurement is running.")
+            return
+
+        if self._vna_limits_worker is not None and self._vna_limits_worker.isRunning():
+            return
+
+        worker = VNALimitsWorker(timeout=self.vna_limits_timeout, parent=self)
+        worker.limits_found.connect(self._vna_limits_found)
+        worker.failed.connect(self._vna_limits_failed)
+        self._vna_limits_worker = worker
+
+        QtCore.QTimer.singleShot(int(self.vna_limits_timeout * 1000), self._vna_limits_timed_out)
+        worker.start()
+
+    def _vna_limits_found(self, identity, limits):
+        store_vna_limits(identity, limits)
+
+        if self._vna_limits_worker.expired:
+            log.info("Retrieved the limits from VNA after the timeout; inputs are not updated.")
             return
 
+        self._set_inputs_from_vna_limits(limits)
+
+    def _vna_limits_failed(self, message):
+        log.warning(f"Could not retrieve limits from VNA: {message}")
+
+    def _vna_limits_timed_out(self):
+        worker = self._vna_limits_worker
+        if worker is not None and worker.isRunning() and not worker.expired:
+            worker.expired = True
+            log.warning("Could not retrieve limits from VNA: timed out.")
+
+    def _update_vna_menu(self, *args):
+        self.action_refresh_vna_limits.setEnabled(not self.manager.is_running())
+
+    def _queue_after_vna_limits(self, procedure):
+        """ If the VNA is still queried for its limits, postpone queueing the procedure until the
+        query is finished, such that a measurement does not use the VNA at the same time (without
+        blocking the interface while waiting).
+
+        :return: True if queueing the procedure is postponed, False otherwise.
+        """
+        worker = self._vna_limits_worker
+        if worker is None or not worker.isRunning():
+            return False
+
+        log.info("Measurement is queued once the limits are retrieved from the VNA.")
+        worker.finished.connect(lambda: self.queue(procedure))
+        return True
+
+    def _set_inputs_from_vna_limits(self, limits):
+        frequency_min = limits["frequency_min"] * 1e-9
+        frequency_max = limits["frequency_max"] * 1e-9
+        frequency_steps = limits["frequency_points"]
+
         self.inputs.frequency_start.setMinimum(frequency_min)
         self.inputs.frequency_start.setMaximum(frequency_max)
         self.inputs.frequency_start.setValue(frequency_min)
 
-        self.inputs.frequency_stop.setMinimum(frequency_min)
-        self.inputs.frequency_stop.setMaximum(frequency_max)
-        self.inputs.frequency_stop.setValue(frequency_max)
+        self.inputs.frequency_end.setMinimum(frequency_min)
+        self.inputs.frequency_end.setMaximum(frequency_max)
+        self.inputs.frequency_end.setValue(frequency_max)
 
         # self.inputs.frequency_step.setMaximum(frequency_steps)
         step = (frequency_max - frequency_min) / frequency_steps
@@ -201,10 +264,10 @@ class PSWSWindow(SpynWaveWindowBase):
 
         self.inputs.rf_frequency.setMinimum(frequency_min)
         self.inputs.rf_frequency.setMaximum(frequency_max)
-        self.inputs.rf_frequency.setValue(frequency_cw)
+        self.inputs.rf_frequency.setValue(limits["frequency_cw"] * 1e-9)
 
-        self.inputs.rf_bandwidth.setValue(bandwidth)
-        self.inputs.rf_power.setValue(power_level)
+        self.inputs.rf_bandwidth.setValue(limits["bandwidth"])
+        self.inputs.rf_power.setValue(limits["power_level"])
 
 
 # Monkeypatch the ResultsImage, because it is not working correctly presently
@@ -14,6 +14,7 @@ from pymeasure.experiment import (
     IntegerParameter, Metadata
 )
 
+from spynwave.clock import clock
 from spynwave.drivers import Magnet, MagnetBase
 
 # Setup logging
@@ -95,7 +96,7 @@ class MagnetCalibrationProcedure(Procedure):
 
     # Metadata to be stored in the file
     measurement_date = Metadata("Measurement date", fget=datetime.now)
-    start_time = Metadata("Measurement timestamp", fget=time)
+    start_time = Metadata("Measurement timestamp", fget=clock.time)
     magnet_setup = Metadata("Magnet calibrated for", fget="magnet.name")
 
     # Define data columns
@@ -123,6 +124,9 @@ class MagnetCalibrationProcedure(Procedure):
         """ Set up the properties and devices required for the measurement.
         The devices are connected and the default parameters are set.
         """
+        # Anchor the clock that is used for all timestamps to the wall-clock time
+        clock.anchor()
+
         # Connect to instruments
         self.magnet = Magnet(mirror_fields=False)
 
@@ -163,7 +167,7 @@ class MagnetCalibrationProcedure(Procedure):
                                                   should_stop=self.should_stop)
 
         data = {
-            "Timestamp (s)": time(),
+            "Timestamp (s)": clock.time(),
             "Current (A)": self.magnet.current_setpoint,
             # The wait_for_stable_field returns the stable field value
             "Field (T)": field * self.field_scaling_factor
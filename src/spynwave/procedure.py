@@ -11,9 +11,10 @@ import pandas as pd
 
 from pymeasure.experiment import (
     Procedure, Parameter, FloatParameter, BooleanParameter,
-    ListParameter, Metadata
+    IntegerParameter, ListParameter, Metadata
 )
 
+from spynwave.clock import clock
 from spynwave.drivers import Magnet, VNA, SourceMeter
 from spynwave.procedures import MixinFieldSweep, MixinFrequencySweep, MixinTimeSweep, MixinDCSweep
 
@@ -93,6 +94,12 @@ class PSWSProcedure(MixinFieldSweep, MixinFrequencySweep, MixinTimeSweep, MixinD
         "Perform with mirrored field",
         default=False,
     )
+    field_feedback = BooleanParameter(
+        "Closed-loop field correction",
+        default=False,
+        group_by="measurement_type",
+        group_condition=lambda v: v in ["Frequency sweep", "Time sweep"],
+    )
 
     # VNA settings
     rf_advanced_settings = BooleanParameter(
@@ -124,6 +131,29 @@ class PSWSProcedure(MixinFieldSweep, MixinFrequencySweep, MixinTimeSweep, MixinD
         default="sweep-by-sweep",
         group_by="rf_advanced_settings",
     )
+    rf_cw_points = IntegerParameter(
+        "CW points per trigger",
+        default=1,
+        minimum=1,
+        maximum=100000,
+        group_by=["rf_advanced_settings", "measurement_type"],
+        group_condition=[True, lambda v: v != "Frequency sweep"],
+    )
+    rf_pipelined = BooleanParameter(
+        "Pipelined CW triggering",
+        default=False,
+        group_by=["rf_advanced_settings", "measurement_type"],
+        group_condition=[True, lambda v: v != "Frequency sweep"],
+    )
+    rf_free_running_rate = FloatParameter(
+        "Free-running trigger rate",
+        units="Hz",
+        default=0,
+        minimum=0,
+        maximum=1e5,
+        group_by=["rf_advanced_settings", "measurement_type"],
+        group_condition=[True, lambda v: v != "Frequency sweep"],
+    )
 
     saturate_field_before_measurement = BooleanParameter(
         "Saturate field before measurement",
@@ -201,7 +231,7 @@ class PSWSProcedure(MixinFieldSweep, MixinFrequencySweep, MixinTimeSweep, MixinD
 
     # Metadata to be stored in the file
     measurement_date = Metadata("Measurement date", fget=datetime.now)
-    start_time = Metadata("Measurement timestamp", fget=time)
+    start_time = Metadata("Measurement timestamp", fget=clock.time)
     magnet_setup = Metadata("Magnet calibrated for", fget="magnet.name")
     VNA_calibrated = Metadata("VNA calibrated", fget="vna.vectorstar.ch_1.calibration_enabled")
     VNA_bandwidth = Metadata("RF bandwidth", fget="vna.vectorstar.ch_1.bandwidth", units="Hz")
@@ -251,6 +281,9 @@ class PSWSProcedure(MixinFieldSweep, MixinFrequencySweep, MixinTimeSweep, MixinD
         """ Set up the properties and devices required for the measurement.
         The devices are connected and the default parameters are set.
         """
+        # Anchor the clock that is used for all timestamps to the wall-clock time
+        clock.anchor()
+
         # Connect to instruments
         freq_sweep = self.measurement_type == "Frequency sweep"
         self.vna = VNA(use_DAQmx=False if freq_sweep else None)
@@ -335,6 +368,26 @@ class PSWSProcedure(MixinFieldSweep, MixinFrequencySweep, MixinTimeSweep, MixinD
         self.magnet.wait_for_stable_field(interval=2, timeout=60, should_stop=self.should_stop)
         self.sleep(self.saturation_time)
 
+    def vna_control_settings(self):
+        """ Return the trigger settings for the VNA control thread. Pipelined triggering is only
+        used if the VNA is triggered with hardware-timed pulses; with the (slower) trigger line or
+        SCPI triggering, the next measurement could finish before the previous one is read.
+
+        :raises ValueError: if free-running triggering is requested but not available.
+        """
+        if self.rf_free_running_rate > 0 and not self.vna.hardware_trigger_available:
+            raise ValueError("Free-running triggering requires DAQmx with a 'trigger pulse "
+                             "counter' in the daqmx configuration; set the free-running trigger "
+                             "rate to 0 to trigger the measurements one by one.")
+
+        pipelined = self.rf_pipelined
+        if pipelined and not self.vna.hardware_trigger_available:
+            log.warning("Pipelined triggering requires DAQmx with a 'trigger pulse counter'; "
+                        "falling back to sequential triggering.")
+            pipelined = False
+
+        return dict(pipelined=pipelined, free_running_rate=self.rf_free_running_rate)
+
     def get_mixin_method(self, base_method):
         spec = str(self.measurement_type).replace(" ", "_").lower()
         method_name = f"{base_method}_{spec}"
@@ -359,7 +412,7 @@ class PSWSProcedure(MixinFieldSweep, MixinFrequencySweep, MixinTimeSweep, MixinD
 
         # Add the timestamp column (if not existing)
         if "Timestamp (s)" not in data:
-            data["Timestamp (s)"] = time()
+            data["Timestamp (s)"] = clock.time()
 
         # Add the runtime column
         if "Runtime (s)" not in data:
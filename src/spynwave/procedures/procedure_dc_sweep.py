@@ -87,7 +87,8 @@ class MixinDCSweep(ThreadedSweepBase):
 
     def startup_dc_sweep(self):
         self.magnet.set_field(self.field_start * 1e-3)
-        self.vna.prepare_cw_sweep(cw_frequency=self.rf_frequency * 1e9, headerless=True)
+        self.vna.prepare_cw_sweep(cw_frequency=self.rf_frequency * 1e9, headerless=True,
+                                  number_of_points=self.rf_cw_points)
         self.magnet.wait_for_stable_field(interval=3, timeout=60,
                                           sleep_fn=self.sleep,
                                           should_stop=self.should_stop)
@@ -110,13 +111,14 @@ class MixinDCSweep(ThreadedSweepBase):
                                              publish_data=True,)
 
         self.gauss_probe_thread = GaussProbeThread(self, self.magnet)
-        self.vna_control_thread = VNAControlThread(self, self.vna, delay=0.001)
+        self.vna_control_thread = VNAControlThread(self, self.vna, delay=0.001,
+                                                   **self.vna_control_settings())
 
         # self.source_meter_thread = SourceMeterThread(self, self.source_meter, delay=0.001)
 
         self.threads_startup(
             data_producing_threads=[
-                self.gauss_probe_thread,  # First thread is expected to be slowest in producing data
+                self.gauss_probe_thread,
                 self.vna_control_thread,
                 self.dc_sweep_thread,
                 # self.source_meter_thread,
@@ -124,6 +126,10 @@ class MixinDCSweep(ThreadedSweepBase):
             sweep_thread=self.dc_sweep_thread,
             static_data={"Frequency (Hz)": self.rf_frequency * 1e9},
             time_column="Timestamp (s)",
+            batch_mode=True,
+            # Align all data onto the (fastest) VNA datapoints
+            alignment="linear",
+            master_thread=self.vna_control_thread,
         )
 
     def execute_dc_sweep(self):
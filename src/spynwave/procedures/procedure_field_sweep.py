@@ -68,7 +68,8 @@ class MixinFieldSweep(ThreadedSweepBase):
 
     def startup_field_sweep(self):
         self.magnet.set_field(self.field_start * 1e-3)
-        self.vna.prepare_cw_sweep(cw_frequency=self.rf_frequency * 1e9, headerless=True)
+        self.vna.prepare_cw_sweep(cw_frequency=self.rf_frequency * 1e9, headerless=True,
+                                  number_of_points=self.rf_cw_points)
         self.magnet.wait_for_stable_field(interval=3, timeout=60,
                                           sleep_fn=self.sleep,
                                           should_stop=self.should_stop)
@@ -81,20 +82,25 @@ class MixinFieldSweep(ThreadedSweepBase):
                                                    publish_data=False, )
 
         self.gauss_probe_thread = GaussProbeThread(self, self.magnet)
-        self.vna_control_thread = VNAControlThread(self, self.vna, delay=0.001)
+        self.vna_control_thread = VNAControlThread(self, self.vna, delay=0.001,
+                                                   **self.vna_control_settings())
 
         if self.source_meter is not None:
             self.source_meter_thread = SourceMeterThread(self, self.source_meter, delay=0.001)
 
         self.threads_startup(
             data_producing_threads=[
-                self.gauss_probe_thread,  # First thread is expected to be slowest in producing data
+                self.gauss_probe_thread,
                 self.vna_control_thread,
                 self.source_meter_thread,
             ],
             sweep_thread=self.field_sweep_thread,
             static_data={"Frequency (Hz)": self.rf_frequency * 1e9},
             time_column="Timestamp (s)",
+            batch_mode=True,
+            # Align all data onto the (fastest) VNA datapoints
+            alignment="linear",
+            master_thread=self.vna_control_thread,
         )
 
     def execute_field_sweep(self):
@@ -117,6 +123,8 @@ class MixinFieldSweep(ThreadedSweepBase):
         overhead = 10  # Just a very poor estimate
         duration_sat = self.saturation_time + \
             abs(2 * self.saturation_field * 1e-3 / magnet.field_ramp_rate)
+        # The sweep itself takes exactly the swept range divided by the ramp rate (the sweep steps
+        # are scheduled at fixed deadlines), followed by ramping down the field
         duration_sweep = abs((self.field_start - self.field_end) / self.field_ramp_rate) + \
-            self.field_end * 1e-3 / magnet.field_ramp_rate
+            abs(self.field_end * 1e-3 / magnet.field_ramp_rate)
         return overhead + duration_sat + duration_sweep
@@ -3,15 +3,16 @@ This file is part of the SpynWave package.
 """
 
 import logging
-from time import time
 
 import pandas as pd
 
 from pymeasure.experiment import (
-    FloatParameter, IntegerParameter
+    FloatParameter, IntegerParameter, BooleanParameter
 )
 
+from spynwave.clock import clock
 from spynwave.drivers import Magnet
+from spynwave.drivers.vna import frequency_segments
 
 # Setup logging
 log = logging.getLogger(__name__)
@@ -51,6 +52,42 @@ class MixinFrequencySweep:
         group_by="measurement_type",
         group_condition="Frequency sweep",
     )
+    frequency_dense_segment = BooleanParameter(
+        "Dense frequency segment",
+        default=False,
+        group_by="measurement_type",
+        group_condition="Frequency sweep",
+    )
+    frequency_dense_center = FloatParameter(
+        "Dense segment center",
+        default=10,
+        minimum=0,
+        maximum=40,
+        step=1,
+        units="GHz",
+        group_by=["measurement_type", "frequency_dense_segment"],
+        group_condition=["Frequency sweep", True],
+    )
+    frequency_dense_span = FloatParameter(
+        "Dense segment span",
+        default=1,
+        minimum=0,
+        maximum=40,
+        step=0.1,
+        units="GHz",
+        group_by=["measurement_type", "frequency_dense_segment"],
+        group_condition=["Frequency sweep", True],
+    )
+    frequency_dense_step = FloatParameter(
+        "Dense segment step size",
+        default=0.01,
+        minimum=0.000404904,
+        maximum=37.5,
+        step=0.01,
+        units="GHz",
+        group_by=["measurement_type", "frequency_dense_segment"],
+        group_condition=["Frequency sweep", True],
+    )
     frequency_averages = IntegerParameter(
         "Number of averages (VNA)",
         default=2,
@@ -61,26 +98,54 @@ class MixinFrequencySweep:
     )
 
     def startup_frequency_sweep(self):
+        if self.frequency_dense_segment:
+            try:
+                segments = self.frequency_segments()
+            except ValueError as exc:
+                raise ValueError(
+                    f"Invalid dense frequency segment: the segment around "
+                    f"{self.frequency_dense_center} GHz (span {self.frequency_dense_span} GHz) "
+                    f"should overlap with the sweep from {self.frequency_start} GHz to "
+                    f"{self.frequency_end} GHz.") from exc
+
         self.vna.configure_averaging(
             enabled=True,
             average_count=self.frequency_averages,
             averaging_type=self.average_type,
         )
 
-        self.vna.prepare_frequency_sweep(
+        if self.frequency_dense_segment:
+            self.vna.prepare_segmented_frequency_sweep(segments)
+        else:
+            self.vna.prepare_frequency_sweep(
+                frequency_start=self.frequency_start * 1e9,
+                frequency_stop=self.frequency_end * 1e9,
+                frequency_stepsize=self.frequency_step * 1e9,
+            )
+
+        log.info(f"Ramping field to {self.magnetic_field} mT")
+        if self.field_feedback:
+            self.magnet.set_field_closed_loop(self.magnetic_field * 1e-3, controlled=True,
+                                              should_stop=self.should_stop)
+        else:
+            self.magnet.set_field(self.magnetic_field * 1e-3, controlled=True)
+            log.info("Waiting for field to stabilize")
+            self.magnet.wait_for_stable_field(interval=3, timeout=60, should_stop=self.should_stop)
+
+    def frequency_segments(self):
+        """ Return the segments (in Hz) of a frequency sweep with a dense segment. """
+        return frequency_segments(
             frequency_start=self.frequency_start * 1e9,
             frequency_stop=self.frequency_end * 1e9,
             frequency_stepsize=self.frequency_step * 1e9,
+            dense_start=(self.frequency_dense_center - self.frequency_dense_span / 2) * 1e9,
+            dense_stop=(self.frequency_dense_center + self.frequency_dense_span / 2) * 1e9,
+            dense_stepsize=self.frequency_dense_step * 1e9,
         )
 
-        log.info(f"Ramping field to {self.magnetic_field} mT")
-        self.magnet.set_field(self.magnetic_field * 1e-3, controlled=True)
-        log.info("Waiting for field to stabilize")
-        self.magnet.wait_for_stable_field(interval=3, timeout=60, should_stop=self.should_stop)
-
     def execute_frequency_sweep(self):
         self.vna.reset_average_count()
-        start = time()
+        start = clock.time()
 
         field_points = [self.magnet.measure_field()]
         if self.source_meter is not None:
@@ -99,7 +164,7 @@ class MixinFrequencySweep:
                 break
             self.sleep()
 
-        stop = time()
+        stop = clock.time()
 
         data = self.vna.grab_data(CW_mode=False)
 
@@ -127,6 +192,13 @@ class MixinFrequencySweep:
 
         frequency_span = self.frequency_end - self.frequency_start
         frequency_points = int(round(frequency_span / self.frequency_step))
+        if self.frequency_dense_segment:
+            try:
+                frequency_points = sum(points for _, _, points in self.frequency_segments())
+            except ValueError:
+                # The dense segment is invalid (e.g. while it is being edited); this is reported
+                # when the measurement is started
+                pass
         time_per_sweep = ports * time_per_point * frequency_points
 
         duration = self.frequency_averages * time_per_sweep
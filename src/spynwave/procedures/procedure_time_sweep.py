@@ -3,12 +3,12 @@ This file is part of the SpynWave package.
 """
 
 import logging
-from time import time
 
 from pymeasure.experiment import (
     FloatParameter,
 )
 
+from spynwave.clock import clock
 from spynwave.drivers import Magnet
 from spynwave.procedures.threaded_sweep_base import ThreadedSweepBase
 from spynwave.procedures.threads import (
@@ -40,28 +40,40 @@ class MixinTimeSweep(ThreadedSweepBase):
 
     def startup_time_sweep(self):
         log.info(f"Ramping field to {self.magnetic_field} mT")
-        self.magnet.set_field(self.magnetic_field * 1e-3, controlled=True)
+        if self.field_feedback:
+            # The closed-loop correction waits for the field itself
+            self.magnet.set_field_closed_loop(self.magnetic_field * 1e-3, controlled=True,
+                                              should_stop=self.should_stop)
+        else:
+            self.magnet.set_field(self.magnetic_field * 1e-3, controlled=True)
 
-        self.vna.prepare_cw_sweep(cw_frequency=self.rf_frequency * 1e9, headerless=True)
+        self.vna.prepare_cw_sweep(cw_frequency=self.rf_frequency * 1e9, headerless=True,
+                                  number_of_points=self.rf_cw_points)
 
-        log.info("Waiting for field to stabilize")
-        self.magnet.wait_for_stable_field(interval=3, timeout=60, should_stop=self.should_stop)
+        if not self.field_feedback:
+            log.info("Waiting for field to stabilize")
+            self.magnet.wait_for_stable_field(interval=3, timeout=60, should_stop=self.should_stop)
 
         # Prepare the parallel methods for the sweep
         self.gauss_probe_thread = GaussProbeThread(self, self.magnet)
-        self.vna_control_thread = VNAControlThread(self, self.vna, delay=0.001)
+        self.vna_control_thread = VNAControlThread(self, self.vna, delay=0.001,
+                                                   **self.vna_control_settings())
 
         if self.source_meter is not None:
             self.source_meter_thread = SourceMeterThread(self, self.source_meter, delay=0.001)
 
         self.threads_startup(
             data_producing_threads=[
-                self.gauss_probe_thread,  # First thread is expected to be slowest in producing data
+                self.gauss_probe_thread,
                 self.vna_control_thread,
                 self.source_meter_thread,
             ],
             static_data={"Frequency (Hz)": self.rf_frequency * 1e9},
             time_column="Timestamp (s)",
+            batch_mode=True,
+            # Align all data onto the (fastest) VNA datapoints
+            alignment="nearest",
+            master_thread=self.vna_control_thread,
         )
 
     def execute_time_sweep(self):
@@ -69,7 +81,7 @@ class MixinTimeSweep(ThreadedSweepBase):
 
         end_time = self.start_time + self.time_duration
 
-        while (current_time := time()) < end_time and not self.should_stop():
+        while (current_time := clock.time()) < end_time and not self.should_stop():
             self.emit('progress', (current_time - end_time) / self.time_duration * 100)
             self.sleep(0.1)
 
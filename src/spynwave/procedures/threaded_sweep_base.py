@@ -5,6 +5,7 @@ This file is part of the SpynWave package.
 import logging
 
 from spynwave.drivers import DataThread
+from spynwave.drivers.telemetry import format_telemetry
 
 # Setup logging
 log = logging.getLogger(__name__)
@@ -18,16 +19,31 @@ class ThreadedSweepBase:
     _sweep_thread = None
     _data_thread = None
 
-    def threads_startup(self, data_producing_threads, sweep_thread=None, **kwargs):
+    # Telemetry of the threads at the end of the sweep
+    telemetry_summary = None
+
+    def threads_startup(self, data_producing_threads, sweep_thread=None, master_thread=None,
+                        **kwargs):
         if not isinstance(data_producing_threads, (list, tuple)):
             data_producing_threads = [data_producing_threads]
 
         # store threads in thread-list, while omitting any None-types
         self._threads = [thread for thread in data_producing_threads if thread is not None]
 
+        # Use the timestamps of the master thread (by default the first thread) for aligning data
+        if master_thread is not None:
+            kwargs["master"] = self._threads.index(master_thread)
+
         # Create a data-thread
         data_queues = [thread.data_queue for thread in self._threads]
         self._data_thread = DataThread(self, data_queues=data_queues, **kwargs)
+        # Wake up the data-thread whenever new data is produced
+        for thread in self._threads:
+            thread.data_event = self._data_thread.data_event
+
+        # Periodically report the telemetry of the threads in the log
+        self._data_thread.telemetry_callback = self.threads_log_telemetry
+
         # Ensure this is started first and stopped last
         self._threads.insert(0, self._data_thread)
 
@@ -51,6 +67,18 @@ class ThreadedSweepBase:
         for thread in self._threads[::-1]:
             thread.shutdown()
 
+        self.telemetry_summary = self.threads_telemetry()
+        self.threads_log_telemetry()
+
+    def threads_telemetry(self):
+        """ Return the live metrics of the threads as a dict with {'thread name': metrics} pairs.
+        """
+        return {thread.__class__.__name__: thread.telemetry_snapshot() for thread in self._threads}
+
+    def threads_log_telemetry(self):
+        for name, metrics in self.threads_telemetry().items():
+            log.info(f"{name}: {format_telemetry(metrics)}")
+
     def threads_sweep_finished(self):
         if self._sweep_thread is not None:
             return self._sweep_thread.is_finished()
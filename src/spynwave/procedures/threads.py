@@ -9,6 +9,7 @@ import numpy as np
 from pyvisa import VisaIOError
 from pyvisa.constants import VI_ERROR_TMO
 
+from spynwave.clock import clock
 from spynwave.drivers import InstrumentThread
 
 # Setup logging
@@ -18,6 +19,8 @@ log.addHandler(logging.NullHandler())
 
 
 class FieldSweepThread(InstrumentThread):
+    queue_policy = "drop-newest"
+
     def run(self):
         log.info("Field sweep Thread: start sweeping.")
         try:
@@ -42,9 +45,12 @@ class FieldSweepThread(InstrumentThread):
                        (self.settings["stop"] - self.settings["start"])) * 100
 
         if self.settings["publish_data"]:
+            self.record_telemetry()
             try:
-                self.data_queue.put_nowait((time, {"Field (T)": field}))
+                self.data_queue.put_nowait((clock.time(), {"Field (T)": field}))
+                self.notify_data_available()
             except queue.Full:
+                self.dropped_samples += 1
                 log.warning("Field sweep Thread: data-queue is full, continuing without "
                             "putting field-data to the queue.")
 
@@ -52,6 +58,8 @@ class FieldSweepThread(InstrumentThread):
 
 
 class GaussProbeThread(InstrumentThread):
+    queue_policy = "drop-oldest"
+
     def run(self):
         log.info("Gauss probe Thread: start measuring")
 
@@ -62,6 +70,7 @@ class GaussProbeThread(InstrumentThread):
                 sleep(sleeptime)
 
             last_time = time()
+            t_request = clock.time()
             try:
                 field = self.instrument.measure_field()
             except VisaIOError as exc:
@@ -70,7 +79,7 @@ class GaussProbeThread(InstrumentThread):
                 continue
 
             field = np.round(field, 10)  # rounding to remove float-rounding-errors
-            self.put_datapoint({"Field (T)": field})
+            self.put_datapoint({"Field (T)": field}, acquisition_window=(t_request, clock.time()))
 
         log.info("Gauss probe Thread: stopped measuring")
 
@@ -96,22 +105,26 @@ class DCSweepThread(InstrumentThread):
 
         log.info("Source-meter sweep Thread: stopped sweeping")
 
-    def callback(self, value, data):
+    def callback(self, value, data, acquisition_window=None):
         progress = abs((value - self.settings["start"]) /
                        (self.settings["stop"] - self.settings["start"])) * 100
 
         if self.settings["publish_data"]:
             data["DC resistance (ohm)"] = data["DC voltage (V)"] / data["DC current (A)"]
-            self.put_datapoint(data)
+            self.put_datapoint(data, acquisition_window=acquisition_window)
 
         self.procedure.emit("progress", progress)
 
 
 class SourceMeterThread(InstrumentThread):
+    # The source-meter is only monitored, so thinning out the data is acceptable
+    queue_policy = "decimate"
+
     def run(self):
         log.info("Source-meter Thread: start measuring")
 
         while not self.should_stop():
+            t_request = clock.time()
             try:
                 data = self.instrument.measure()
             except VisaIOError as exc:
@@ -119,7 +132,7 @@ class SourceMeterThread(InstrumentThread):
                     raise exc
                 continue
 
-            self.put_datapoint(data)
+            self.put_datapoint(data, acquisition_window=(t_request, clock.time()))
 
             sleep(self.settings['delay'])
 
@@ -128,6 +141,9 @@ class SourceMeterThread(InstrumentThread):
 
 class VNAControlThread(InstrumentThread):
     def run(self):
+        if self.settings.get("free_running_rate"):
+            return self.run_free_running(self.settings["free_running_rate"])
+
         # try:
         #     # Obtain lock to prevent other communication with VNA
         #     self.instrument.vectorstar.adapter.connection.lock_excl()
@@ -138,18 +154,39 @@ class VNAControlThread(InstrumentThread):
 
         sleep(self.settings['delay'])
 
+        pipelined = self.settings.get("pipelined", False)
         first_datapoint = True
+        warned = False
 
         while not self.should_stop():
             if self.instrument.measurement_done():
+                # The measurement took place between the trigger and the detection of its end
+                acquisition_window = (self.instrument.trigger_time, clock.time())
+
+                # In pipelined mode, the next measurement is triggered before the data of the
+                # previous one is read; this requires the readout to be faster than a measurement
+                if pipelined and not self.should_stop():
+                    self.instrument.trigger_measurement()
+
                 data = self.instrument.grab_data(CW_mode=True, headerless=True)
 
-                if not first_datapoint:
-                    self.put_datapoint(data)
-                else:
+                if pipelined and self.instrument.measurement_done():
+                    # The next measurement completed during the readout, such that it is unknown
+                    # to which of the two measurements the data belongs; the data is discarded
+                    # (the data of the next measurement is read in the next iteration)
                     first_datapoint = False
+                    self.dropped_samples += self.instrument.cw_number_of_points
+                    if not warned:
+                        warned = True
+                        log.warning("VNA control Thread: measurement completed while the data "
+                                    "of the previous measurement was read; pipelined triggering "
+                                    "requires the readout to be faster than a measurement.")
+                elif first_datapoint:
+                    first_datapoint = False
+                else:
+                    self.put_measurement(data, acquisition_window)
 
-                if not self.should_stop():
+                if not pipelined and not self.should_stop():
                     self.instrument.trigger_measurement()
 
             sleep(self.settings['delay'])
@@ -160,3 +197,57 @@ class VNAControlThread(InstrumentThread):
             # self.instrument.vectorstar.adapter.connection.unlock()
 
         log.info("VNA control Thread: stopped")
+
+    def run_free_running(self, rate):
+        """ Measure with free-running (hardware-timed) triggering at the given rate; the completed
+        measurements are timestamped in hardware. If multiple measurements are completed since the
+        previous readout, only the data of the last one is still available in the VNA; the others
+        are counted as dropped.
+
+        The data is paired with the last timestamp that was read before the data. If another
+        measurement completes while the data is read, it is unknown to which of the two
+        measurements the data belongs; the data is then discarded (and counted as dropped).
+        """
+        self.instrument.start_free_running(rate)
+        log.info(f"VNA control Thread: started free-running triggering at {rate:g} Hz")
+
+        # The duration of a measurement, which ends at the hardware timestamp
+        duration = self.instrument.cw_point_duration * self.instrument.cw_number_of_points
+        points = self.instrument.cw_number_of_points
+
+        # Timestamps of measurements that completed during the previous readout
+        pending_times = np.empty(0)
+        warned = False
+
+        try:
+            while not self.should_stop():
+                done_times = np.concatenate(
+                    (pending_times, self.instrument.read_completed_timestamps()))
+
+                if done_times.size:
+                    data = self.instrument.grab_data(CW_mode=True, headerless=True)
+                    pending_times = self.instrument.read_completed_timestamps()
+
+                    if pending_times.size:
+                        self.dropped_samples += done_times.size * points
+                        if not warned:
+                            warned = True
+                            log.warning("VNA control Thread: measurements completed while the "
+                                        "data was read; the free-running rate might be too high "
+                                        "for the readout.")
+                    else:
+                        self.put_measurement(data, (done_times[-1] - duration, done_times[-1]))
+                        self.dropped_samples += (done_times.size - 1) * points
+
+                sleep(self.settings['delay'])
+        finally:
+            self.instrument.stop_free_running()
+
+        log.info("VNA control Thread: stopped")
+
+    def put_measurement(self, data, acquisition_window):
+        if self.instrument.cw_number_of_points > 1:
+            # Buffered CW mode: the points are spread over the acquisition-window
+            self.put_datapoints(self.instrument.cw_point_timestamps(*acquisition_window), data)
+        else:
+            self.put_datapoint(data, acquisition_window=acquisition_window)
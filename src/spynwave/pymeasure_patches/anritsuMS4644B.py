@@ -1,5 +1,6 @@
 import logging
-
+import re
+from contextlib import contextmanager
 
 from pymeasure.instruments.validators import (
     strict_discrete_set,
@@ -66,9 +67,55 @@ class Trace(Channel):
     )
 
 
+class FrequencySegment(Channel):
+    placeholder = "sg"
+
+    frequency_start = Channel.control(
+        ":SENS{{ch}}:FSEGM{sg}:FREQ:STAR?", ":SENS{{ch}}:FSEGM{sg}:FREQ:STAR %g",
+        """ A float property that controls the start frequency (in Hz) of the indicated segment of a
+        frequency-based segmented sweep on the indicated channel. Can be set.
+        """,
+        values=[1E7, 4E10],
+        validator=strict_range,
+    )
+
+    frequency_stop = Channel.control(
+        ":SENS{{ch}}:FSEGM{sg}:FREQ:STOP?", ":SENS{{ch}}:FSEGM{sg}:FREQ:STOP %g",
+        """ A float property that controls the stop frequency (in Hz) of the indicated segment of a
+        frequency-based segmented sweep on the indicated channel. Can be set.
+        """,
+        values=[1E7, 4E10],
+        validator=strict_range,
+    )
+
+    number_of_points = Channel.control(
+        ":SENS{{ch}}:FSEGM{sg}:SWE:POIN?", ":SENS{{ch}}:FSEGM{sg}:SWE:POIN %d",
+        """ An integer property that controls the number of points of the indicated segment of a
+        frequency-based segmented sweep on the indicated channel. Can be set.
+        """,
+        values=[1, 100000],
+        validator=strict_range,
+        cast=int,
+    )
+
+    enabled = Channel.control(
+        ":SENS{{ch}}:FSEGM{sg}:STAT?", ":SENS{{ch}}:FSEGM{sg}:STAT %d",
+        """ A boolean property that controls whether the indicated segment of a frequency-based
+        segmented sweep on the indicated channel is enabled. Can be set.
+        """,
+        values={True: 1, False: 0},
+        map_values=True,
+    )
+
+    def delete(self):
+        """ Deletes the indicated segment of the frequency-based segmented sweep. """
+        self.write(":SENS{{ch}}:FSEGM{sg}:DEL")
+
+
 class MeasurementChannel(Channel):
     FREQUENCY_RANGE = [1E7, 4E10]
     TRACES = [1, 16]
+    SEGMENTS = [1, 50]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -77,6 +124,8 @@ class MeasurementChannel(Channel):
             self.add_child(Port, pt + 1, collection="ports", prefix="pt_")
         for tr in range(self.TRACES[1]):
             self.add_child(Trace, tr + 1, collection="traces", prefix="tr_")
+        for sg in range(self.SEGMENTS[1]):
+            self.add_child(FrequencySegment, sg + 1, collection="segments", prefix="sg_")
 
     def check_errors(self):
         return self.parent.check_errors()
@@ -175,6 +224,37 @@ class MeasurementChannel(Channel):
         cast=int,
     )
 
+    sweep_type = Channel.control(
+        ":SENS{ch}:SWE:TYP?", ":SENS{ch}:SWE:TYP %s",
+        """ A string property that controls the sweep type of the indicated channel. Can be set;
+        valid values are:
+
+        =====   =====================================
+        value   description
+        =====   =====================================
+        LIN     Linear frequency sweep
+        LOG     Logarithmic frequency sweep
+        FSEGM   Frequency-based segmented sweep
+        ISEGM   Index-based segmented sweep
+        =====   =====================================
+        """,
+        values=["LIN", "LOG", "FSEGM", "ISEGM"],
+        validator=strict_discrete_set,
+    )
+
+    number_of_frequency_segments = Channel.measurement(
+        ":SENS{ch}:FSEGM:COUN?",
+        """ An integer property that returns the number of segments of the frequency-based
+        segmented sweep of the indicated channel.
+        """,
+        cast=int,
+    )
+
+    def add_frequency_segment(self):
+        """ Adds a segment to the end of the frequency-based segmented sweep of the indicated
+        channel. """
+        self.write(":SENS{ch}:FSEGM:ADD")
+
     frequency_start = Channel.control(
         ":SENS{ch}:FREQ:STAR?", ":SENS{ch}:FREQ:STAR %g",
         """ A float property that controls the start value of the sweep range of the indicated
@@ -292,6 +372,25 @@ class AnritsuMS4644B(Instrument):
     PORTS = [1, 4]  # TODO: check number: 4 or 7/8
     TRIGGER_TYPES = ["POIN", "SWE", "CHAN", "ALL"]
 
+    # Settings that are never elided, as the instrument changes their value when other settings
+    # are changed or when a sweep is triggered
+    UNCACHED_SETTINGS = re.compile(
+        r":SENS\d*:FREQ:(STAR|STOP|SPAN|CENT)|:SENS\d*:HOLD:FUNC|:CALC\d*:PAR\d+:DEF"
+        r"|:SENS\d*:FSEGM\d+:.*"
+    )
+    # Commands that (can) change any of the settings of the instrument; note that *CLS only clears
+    # the status registers
+    CACHE_INVALIDATING_COMMANDS = ("*RST", ":SYST:PRES", ":SYST:POIN:MAX")
+    # Legacy (non-SCPI) settings, which have no space between the header and the value
+    LEGACY_SETTINGS = ("FDH", "DD")
+
+    # The settings caches of the instruments, per resource name; the cache is shared by all
+    # instances that are connected to the same instrument, such that it is kept when the
+    # instrument is instantiated again (e.g. for every measurement in a sequence). Settings that
+    # are changed on the front panel are not tracked; use invalidate_settings_cache (or reset the
+    # instrument) after changing settings manually.
+    _settings_caches = {}
+
     def __init__(self, adapter, **kwargs):
         super().__init__(
             adapter,
@@ -300,14 +399,148 @@ class AnritsuMS4644B(Instrument):
             **kwargs,
         )
 
+        resource_name = getattr(self.adapter, "resource_name", None)
+        if resource_name is None:
+            self._settings_cache = {}
+        else:
+            self._settings_cache = self._settings_caches.setdefault(resource_name, {})
+
+        self._pending_settings = []
+        self._batch_depth = 0
+        self._error_check_pending = False
+
         for ch in range(self.CHANNELS[1]):
             self.add_child(MeasurementChannel, ch+1)
 
+    def write(self, command, **kwargs):
+        """ Write a string command to the instrument. A setting is not written if it already has
+        the requested value, and is queued while the settings are batched (see
+        :meth:`batch_settings`); any other command (e.g. a query) first writes the queued settings.
+
+        :param command: command string to be sent to the instrument
+        :param kwargs: Keyword arguments for the adapter.
+        """
+        if command.startswith(self.CACHE_INVALIDATING_COMMANDS):
+            self.flush_settings()
+            self.invalidate_settings_cache()
+            self._write(command, **kwargs)
+            return
+
+        setting = self._parse_setting(command)
+        if setting is None:
+            self.flush_settings()
+            self._write(command, **kwargs)
+            return
+
+        header, value = setting
+        if not self.UNCACHED_SETTINGS.fullmatch(header):
+            if self._settings_cache.get(header) == value:
+                log.debug(f"{self.name}: skipped writing unchanged setting '{command}'.")
+                return
+            self._settings_cache[header] = value
+
+        if self._batch_depth and header not in self.LEGACY_SETTINGS:
+            self._pending_settings.append(command)
+        else:
+            self.flush_settings()
+            self._write(command, **kwargs)
+
+    def _write(self, command, **kwargs):
+        try:
+            super().write(command, **kwargs)
+        except Exception:
+            # It is unknown which settings have reached the instrument
+            self.invalidate_settings_cache()
+            raise
+
+    def _parse_setting(self, command):
+        """ Return the header and value of a setting command, or None if the command is not a
+        setting (e.g. a query, a command without a value or multiple joined commands).
+        """
+        command = command.strip()
+        if "?" in command or ";" in command:
+            return None
+
+        header, _, value = command.partition(" ")
+        if value:
+            return header, value.strip()
+
+        legacy_header = header.rstrip("0123456789")
+        if legacy_header in self.LEGACY_SETTINGS and legacy_header != header:
+            return legacy_header, header[len(legacy_header):]
+
+        return None
+
+    def invalidate_settings_cache(self):
+        """ Forget the cached values of the settings, such that all settings are written again. """
+        self._settings_cache.clear()
+
+    def flush_settings(self):
+        """ Write the queued settings as a single command. """
+        if not self._pending_settings:
+            return
+
+        # Make all headers absolute, such that they are not interpreted relative to the previous
+        # command in the joined command
+        command = ";".join(c if c.startswith((":", "*")) else ":" + c
+                           for c in self._pending_settings)
+        self._pending_settings = []
+        self._error_check_pending = True
+        self._write(command)
+
+    @contextmanager
+    def batch_settings(self):
+        """ Context manager in which the settings are not written directly, but are queued and
+        written as a single command when the context is left (or before any other command is
+        written). The error checks within the context are deferred to a single error check after
+        the settings are written.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._pending_settings = []
+            self.invalidate_settings_cache()
+            raise
+        finally:
+            self._batch_depth -= 1
+
+        if not self._batch_depth:
+            self.flush_settings()
+            if self._error_check_pending:
+                self.check_errors()
+
+    @contextmanager
+    def batch(self, separator=";", check_errors=False):
+        """ Batch the settings using :meth:`batch_settings`, such that the batched settings pass
+        through the settings cache; this replaces the generic batching of the instrument.
+
+        :param separator: String used to join the settings; only ';' is supported.
+        :param check_errors: Whether to check for errors once the batch is written.
+        """
+        if separator != ";":
+            raise ValueError(f"Separator '{separator}' not supported; only ';' is supported.")
+
+        with self.batch_settings():
+            yield self
+            if check_errors:
+                self.check_errors()  # Deferred until the settings are written
+
+    def flush_batch(self):
+        """ Write the queued settings; see :meth:`flush_settings`. """
+        self.flush_settings()
+
     def check_errors(self):
-        """ Read all errors from the instrument.
+        """ Read all errors from the instrument. Within :meth:`batch_settings`, the error check is
+        deferred to the end of the batch.
 
         :return: list of error entries
         """
+        if self._batch_depth:
+            self._error_check_pending = True
+            return []
+
+        self._error_check_pending = False
         errors = []
         while True:
             err = self.values("SYST:ERR?")
@@ -317,6 +550,10 @@ class AnritsuMS4644B(Instrument):
                 errors.append(err)
             else:
                 break
+
+        if errors:
+            # A setting that caused an error might not have been applied
+            self.invalidate_settings_cache()
         return errors
 
     datablock_header_format = Instrument.control(
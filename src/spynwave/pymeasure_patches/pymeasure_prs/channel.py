@@ -60,6 +60,28 @@ class Channel(CommonBase):
         """
         return command.format_map({self.placeholder: self.id})
 
+    # Batching of commands
+    def batch(self, *args, **kwargs):
+        """Batch the commands of the property setters of the instrument, see
+        :meth:`CommonBase.batch`."""
+        return self.parent.batch(*args, **kwargs)
+
+    def flush_batch(self):
+        """Write the commands that are queued in the present batch as a single message."""
+        self.parent.flush_batch()
+
+    def write_setting(self, command):
+        """Write (or queue within a batch) a command that is generated by a property setter.
+
+        :param command: command string to be sent to the instrument.
+            '{ch}' is replaced by the channel id.
+        """
+        self.parent.write_setting(self.insert_id(command))
+
+    def check_setting_errors(self):
+        """Check for errors after a property is set, or defer the check within a batch."""
+        self.parent.check_setting_errors()
+
     # Calls to the instrument
     def write(self, command, **kwargs):
         """Write a string command to the instrument appending `write_termination`.
@@ -23,6 +23,7 @@
 #
 
 import logging
+from contextlib import contextmanager
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
@@ -61,6 +62,8 @@ class DynamicProperty(property):
         self.fset_params_list = () if fset_params_list is None else fset_params_list
         self.name = ""
         self.prefix = prefix
+        self._fget_instance_names = ()
+        self._fset_instance_names = ()
 
     def __get__(self, obj, objtype=None):
         if obj is None:
@@ -68,26 +71,55 @@ class DynamicProperty(property):
             return self
         if self.fget is None:
             raise AttributeError(f"Unreadable attribute {self.name}")
-
-        kwargs = {}
-        for attr in self.fget_params_list:
-            attr_instance_name = self.prefix + "_".join([self.name, attr])
-            if hasattr(obj, attr_instance_name):
-                kwargs[attr] = getattr(obj, attr_instance_name)
-        return self.fget(obj, **kwargs)
+        return self.fget(obj, **self._dynamic_kwargs(obj, self._fget_instance_names))
 
     def __set__(self, obj, value):
         if self.fset is None:
             raise AttributeError(f"Can't set attribute {self.name}")
+        self.fset(obj, value, **self._dynamic_kwargs(obj, self._fset_instance_names))
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        # Determine the names of the dynamically configurable parameters once
+        self._fget_instance_names = self._instance_names(self.fget_params_list)
+        self._fset_instance_names = self._instance_names(self.fset_params_list)
+
+    def _instance_names(self, params_list):
+        return tuple((attr, self.prefix + "_".join([self.name, attr])) for attr in params_list)
+
+    @staticmethod
+    def _dynamic_kwargs(obj, instance_names):
         kwargs = {}
-        for attr in self.fset_params_list:
-            attr_instance_name = self.prefix + "_".join([self.name, attr])
-            if hasattr(obj, attr_instance_name):
+        for attr, attr_instance_name in instance_names:
+            try:
                 kwargs[attr] = getattr(obj, attr_instance_name)
-        self.fset(obj, value, **kwargs)
+            except AttributeError:
+                pass
+        return kwargs
 
-    def __set_name__(self, owner, name):
+
+class ReservedName:
+    """ Descriptor for the special names that control the behaviour of a
+    :class:`DynamicProperty`.
+
+    The special names cannot be read; setting a special name stores the value under the name
+    with the reserved prefix, where it is found by the DynamicProperty.
+
+    :param name: The special name.
+    :param reserved_name: The name with the reserved prefix.
+    """
+
+    def __init__(self, name, reserved_name):
         self.name = name
+        self.reserved_name = reserved_name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        raise AttributeError(f"{self.name} is a reserved variable name and it cannot be read")
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.reserved_name] = value
 
 
 class CommonBase:
@@ -117,8 +149,13 @@ class CommonBase:
     # Prefix used to store reserved variables
     __reserved_prefix = "___"
 
+    # Names of the variables that control the dynamic properties, see __init_subclass__
+    _special_names = frozenset()
+
+    # Commands that are queued in a batch, None if no batch is active
+    _batch_commands = None
+
     def __init__(self):
-        self._special_names = self._setup_special_names()
         # Add children from ChildDescriptors.
         for item, value in self.__class__.__dict__.items():
             if isinstance(value, self.ChannelCreator):
@@ -171,45 +208,30 @@ class CommonBase:
             kwargs.setdefault("prefix", prefix)
             self.kwargs = kwargs
 
-    def _setup_special_names(self):
-        """ Return list of class/instance special names.
-
-        Compute the list of special names based on the list of
-        class attributes that are a DynamicProperty. Check also for class variables
-        with special name and copy them at instance level
-        Internal method, not intended to be accessed at user level."""
-        special_names = []
-        dynamic_params = tuple(set(self._fget_params_list + self._fset_params_list))
-        # Check whether class variables of DynamicProperty type are present
-        for obj in (self,) + self.__class__.__mro__:
+    def __init_subclass__(cls, **kwargs):
+        """ Resolve the special names of the dynamic properties once, when the class is created.
+
+        Compute the set of special names based on the class attributes that are a
+        DynamicProperty. Class variables with a special name are moved to the name with the
+        reserved prefix, and every special name is replaced by a :class:`ReservedName`
+        descriptor, such that regular attribute access does not have to check for special names.
+        """
+        super().__init_subclass__(**kwargs)
+
+        dynamic_params = tuple(set(cls._fget_params_list + cls._fset_params_list))
+        special_names = set()
+        for obj in cls.__mro__:
             for attr_name, attr in obj.__dict__.items():
                 if isinstance(attr, DynamicProperty):
-                    special_names += [attr_name + "_" + key for key in dynamic_params]
-        # Check if special variables are defined at class level
-        for obj in (self,) + self.__class__.__mro__:
-            for attr in obj.__dict__:
-                if attr in special_names:
-                    # Copy class special variable at instance level, prefixing reserved_prefix
-                    setattr(self, self.__reserved_prefix + attr, obj.__dict__[attr])
-        return special_names
-
-    def __setattr__(self, name, value):
-        """ Add reserved_prefix in front of special variables."""
-        if hasattr(self, '_special_names'):
-            if name in self._special_names:
-                name = self.__reserved_prefix + name
-        super().__setattr__(name, value)
-
-    def __getattribute__(self, name):
-        """ Prevent read access to variables with special names used to
-        support dynamic property behaviour."""
-        if name in ('_special_names', '__dict__'):
-            return super().__getattribute__(name)
-        if hasattr(self, '_special_names'):
-            if name in self._special_names:
-                raise AttributeError(
-                    f"{name} is a reserved variable name and it cannot be read")
-        return super().__getattribute__(name)
+                    special_names.update(attr_name + "_" + key for key in dynamic_params)
+        cls._special_names = frozenset(special_names)
+
+        for name in cls._special_names:
+            value = cls.__dict__.get(name)
+            if name in cls.__dict__ and not isinstance(value, ReservedName):
+                # Class special variable, store it with the reserved prefix
+                setattr(cls, cls.__reserved_prefix + name, value)
+            setattr(cls, name, ReservedName(name, cls.__reserved_prefix + name))
 
     # Channel management
     def add_child(self, cls, id=None, collection="channels", prefix="ch_", **kwargs):
@@ -266,6 +288,71 @@ class CommonBase:
             del collection[child.id]
         delattr(self, child._name)
 
+    # Batching of commands
+    @contextmanager
+    def batch(self, separator=";", check_errors=False):
+        """Context manager that queues the commands written by property setters and writes them as
+        a single message when the context is left. Any other communication (e.g. a query) within
+        the context first writes the queued commands. The error checks of the property setters
+        are deferred to a single error check at the end of the batch.
+
+        .. code::
+
+            with instrument.batch(check_errors=True):
+                instrument.voltage = 1
+                instrument.ch_A.current = 0.1
+
+        Nested batches are part of the outermost batch. If an exception is raised within the
+        context, the queued commands are discarded.
+
+        :param separator: String used to join the queued commands.
+        :param check_errors: Whether to check for errors once the batch is written.
+        """
+        if self._batch_commands is not None:
+            self._batch_check_errors = self._batch_check_errors or check_errors
+            yield self
+            return
+
+        self._batch_commands = []
+        self._batch_separator = separator
+        self._batch_check_errors = check_errors
+        try:
+            yield self
+            self.flush_batch()
+        finally:
+            self._batch_commands = None
+
+        if self._batch_check_errors:
+            self.check_errors()
+
+    def flush_batch(self):
+        """Write the commands that are queued in the present batch as a single message."""
+        if not self._batch_commands:
+            return
+
+        commands = self._batch_commands
+        self._batch_commands = []
+        self.write(self._batch_separator.join(commands))
+
+    def write_setting(self, command):
+        """Write a command that is generated by a property setter; within a batch (see
+        :meth:`batch`) the command is queued instead.
+
+        :param command: command string to be sent to the instrument.
+        """
+        if self._batch_commands is None:
+            self.write(command)
+        else:
+            self._batch_commands.append(command)
+
+    def check_setting_errors(self):
+        """Check for errors after a property is set; within a batch (see :meth:`batch`) the error
+        check is deferred to the end of the batch."""
+        if self._batch_commands is None:
+            self.check_errors()
+        else:
+            self._batch_check_errors = True
+
     # Communication functions
     def wait_for(self, query_delay=0):
         """Wait for some time. Used by 'ask' to wait before reading.
@@ -461,9 +548,9 @@ class CommonBase:
                     'Values of type `{}` are not allowed '
                     'for CommonBase.control'.format(type(values))
                 )
-            self.write(command_process(set_command) % value)
+            self.write_setting(command_process(set_command) % value)
             if check_set_errors:
-                self.check_errors()
+                self.check_setting_errors()
 
         # Add the specified document string to the getter
         fget.__doc__ = docs
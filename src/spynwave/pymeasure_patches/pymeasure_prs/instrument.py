@@ -133,10 +133,12 @@ class Instrument(CommonBase):
         :param command: command string to be sent to the instrument
         :param kwargs: Keyword arguments for the adapter.
         """
+        self.flush_batch()
         self.adapter.write(command, **kwargs)
 
     def write_bytes(self, content, **kwargs):
         """Write the bytes `content` to the instrument."""
+        self.flush_batch()
         self.adapter.write_bytes(content, **kwargs)
 
     def read(self, **kwargs):
@@ -160,6 +162,7 @@ class Instrument(CommonBase):
         :param values: The values to transmit.
         :param \\*args, \\**kwargs: Further arguments to hand to the Adapter.
         """
+        self.flush_batch()
         self.adapter.write_binary_values(command, values, *args, **kwargs)
 
     def read_binary_values(self, **kwargs):
@@ -16,6 +16,7 @@ from pymeasure.display.widgets import InputsWidget
 from spynwave.widgets.pymeasure_monkey_patches import patched_layout_inputs_widget
 
 from spynwave.widgets import SpynWaveSequencerWidget
+from spynwave.drivers.telemetry import store_telemetry_summary
 
 
 # Setup logging
@@ -121,6 +122,28 @@ class SpynWaveWindowBase(ManagedWindow):
             raise ValueError("No directory input in the ManagedWindow")
         return self.filename_line.text()
 
+    def finished(self, experiment):
+        super().finished(experiment)
+        self._store_telemetry_summary(experiment)
+
+    def abort_returned(self, experiment):
+        super().abort_returned(experiment)
+        self._store_telemetry_summary(experiment)
+
+    @staticmethod
+    def _store_telemetry_summary(experiment):
+        """ Write the telemetry of the threads (if any) into the header of the data-file, once the
+        measurement is completed and the data-file is closed.
+        """
+        summary = getattr(experiment.procedure, "telemetry_summary", None)
+        if not summary:
+            return
+
+        try:
+            store_telemetry_summary(experiment.results, summary)
+        except OSError as exc:
+            log.error(f"Could not store the telemetry in the data-file: {exc}")
+
     def _setup_log_widget(self):
         """ Adjust the log-widget.
         Sets the logging level to INFO, adds blinking functionality and color-coding for warning-
@@ -0,0 +1,43 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+import logging
+
+from pymeasure.display.Qt import QtCore
+
+from spynwave.drivers import VNA
+from spynwave.drivers.vna_limits import query_vna_limits
+
+# Setup logging
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+log.addHandler(logging.NullHandler())
+
+
+class VNALimitsWorker(QtCore.QThread):
+    """ Thread that inquires the limits from the VNA in the background, such that the interface is
+    not blocked while the VNA is queried. The results are posted back via Qt signals.
+
+    :param timeout: The timeout (in s) of every single query to the VNA.
+    """
+    limits_found = QtCore.Signal(str, object)
+    failed = QtCore.Signal(str)
+
+    def __init__(self, timeout=10, parent=None):
+        super().__init__(parent)
+        self.timeout = timeout
+        self.expired = False
+
+    def run(self):
+        try:
+            with VNA.connect_vectorstar() as vectorstar:
+                vectorstar.adapter.connection.timeout = self.timeout * 1000
+                identity = vectorstar.id
+                limits = query_vna_limits(vectorstar)
+                vectorstar.return_to_local()
+        except Exception as exc:  # Report any problem to the interface instead of crashing
+            self.failed.emit(str(exc))
+            return
+
+        self.limits_found.emit(identity, limits)
@@ -0,0 +1,73 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+from time import perf_counter
+
+import numpy as np
+import pytest
+
+from spynwave.drivers.calibration import CalibrationTable
+
+CURRENTS = [-10., -2., 0., 3., 10.]
+FIELDS = [-0.5, -0.15, 0., 0.2, 0.6]
+
+
+@pytest.fixture
+def table():
+    return CalibrationTable(CURRENTS, FIELDS)
+
+
+def test_scalar_and_array_match_np_interp(table):
+    values = np.linspace(-10, 10, 101)
+    expected = np.interp(values, CURRENTS, FIELDS)
+
+    np.testing.assert_allclose(table(values), expected)
+    np.testing.assert_allclose([table(value) for value in values.tolist()], expected)
+    assert table(10) == pytest.approx(0.6)
+    assert table(-10.) == pytest.approx(-0.5)
+
+
+def test_unsorted_points_are_sorted():
+    table = CalibrationTable(CURRENTS[::-1], FIELDS[::-1])
+    np.testing.assert_array_equal(table.x, CURRENTS)
+    assert table(1.5) == pytest.approx(0.1)
+
+
+@pytest.mark.parametrize("value", [-10.1, 10.1, np.array([0., 11.])])
+def test_out_of_range(table, value):
+    with pytest.raises(ValueError):
+        table(value)
+
+
+@pytest.mark.parametrize("x, y", [
+    ([0.], [1.]),
+    ([0., 1.], [1., 2., 3.]),
+    ([0., 1., 1.], [1., 2., 3.]),
+    ([0., np.nan], [1., 2.]),
+])
+def test_invalid_points(x, y):
+    with pytest.raises(ValueError):
+        CalibrationTable(x, y)
+
+
+def test_inverse(table):
+    inverse = table.inverse()
+    assert table.is_monotonic()
+    np.testing.assert_allclose(inverse(table(np.array(CURRENTS))), CURRENTS)
+
+
+def test_inverse_not_monotonic():
+    table = CalibrationTable([0., 1., 2.], [0., 1., 0.5])
+    assert not table.is_monotonic()
+    with pytest.raises(ValueError):
+        table.inverse()
+
+
+def test_scalar_lookup_is_fast(table):
+    repeats = 10000
+    start = perf_counter()
+    for _ in range(repeats):
+        table(1.5)
+    # Generous limit, such that it passes on slow machines as well
+    assert (perf_counter() - start) / repeats < 20e-6
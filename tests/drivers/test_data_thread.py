@@ -0,0 +1,275 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+import queue
+from time import sleep, time
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from spynwave.drivers.data_thread import ColumnarBuffer, DataStructure, DataThread, mean_per_window
+from spynwave.drivers.instrument_thread import InstrumentThread
+
+
+def test_buffer_append_and_drop():
+    buffer = ColumnarBuffer(capacity=4)
+
+    for i in range(10):
+        buffer.append(float(i), {"a": 2. * i})
+    assert len(buffer) == 10
+    np.testing.assert_array_equal(buffer.times, np.arange(10.))
+    np.testing.assert_array_equal(buffer.columns["a"], 2 * np.arange(10.))
+
+    buffer.drop(9)
+    assert len(buffer) == 1
+    np.testing.assert_array_equal(buffer.times, [9.])
+
+    # Appending after dropping should reuse the free space at the start of the arrays
+    capacity = buffer._capacity
+    for i in range(10, 20):
+        buffer.append(float(i), {"a": 2. * i})
+    assert buffer._capacity == capacity
+    np.testing.assert_array_equal(buffer.times, np.arange(9., 20.))
+    np.testing.assert_array_equal(buffer.columns["a"], 2 * np.arange(9., 20.))
+
+    buffer.drop(100)
+    assert len(buffer) == 0
+
+
+def test_buffer_missing_columns():
+    buffer = ColumnarBuffer()
+    buffer.append(0., {"a": 1.})
+    buffer.append(1., {"b": 2.})
+
+    columns = buffer.columns
+    np.testing.assert_array_equal(columns["a"], [1., np.nan])
+    np.testing.assert_array_equal(columns["b"], [np.nan, 2.])
+
+
+def test_buffer_monotonic_timestamps():
+    buffer = ColumnarBuffer()
+    buffer.append(1., {"a": 1.})
+    buffer.append(1., {"a": 1.})
+
+    with pytest.raises(ValueError):
+        buffer.append(0.5, {"a": 1.})
+
+
+def test_buffer_extend():
+    buffer = ColumnarBuffer(capacity=2)
+    buffer.append(0., {"a": 0.})
+    buffer.extend(np.arange(1., 6.), {"b": np.arange(5.)})
+
+    np.testing.assert_array_equal(buffer.times, np.arange(6.))
+    np.testing.assert_array_equal(buffer.columns["a"], [0.] + [np.nan] * 5)
+    np.testing.assert_array_equal(buffer.columns["b"], [np.nan, 0., 1., 2., 3., 4.])
+
+    with pytest.raises(ValueError):
+        buffer.extend(np.array([7., 6.]), {"a": np.zeros(2)})
+    with pytest.raises(ValueError):
+        buffer.extend(np.array([4., 8.]), {"a": np.zeros(2)})
+    assert len(buffer) == 6
+
+
+def test_buffer_head_returns_copies():
+    buffer = ColumnarBuffer(capacity=2)
+    buffer.append(0., {"a": 0.})
+    buffer.append(1., {"a": 1.})
+
+    times, columns = buffer.head(1)
+    buffer.drop(1)
+    for i in range(2, 10):
+        buffer.append(float(i), {"a": float(i)})
+
+    np.testing.assert_array_equal(times, [0.])
+    np.testing.assert_array_equal(columns["a"], [0.])
+
+
+def test_data_structure_pop():
+    data_queue = queue.Queue()
+    for i in range(5):
+        data_queue.put((float(i), {"a": float(i)}))
+
+    struct = DataStructure(data_queue)
+    struct.pull_data_from_queue()
+    assert struct.could_be_merged()
+    assert struct.get_matching_timedata() == (0., 0.5)
+
+    idx = struct.index_until_timestamp(2.5)
+    times, data = struct.pop_first_n_datapoints(idx)
+    np.testing.assert_array_equal(times, [0., 1., 2.])
+    np.testing.assert_array_equal(data["a"], [0., 1., 2.])
+    np.testing.assert_array_equal(struct.buffer.times, [3., 4.])
+
+
+def test_data_structure_pull_mixed_queue():
+    producer = InstrumentThread(None, None)
+    producer.data_queue.put((0., {"a": 0.}))
+    producer.data_queue.put((1., {"a": 1.}))
+    producer.put_datapoints([2., 3.], {"a": [2., 3.]})
+    producer.data_queue.put((4., {"b": 4.}))
+
+    struct = DataStructure(producer.data_queue)
+    struct.pull_data_from_queue()
+    assert not struct.data_available()
+
+    np.testing.assert_array_equal(struct.buffer.times, np.arange(5.))
+    np.testing.assert_array_equal(struct.buffer.columns["a"], [0., 1., 2., 3., np.nan])
+    np.testing.assert_array_equal(struct.buffer.columns["b"], [np.nan] * 4 + [4.])
+
+
+def test_data_structure_index_until_timestamp():
+    struct = DataStructure(queue.Queue())
+    for i in range(5):
+        struct.buffer.append(float(i), {"a": float(i)})
+
+    assert struct.index_until_timestamp(-1.) == 0
+    assert struct.index_until_timestamp(2.) == 3
+    assert struct.index_until_timestamp(2.5) == 3
+    assert struct.index_until_timestamp(10.) == 5
+
+
+def test_mean_per_window():
+    values = np.array([1., 2., np.nan, 4., 5., np.nan])
+    means = mean_per_window(values, [0, 2, 2, 4, 6])
+    np.testing.assert_array_equal(means, [1.5, np.nan, 4., 5.])
+
+    means = mean_per_window(values, [1, 3])
+    np.testing.assert_array_equal(means, [2.])
+
+
+def fill_queues(n_slow=5, n_fast=23):
+    slow, fast = queue.Queue(), queue.Queue()
+    for t in np.linspace(0, 10, n_slow):
+        slow.put((t, {"Field (T)": t / 10}))
+    for t in np.linspace(0.1, 10.1, n_fast):
+        fast.put((t, {"S11 real": np.sin(t), "S11 imag": np.cos(t)}))
+    return [slow, fast]
+
+
+def test_get_matched_data():
+    data_thread = DataThread(None, fill_queues())
+    for struct in data_thread.data_structs:
+        struct.pull_data_from_queue()
+
+    slow_times = data_thread.data_structs[0].buffer.times.copy()
+    fast_times = data_thread.data_structs[1].buffer.times.copy()
+
+    rows = []
+    while (row := data_thread.get_matched_data()) is not None:
+        rows.append(row)
+
+    assert len(rows) == len(slow_times) - 1
+    previous_midpoint = -np.inf
+    for row, t0, t1 in zip(rows, slow_times[:-1], slow_times[1:]):
+        midpoint = (t0 + t1) / 2
+        window = (fast_times > previous_midpoint) & (fast_times <= midpoint)
+        previous_midpoint = midpoint
+
+        assert row["Timestamp (s)"] == t0
+        assert row["Field (T)"] == pytest.approx(t0 / 10)
+        assert row["S11 real"] == pytest.approx(np.sin(fast_times[window]).mean())
+
+
+@pytest.mark.parametrize("alignment", ["window-mean", "nearest", "linear"])
+@pytest.mark.parametrize("master", [0, 1])
+@pytest.mark.parametrize("n_slow, n_fast", [(5, 23), (20, 7), (2, 2), (50, 51)])
+def test_get_matched_data_block(n_slow, n_fast, alignment, master):
+    kwargs = dict(alignment=alignment, master=master)
+    row_thread = DataThread(None, fill_queues(n_slow, n_fast), **kwargs)
+    block_thread = DataThread(None, fill_queues(n_slow, n_fast), batch_mode=True, **kwargs)
+    for struct in row_thread.data_structs + block_thread.data_structs:
+        struct.pull_data_from_queue()
+
+    rows = []
+    while (row := row_thread.get_matched_data()) is not None:
+        rows.append(row)
+
+    block = block_thread.get_matched_data_block()
+    if not rows:
+        assert block is None
+        return
+
+    expected = pd.DataFrame(rows)
+    pd.testing.assert_frame_equal(block[expected.columns], expected)
+
+    # The remaining data should be identical as well
+    for row_struct, block_struct in zip(row_thread.data_structs, block_thread.data_structs):
+        np.testing.assert_array_equal(row_struct.buffer.times, block_struct.buffer.times)
+
+
+def test_emit_data_block():
+    procedure = MagicMock()
+    data_thread = DataThread(procedure, fill_queues(), static_data={"Frequency (Hz)": 1e9},
+                             batch_mode=True)
+    for struct in data_thread.data_structs:
+        struct.pull_data_from_queue()
+
+    data_thread.emit_data(data_thread.get_matched_data_block())
+    emitted = procedure.emit_data.call_args[0][0]
+    assert isinstance(emitted, pd.DataFrame)
+    assert (emitted["Frequency (Hz)"] == 1e9).all()
+
+
+@pytest.mark.parametrize("alignment", ["nearest", "linear"])
+def test_pointwise_alignment(alignment):
+    # Align the slow (field) stream onto the fast (VNA) stream
+    data_thread = DataThread(None, fill_queues(), alignment=alignment, master=1)
+    for struct in data_thread.data_structs:
+        struct.pull_data_from_queue()
+
+    slow_times = data_thread.data_structs[0].buffer.times.copy()
+    fast_times = data_thread.data_structs[1].buffer.times.copy()
+
+    block = data_thread.get_matched_data_block()
+
+    # Only rows with a later datapoint in the slow stream can be aligned
+    expected_times = fast_times[fast_times <= slow_times[-1]]
+    np.testing.assert_array_equal(block["Timestamp (s)"], expected_times)
+    np.testing.assert_allclose(block["S11 real"], np.sin(expected_times))
+
+    if alignment == "nearest":
+        nearest = np.abs(slow_times[None, :] - expected_times[:, None]).argmin(axis=1)
+        np.testing.assert_allclose(block["Field (T)"], slow_times[nearest] / 10)
+    else:
+        # The field increases linearly in time
+        np.testing.assert_allclose(block["Field (T)"], expected_times / 10)
+
+    # New data should continue to be aligned correctly
+    data_thread.data_structs[0].buffer.append(20., {"Field (T)": 2.})
+    block = data_thread.get_matched_data_block()
+    np.testing.assert_array_equal(block["Timestamp (s)"], fast_times[fast_times > slow_times[-1]])
+
+
+def test_data_thread_wakes_on_new_data():
+    procedure = MagicMock()
+    producers = [InstrumentThread(procedure, None), InstrumentThread(procedure, None)]
+
+    data_thread = DataThread(procedure, [p.data_queue for p in producers], batch_mode=True)
+    # Ensure that only the data-event can wake up the thread within the test
+    data_thread.wake_timeout = 10
+    for producer in producers:
+        producer.data_event = data_thread.data_event
+
+    data_thread.start()
+    try:
+        for t in range(3):
+            producers[0].data_queue.put((float(t), {"Field (T)": 0.}))
+            producers[1].data_queue.put((float(t), {"S11 real": 0.}))
+        producers[1].put_datapoint({"S11 real": 0.})
+
+        start = time()
+        while not procedure.emit_data.called and time() - start < 1:
+            sleep(0.001)
+        assert procedure.emit_data.called
+    finally:
+        data_thread.stop()
+
+    start = time()
+    while data_thread.is_alive() and time() - start < 1:
+        sleep(0.001)
+    assert not data_thread.is_alive()
+    assert data_thread.all_data_processed()
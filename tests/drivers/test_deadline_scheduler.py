@@ -0,0 +1,83 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+import pytest
+
+from spynwave.drivers.deadline_scheduler import DeadlineScheduler
+
+
+class FakeClock:
+    """ Clock that only advances when sleeping or when work is done. """
+
+    def __init__(self):
+        self.now = 0.
+
+    def time(self):
+        return self.now
+
+    def sleep(self, duration):
+        self.now += duration
+
+
+def run(policy, work):
+    clock = FakeClock()
+    scheduler = DeadlineScheduler(0.1, policy=policy, sleep_fn=clock.sleep, time_fn=clock.time)
+
+    steps = []
+    for idx in scheduler.steps(10):
+        steps.append((idx, round(clock.now, 9)))
+        clock.now += work.get(idx, 0.01)
+
+    return scheduler, steps
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        DeadlineScheduler(0.1, policy="invalid")
+
+
+def test_on_schedule():
+    scheduler, steps = run("catch-up", {})
+    assert steps == [(idx, pytest.approx(idx * 0.1)) for idx in range(10)]
+
+    statistics = scheduler.statistics()
+    assert statistics["overruns"] == 0
+    assert statistics["max jitter (s)"] == pytest.approx(0)
+    assert statistics["duration (s)"] == pytest.approx(0.9)
+
+
+def test_overruns_do_not_accumulate():
+    # Step 2 takes 0.25 s, steps 3 and 4 are late but the sweep ends at the original deadline
+    scheduler, steps = run("catch-up", {2: 0.25})
+    assert [idx for idx, _ in steps] == list(range(10))
+    assert steps[3][1] == pytest.approx(0.45)
+    assert steps[4][1] == pytest.approx(0.46)
+    assert steps[5][1] == pytest.approx(0.5)
+
+    assert scheduler.overruns == 2
+    assert scheduler.statistics()["duration (s)"] == pytest.approx(0.9)
+
+
+def test_skip():
+    scheduler, steps = run("skip", {2: 0.25})
+    assert [idx for idx, _ in steps] == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+    assert scheduler.skipped_steps == 1
+    assert scheduler.statistics()["duration (s)"] == pytest.approx(0.9)
+
+
+def test_rebase():
+    # Step 2 takes 0.25 s; the next steps are shifted by the delay of step 3
+    scheduler, steps = run("rebase", {2: 0.25})
+    assert [idx for idx, _ in steps] == list(range(10))
+    assert [time for _, time in steps[3:]] == \
+        [pytest.approx(0.45 + idx * 0.1) for idx in range(7)]
+
+    assert scheduler.overruns == 1
+    assert scheduler.statistics()["max jitter (s)"] == pytest.approx(0.15)
+    assert scheduler.statistics()["schedule shift (s)"] == pytest.approx(0.15)
+
+
+def test_last_step_is_not_skipped():
+    scheduler, steps = run("skip", {0: 5.})
+    assert [idx for idx, _ in steps] == [0, 9]
@@ -0,0 +1,126 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from spynwave.drivers.instrument_thread import InstrumentThread
+
+
+def queued_values(thread):
+    values = []
+    while (item := thread.get_datapoint()) is not False:
+        values.append(item[1]["a"])
+    return values
+
+
+def test_invalid_queue_policy():
+    with pytest.raises(ValueError):
+        InstrumentThread(None, None, queue_policy="invalid")
+
+
+def test_settings_are_stored():
+    thread = InstrumentThread(None, None, max_queue_size=3, delay=0.1)
+    assert thread.settings == {"delay": 0.1}
+    assert thread.data_queue.maxsize == 3
+
+
+def test_drop_newest():
+    thread = InstrumentThread(None, None, max_queue_size=3, queue_policy="drop-newest")
+    for i in range(5):
+        thread.put_datapoint({"a": i})
+
+    assert queued_values(thread) == [0, 1, 2]
+    assert thread.dropped_samples == 2
+
+
+def test_drop_oldest():
+    thread = InstrumentThread(None, None, max_queue_size=3, queue_policy="drop-oldest")
+    for i in range(5):
+        thread.put_datapoint({"a": i})
+
+    assert queued_values(thread) == [2, 3, 4]
+    assert thread.dropped_samples == 2
+
+
+def test_decimate():
+    thread = InstrumentThread(None, None, max_queue_size=4, queue_policy="decimate")
+    for i in range(20):
+        thread.put_datapoint({"a": i})
+
+    values = queued_values(thread)
+    assert len(values) == 4
+    assert values == sorted(values) and values[-1] >= 16
+    assert thread.decimation > 1
+    assert thread.dropped_samples == 16
+
+    # The decimation is reset once the queue is emptied
+    thread.put_datapoint({"a": 20})
+    thread.put_datapoint({"a": 21})
+    assert thread.decimation == 1
+
+
+def test_block():
+    thread = InstrumentThread(None, None, max_queue_size=1, queue_policy="block")
+    thread.put_datapoint({"a": 0})
+
+    producer = threading.Thread(target=thread.put_datapoint, args=({"a": 1},))
+    producer.start()
+    producer.join(0.2)
+    assert producer.is_alive()
+
+    assert thread.get_datapoint()[1] == {"a": 0}
+    producer.join(1)
+    assert not producer.is_alive()
+
+    assert queued_values(thread) == [1]
+    assert thread.late_samples == 1
+    assert thread.dropped_samples == 0
+
+
+def test_block_does_not_block_when_stopped():
+    thread = InstrumentThread(None, None, max_queue_size=1, queue_policy="block")
+    thread.put_datapoint({"a": 0})
+    thread.stop()
+    thread.put_datapoint({"a": 1})
+
+    assert thread.queue_statistics() == {
+        "queue size": 1,
+        "dropped samples": 1,
+        "late samples": 1,
+    }
+
+
+def test_put_datapoints():
+    thread = InstrumentThread(None, None, max_queue_size=1, queue_policy="drop-newest")
+    thread.put_datapoints([0., 1., 2.], {"a": [3, 4, 5]})
+    thread.put_datapoints([3., 4.], {"a": [6, 7]})
+
+    items = thread.get_datapoints()
+    assert len(items) == 1
+    np.testing.assert_array_equal(items[0][0], [0., 1., 2.])
+    np.testing.assert_array_equal(items[0][1]["a"], [3., 4., 5.])
+
+    # Dropped samples are counted per datapoint, not per block
+    assert thread.dropped_samples == 2
+    assert thread.get_datapoints() == []
+
+
+def test_put_datapoints_invalid():
+    thread = InstrumentThread(None, None)
+    with pytest.raises(TypeError):
+        thread.put_datapoints([0., 1.], [1., 2.])
+    with pytest.raises(ValueError):
+        thread.put_datapoints([0., 1.], {"a": [1., 2., 3.]})
+
+
+def test_acquisition_window_and_offset():
+    thread = InstrumentThread(None, None, timestamp_offset=-0.5)
+    thread.put_datapoint({"a": 0}, acquisition_window=(10., 12.))
+    thread.put_datapoints([20., 21.], {"a": [1, 2]})
+
+    assert thread.get_datapoint() == (10.5, {"a": 0})
+    np.testing.assert_array_equal(thread.get_datapoint()[0], [19.5, 20.5])
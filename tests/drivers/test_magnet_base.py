@@ -0,0 +1,157 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+import numpy as np
+import pytest
+
+from spynwave.drivers import MagnetBase, MagnetOutOfPlane
+
+# Calibration with hysteresis: the field lags 10 mT behind when sweeping up or down
+CURRENTS = np.concatenate([np.arange(-10, 11), np.arange(9, -11, -1)] * 2)
+HYSTERESIS = 0.01
+
+
+@pytest.fixture
+def magnet(tmp_path):
+    steps = np.sign(np.diff(CURRENTS, prepend=-11))
+    fields = 0.1 * CURRENTS - HYSTERESIS * steps
+
+    file = tmp_path / "calibration.txt"
+    with open(file, "w") as f:
+        f.write("#Data:\nTimestamp (s),Current (A),Field (T)\n")
+        f.writelines(f"{idx},{current},{field}\n"
+                     for idx, (current, field) in enumerate(zip(CURRENTS, fields)))
+
+    # Bypass the communication with the instruments
+    instr = MagnetOutOfPlane.__new__(MagnetOutOfPlane)
+    MagnetBase.__init__(instr, calibration_type="file", calibration_source=file)
+    instr._set_current = lambda current, **kwargs: current
+    return instr
+
+
+def test_branches(magnet):
+    branches = magnet.calibration["branches"]
+    assert branches[+1][1](0.19) == pytest.approx(2.)
+    assert branches[-1][1](0.21) == pytest.approx(2.)
+
+    # Both branches are valid within the range of the calibration
+    assert magnet.calibration["min_field"] == pytest.approx(-0.99)
+    assert magnet.calibration["max_field"] == pytest.approx(+0.99)
+
+
+def test_branch_follows_the_applied_current(magnet):
+    # Without history, the averaged calibration is used
+    assert magnet.set_field(0.2)[1] == pytest.approx(2.)
+
+    # Increasing the current
+    assert magnet.set_field(0.39)[1] == pytest.approx(4.)
+    assert magnet.current_direction == +1
+
+    # Decreasing the current
+    assert magnet.set_field(0.21)[1] == pytest.approx(2.)
+    assert magnet.current_direction == -1
+
+    # The direction is kept if the current does not change
+    assert magnet._field_to_current(0.21) == pytest.approx(2.)
+
+
+def test_branch_for_sweeps(magnet):
+    magnet.set_field(0.)
+    magnet.set_field(0.49)
+
+    fields = np.array([0.49, 0.59, 0.69, 0.61, 0.51])
+    np.testing.assert_allclose(magnet._field_to_current(fields), [5., 6., 7., 6., 5.])
+
+
+def test_without_direction_information(tmp_path):
+    # A single (sorted) scan has no branch for decreasing currents
+    file = tmp_path / "calibration.txt"
+    with open(file, "w") as f:
+        f.write("Current (A),Field (T)\n")
+        f.writelines(f"{current},{0.1 * current}\n" for current in range(-10, 11))
+
+    instr = MagnetOutOfPlane.__new__(MagnetOutOfPlane)
+    MagnetBase.__init__(instr, calibration_type="file", calibration_source=file)
+    assert instr.calibration["branches"] is None
+    assert instr._field_to_current(0.5) == pytest.approx(5.)
+
+
+@pytest.fixture
+def feedback_calibration(tmp_path, monkeypatch):
+    # The running field offsets are kept over all instances
+    monkeypatch.setattr(MagnetBase, "_field_offsets", {})
+
+    file = tmp_path / "calibration.txt"
+    with open(file, "w") as f:
+        f.write("Current (A),Field (T)\n")
+        f.writelines(f"{current},{0.1 * current}\n" for current in range(-10, 11))
+    return file
+
+
+def new_feedback_magnet(file):
+    instr = MagnetOutOfPlane.__new__(MagnetOutOfPlane)
+    MagnetBase.__init__(instr, calibration_type="file", calibration_source=file)
+    instr._set_current = lambda current, **kwargs: current
+
+    # The actual field deviates 5 mT from the calibration
+    instr.wait_for_stable_field = lambda **kwargs: 0.1 * instr.applied_current + 0.005
+    return instr
+
+
+@pytest.fixture
+def feedback_magnet(feedback_calibration):
+    return new_feedback_magnet(feedback_calibration)
+
+
+def test_closed_loop(feedback_magnet):
+    field, current, measured = feedback_magnet.set_field_closed_loop(0.3)
+    assert field == 0.3
+    assert current == pytest.approx(2.95)
+    assert measured == pytest.approx(0.3)
+    assert feedback_magnet.field_offset == pytest.approx(0.0025)
+
+    # The running offset is used for the next field
+    field, current, measured = feedback_magnet.set_field_closed_loop(0.3)
+    assert current == pytest.approx(2.95)
+    assert feedback_magnet.field_offset == pytest.approx(0.00375)
+
+
+def test_closed_loop_offset_kept_over_instances(feedback_calibration):
+    # Every procedure creates a new magnet
+    new_feedback_magnet(feedback_calibration).set_field_closed_loop(0.3)
+
+    magnet = new_feedback_magnet(feedback_calibration)
+    assert magnet.field_offset == pytest.approx(0.0025)
+
+    # The first (feed-forward) step already uses the offset
+    currents = []
+    magnet._set_current = lambda current, **kwargs: currents.append(current) or current
+    magnet.set_field_closed_loop(0.3)
+    assert currents[0] == pytest.approx(2.975)
+
+
+def test_closed_loop_offset_reset_for_new_calibration(feedback_calibration, tmp_path):
+    new_feedback_magnet(feedback_calibration).set_field_closed_loop(0.3)
+
+    other_file = tmp_path / "other_calibration.txt"
+    other_file.write_text(feedback_calibration.read_text())
+    assert new_feedback_magnet(other_file).field_offset == 0.
+    assert new_feedback_magnet(feedback_calibration).field_offset == 0.
+
+
+def test_closed_loop_limited_steps(feedback_magnet):
+    feedback_magnet.max_current_step = 0.01
+    field, current, measured = feedback_magnet.set_field_closed_loop(0.3, max_corrections=3)
+    assert current == pytest.approx(2.97)
+    assert measured == pytest.approx(0.302)
+
+
+def test_closed_loop_field_regulated(feedback_magnet):
+    feedback_magnet.regulates_field = True
+    feedback_magnet.set_field = lambda field, **kwargs: (field, None)
+    feedback_magnet.wait_for_stable_field = lambda **kwargs: 0.301
+
+    field, current, measured = feedback_magnet.set_field_closed_loop(0.3)
+    assert (field, current, measured) == (0.3, None, 0.301)
+    assert feedback_magnet.field_offset == 0.
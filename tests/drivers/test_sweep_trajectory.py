@@ -0,0 +1,127 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+import numpy as np
+import pytest
+
+from spynwave.drivers import MagnetBase, MagnetInPlane
+from spynwave.drivers.sweep_trajectory import SweepTrajectory
+
+
+def test_linear():
+    values, interval = SweepTrajectory.linear(0., 1., ramp_rate=2., update_delay=0.1)
+    np.testing.assert_allclose(values, np.linspace(0, 1, 6))
+    assert interval == pytest.approx(0.1)
+
+    # The interval is shortened such that the sweep duration is exact
+    values, interval = SweepTrajectory.linear(0., 1., ramp_rate=3., update_delay=0.1)
+    assert SweepTrajectory(values, interval=interval).duration == pytest.approx(1 / 3)
+    assert interval <= 0.1
+
+
+def test_polarity_switches():
+    trajectory = SweepTrajectory([-1., -2.], [-0.2, -0.1])
+    assert trajectory.polarity_switches.size == 0
+
+    trajectory = SweepTrajectory(np.arange(5), [-0.2, -0.1, 0., 0.1, -0.1])
+    np.testing.assert_array_equal(trajectory.magnitudes, [0.2, 0.1, 0., 0.1, 0.1])
+    np.testing.assert_array_equal(trajectory.polarities, [-1, -1, 1, 1, -1])
+    np.testing.assert_array_equal(trajectory.polarity_switches, [2, 4])
+
+
+def test_check_step_size():
+    trajectory = SweepTrajectory([0., 0.1, 0.3])
+    trajectory.check_step_size(0.2)
+
+    with pytest.raises(ValueError):
+        trajectory.check_step_size(0.15)
+    with pytest.raises(ValueError):
+        trajectory.check_step_size(0.2, initial=0.5)
+
+
+def test_invalid_setpoints():
+    with pytest.raises(ValueError):
+        SweepTrajectory([0., 1.], [0., 1., 2.])
+
+
+def test_execute():
+    trajectory = SweepTrajectory([1., 2., 3., 4.], [10., 20., 30., 40.], interval=0)
+    written, values = [], []
+    trajectory.execute(
+        lambda idx, setpoint: written.append((idx, setpoint)),
+        should_stop=lambda: len(values) >= 3,
+        callback_fn=values.append,
+    )
+
+    assert written == [(0, 10.), (1, 20.), (2, 30.)]
+    assert values == [1., 2., 3.]
+
+
+class FakeClock:
+    """ Clock that only advances when sleeping or when work is done. """
+
+    def __init__(self):
+        self.now = 0.
+
+    def time(self):
+        return self.now
+
+    def sleep(self, duration):
+        self.now += duration
+
+
+def test_execute_overrun_does_not_exceed_ramp_rate():
+    clock = FakeClock()
+    trajectory = SweepTrajectory(np.linspace(0, 1, 11), interval=0.1)
+
+    write_times = []
+
+    def write_fn(idx, setpoint):
+        write_times.append(clock.now)
+        if idx == 3:
+            clock.now += 0.45  # E.g. switching the polarity of the magnet
+
+    trajectory.execute(write_fn, sleep_fn=clock.sleep, time_fn=clock.time)
+
+    assert len(write_times) == 11
+    assert np.diff(write_times).min() >= 0.1 - 1e-9
+
+
+def test_execute_does_not_skip_steps():
+    with pytest.raises(ValueError):
+        SweepTrajectory([0., 1.]).execute(lambda idx, setpoint: None, policy="skip")
+
+
+@pytest.fixture
+def magnet():
+    # Bypass the communication with the instruments
+    instr = MagnetInPlane.__new__(MagnetInPlane)
+    MagnetBase.__init__(instr, calibration_type=None)
+    instr.max_current_step = 1.
+    instr.last_current = 0.
+    return instr
+
+
+def test_plan_field_sweep(magnet):
+    trajectory = magnet.plan_field_sweep(0., 0.01, ramp_rate=0.01, update_delay=0.1)
+
+    assert len(trajectory) == 11
+    np.testing.assert_allclose(trajectory.setpoints, magnet._field_to_current(trajectory.values))
+
+
+def test_plan_field_sweep_mirrored(magnet):
+    magnet.mirror_fields = True
+    trajectory = magnet.plan_field_sweep(0.01, 0.02, ramp_rate=0.01, update_delay=0.1)
+
+    np.testing.assert_allclose(trajectory.values, np.linspace(0.01, 0.02, 11))
+    np.testing.assert_allclose(trajectory.setpoints, magnet._field_to_current(-trajectory.values))
+
+
+def test_plan_field_sweep_fails_fast(magnet):
+    with pytest.raises(ValueError):  # Out of bounds
+        magnet.plan_field_sweep(0., 2 * magnet.calibration["max_field"], ramp_rate=1.)
+
+    magnet.max_current_step = 1e-6
+    with pytest.raises(ValueError):  # Steps too large
+        magnet.plan_field_sweep(0., 0.01, ramp_rate=0.01)
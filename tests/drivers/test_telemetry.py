@@ -0,0 +1,72 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+import numpy as np
+import pytest
+
+from pymeasure.experiment import Procedure, Results, FloatParameter
+
+from spynwave.drivers.instrument_thread import InstrumentThread
+from spynwave.drivers.telemetry import ThreadTelemetry, format_telemetry, store_telemetry_summary
+
+
+def test_empty_snapshot():
+    metrics = ThreadTelemetry().snapshot()
+    assert metrics["samples"] == 0
+    assert np.isnan(metrics["samples/s"])
+    assert np.isnan(metrics["p99 loop latency (s)"])
+    assert format_telemetry(metrics) == "samples: 0"
+
+
+def test_snapshot():
+    telemetry = ThreadTelemetry(window=100)
+    for latency in np.linspace(0, 1, 101):
+        telemetry.record_loop_latency(latency)
+    telemetry.record_merge_lag(0.5)
+
+    metrics = telemetry.snapshot()
+    # Only the last 100 latencies are used
+    assert metrics["mean loop latency (s)"] == pytest.approx(0.505)
+    assert metrics["p99 loop latency (s)"] == pytest.approx(0.9901)
+    assert metrics["merge lag (s)"] == 0.5
+
+
+def test_instrument_thread_telemetry():
+    thread = InstrumentThread(None, None, max_queue_size=2, queue_policy="drop-newest")
+    thread.put_datapoint({"a": 0}, acquisition_window=(0., 0.2))
+    thread.put_datapoints([1., 2.], {"a": [1, 2]})
+    thread.put_datapoint({"a": 3})
+
+    metrics = thread.telemetry_snapshot()
+    assert metrics["samples"] == 4
+    assert metrics["samples/s"] > 0
+    assert metrics["mean acquisition latency (s)"] == pytest.approx(0.2)
+    assert metrics["mean put interval (s)"] >= 0
+    # The loop of a producer is not timed, only the interval between the puts
+    assert np.isnan(metrics["mean loop latency (s)"])
+    assert metrics["queue size"] == 2
+    assert metrics["dropped samples"] == 1
+
+
+class TelemetryProcedure(Procedure):
+    x = FloatParameter("X", default=1.)
+    DATA_COLUMNS = ["a"]
+
+
+def test_store_telemetry_summary(tmp_path):
+    filename = tmp_path / "data.csv"
+    results = Results(TelemetryProcedure(), str(filename))
+    with open(filename, "a") as f:
+        f.write("1.0\n")
+
+    store_telemetry_summary(results, {"DataThread": {"samples": 1, "merge lag (s)": np.nan}})
+
+    lines = filename.read_text().splitlines()
+    assert lines[results._header_count - 3:results._header_count] == \
+        ["#Telemetry:", "#\tDataThread samples: 1", "#Data:"]
+    assert lines[-1] == "1.0"
+
+    # The data-file can still be loaded
+    loaded = Results.load(str(filename), TelemetryProcedure)
+    assert loaded.data["a"].tolist() == [1.0]
@@ -0,0 +1,307 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+import struct
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import nidaqmx.constants
+
+import numpy as np
+import pytest
+from pymeasure.test import expected_protocol
+from pyvisa import VisaIOError
+from pyvisa.constants import VI_ERROR_TMO
+
+from spynwave.drivers import vna as vna_module
+from spynwave.drivers.vna import VNA, OSC_DTYPE, decode_osc_headerless, frequency_segments
+from spynwave.pymeasure_patches.anritsuMS4644B import AnritsuMS4644B
+
+S_PARAMETERS = {
+    "S11": (0.125, -0.5),
+    "S21": (1e-3, 2.5e-4),
+    "S12": (-7.75, 3.0),
+    "S22": (0., -1e-12),
+}
+
+# Output as it is returned by the VNA: two big-endian doubles and a separator per S-parameter
+RAW_2_PORT = b"".join(struct.pack(">dd", *values) + b"," for values in S_PARAMETERS.values())
+RAW_S22 = struct.pack(">dd", *S_PARAMETERS["S22"]) + b"\n"
+
+
+def expected_data(params):
+    data = {}
+    for param in params:
+        data[param + " real"], data[param + " imag"] = S_PARAMETERS[param]
+    return data
+
+
+def test_osc_dtype_itemsize():
+    assert OSC_DTYPE.itemsize == 17
+
+
+def test_decode_osc_headerless():
+    params = list(S_PARAMETERS)
+    assert decode_osc_headerless(RAW_2_PORT, params) == expected_data(params)
+    assert decode_osc_headerless(RAW_S22, ["S22"]) == expected_data(["S22"])
+
+
+def test_decode_osc_headerless_too_short():
+    with pytest.raises(ValueError):
+        decode_osc_headerless(RAW_2_PORT[:-20], list(S_PARAMETERS))
+
+
+@pytest.mark.parametrize("port, raw, params", [
+    ("2-port", RAW_2_PORT, ["S11", "S21", "S12", "S22"]),
+    ("1-port: S22", RAW_S22, ["S22"]),
+])
+def test_grab_data_osc_headerless(port, raw, params):
+    vna = VNA.__new__(VNA)
+    vna.vectorstar = MagicMock()
+    vna.vectorstar.read_bytes.return_value = raw
+    vna.cached_measurement_port = port
+
+    assert vna.grab_data(CW_mode=True, headerless=True) == expected_data(params)
+    vna.vectorstar.write.assert_called_once_with(";".join(f"O{p}C" for p in params))
+    vna.vectorstar.read_bytes.assert_called_once_with(len(raw))
+
+
+def binary_block(values):
+    data = np.asarray(values, dtype=">f8").tobytes()
+    length = str(len(data)).encode()
+    return b"#" + str(len(length)).encode() + length + data + b"\n"
+
+
+class FakeVectorstar:
+    """ Replies to the binary data queries with data blocks; read_bytes reads from the reply. """
+
+    def __init__(self, frequencies, traces):
+        self.replies = {":SENS1:FREQ:DATA?": binary_block(frequencies)}
+        for trace, values in enumerate(traces, start=1):
+            self.replies[f":CALC1:PAR{trace}:DATA:SDAT?"] = binary_block(values)
+
+        self.buffer = b""
+        self.commands = []
+        self.check_errors = MagicMock()
+        self.clear = MagicMock()
+
+    def write(self, command):
+        self.commands.append(command)
+        self.buffer += self.replies.get(command, b"")
+
+    def read_bytes(self, count):
+        if not self.buffer:
+            raise VisaIOError(VI_ERROR_TMO)
+        data, self.buffer = self.buffer[:count], self.buffer[count:]
+        return data
+
+
+def sweep_vna(port, number_of_traces, number_of_points=5):
+    frequencies = np.linspace(1e9, 2e9, number_of_points)
+    traces = [np.arange(2 * number_of_points) + 100 * trace for trace in range(number_of_traces)]
+
+    vna = VNA.__new__(VNA)
+    vna.vectorstar = FakeVectorstar(frequencies, traces)
+    vna.cached_measurement_port = port
+    return vna, frequencies, traces
+
+
+@pytest.mark.parametrize("port, params", [
+    ("2-port", ["S11", "S12", "S21", "S22"]),
+    ("1-port: S11", ["S11"]),
+])
+def test_grab_data_binary(port, params):
+    vna, frequencies, traces = sweep_vna(port, len(params))
+
+    data = vna.grab_data(CW_mode=False)
+    np.testing.assert_array_equal(data["Frequency (Hz)"], frequencies)
+    for param, values in zip(params, traces):
+        np.testing.assert_array_equal(data[param + " real"], values[0::2])
+        np.testing.assert_array_equal(data[param + " imag"], values[1::2])
+
+    # The frequencies are only transferred once
+    vna.grab_data(CW_mode=False)
+    assert vna.vectorstar.commands.count(":SENS1:FREQ:DATA?") == 1
+
+
+def test_grab_data_binary_falls_back_to_ascii():
+    vna, _, _ = sweep_vna("2-port", 1)
+    vna.grab_data_S2P = MagicMock(return_value="ascii")
+
+    # Only a single trace is available, where four are expected
+    assert vna.grab_data(CW_mode=False) == "ascii"
+    assert not vna.binary_sweep_transfer
+
+    vna.grab_data(CW_mode=False)
+    assert vna.grab_data_S2P.call_count == 2
+
+
+def test_grab_data_cw_buffer():
+    vna, _, traces = sweep_vna("2-port", 4, number_of_points=5)
+    vna.cw_number_of_points = 5
+
+    data = vna.grab_data(CW_mode=True, headerless=True)
+    np.testing.assert_array_equal(data["S21 real"], traces[2][0::2])
+    np.testing.assert_array_equal(data["S21 imag"], traces[2][1::2])
+    assert ":SENS1:FREQ:DATA?" not in vna.vectorstar.commands
+
+
+def test_cw_point_timestamps():
+    vna = VNA.__new__(VNA)
+    vna.cw_number_of_points = 4
+    vna.cw_point_duration = 0.01
+
+    np.testing.assert_allclose(vna.cw_point_timestamps(10., 11.), [10.005, 10.015, 10.025, 10.035])
+
+    # The points cannot be later than the detected end of the measurement
+    np.testing.assert_allclose(vna.cw_point_timestamps(10., 10.02),
+                               [10.0025, 10.0075, 10.0125, 10.0175])
+
+
+def test_trigger_measurement_with_pulse_task():
+    vna = VNA.__new__(VNA)
+    vna.use_DAQmx = True
+    vna.pulse_task = MagicMock()
+    vna.counter_task = MagicMock()
+    vna.counter_task.read.return_value = 3
+
+    vna.trigger_measurement()
+    assert vna.counter_task_reference == 3
+    assert [c[0] for c in vna.pulse_task.method_calls] == ["stop", "start"]
+    assert vna.trigger_time is not None
+
+
+class StubChannels:
+    def __init__(self):
+        self.added = []
+
+    def _add(self, kind, counter, **kwargs):
+        channel = SimpleNamespace(kind=kind, counter=counter, **kwargs)
+        self.added.append(channel)
+        return channel
+
+    def add_ci_count_edges_chan(self, counter, **kwargs):
+        return self._add("ci count edges", counter, **kwargs)
+
+    def add_co_pulse_chan_freq(self, counter, **kwargs):
+        return self._add("co pulse freq", counter, **kwargs)
+
+    def add_co_pulse_chan_time(self, counter, **kwargs):
+        return self._add("co pulse time", counter, **kwargs)
+
+
+class StubTask:
+    """ Minimal stand-in for nidaqmx.Task; read returns (and removes) the samples in the buffer. """
+
+    def __init__(self, name):
+        self.name = name
+        self.ci_channels = StubChannels()
+        self.co_channels = StubChannels()
+        self.timing = MagicMock()
+        self.running = False
+        self.closed = False
+        self.buffer = []
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        self.closed = True
+
+    def read(self, number_of_samples_per_channel=None):
+        samples, self.buffer = self.buffer, []
+        return samples
+
+
+@pytest.fixture
+def stub_nidaqmx(monkeypatch):
+    monkeypatch.setattr(vna_module, "nidaqmx",
+                        SimpleNamespace(Task=StubTask, constants=nidaqmx.constants))
+
+    daqmx_config = dict(vna_module.config["vna"]["daqmx"])
+    daqmx_config.update({
+        "counter channel": "Dev1/ctr0",
+        "counter edge": "/Dev1/PFI0",
+        "trigger pulse counter": "Dev1/ctr1",
+        "trigger pulse terminal": "/Dev1/PFI13",
+    })
+    monkeypatch.setitem(vna_module.config["vna"], "daqmx", daqmx_config)
+
+
+def test_free_running(stub_nidaqmx):
+    vna = VNA.__new__(VNA)
+    vna.use_DAQmx = True
+    vna.counter_task = StubTask("Counter task")
+    counter_task = vna.counter_task
+
+    vna.start_free_running(rate=500)
+    assert counter_task.closed
+    assert vna.pulse_train_task.running and vna.timestamp_task.running
+
+    pulse_channel = vna.pulse_train_task.co_channels.added[0]
+    assert pulse_channel.counter == "Dev1/ctr1" and pulse_channel.freq == 500
+    assert pulse_channel.co_pulse_term == "/Dev1/PFI13"
+
+    timestamp_channel = vna.timestamp_task.ci_channels.added[0]
+    assert timestamp_channel.ci_count_edges_term == "/Dev1/100kHzTimebase"
+    assert vna.timestamp_task.timing.cfg_samp_clk_timing.call_args.kwargs["source"] == \
+        "/Dev1/PFI0"
+
+    # The timestamps are read in blocks and the 32-bit counter is unwrapped
+    reference = vna._timestamp_reference
+    vna.timestamp_task.buffer = [200, 2 ** 32 - 100]
+    np.testing.assert_allclose(vna.read_completed_timestamps() - reference,
+                               [2e-3, (2 ** 32 - 100) / 1e5], atol=1e-6)
+    assert vna.read_completed_timestamps().size == 0
+    vna.timestamp_task.buffer = [100, 300]
+    np.testing.assert_allclose(vna.read_completed_timestamps() - reference,
+                               np.array([2 ** 32 + 100, 2 ** 32 + 300]) / 1e5, atol=1e-6)
+
+    pulse_train_task = vna.pulse_train_task
+    vna.stop_free_running()
+    assert pulse_train_task.closed
+    assert vna.pulse_task is not None and vna.counter_task.running
+
+
+def test_frequency_segments():
+    segments = frequency_segments(1e9, 10e9, 1e9, 4.5e9, 5.5e9, 0.1e9)
+    assert segments == pytest.approx([(1e9, 4e9, 4), (4.5e9, 5.5e9, 11), (6.5e9, 9.5e9, 4)])
+
+    # The dense segment is limited to the frequency sweep
+    segments = frequency_segments(1e9, 10e9, 1e9, 0, 2e9, 0.5e9)
+    assert segments == pytest.approx([(1e9, 2e9, 3), (3e9, 10e9, 8)])
+
+    with pytest.raises(ValueError):
+        frequency_segments(1e9, 10e9, 1e9, 11e9, 12e9, 0.1e9)
+
+
+def test_prepare_segmented_frequency_sweep():
+    segments = [(1e9, 4e9, 4), (4.5e9, 5.5e9, 11), (6.5e9, 9.5e9, 4)]
+
+    settings = []
+    for idx, (start, stop, points) in enumerate(segments, start=1):
+        settings += [f":SENS1:FSEGM{idx}:FREQ:STAR {start:g}",
+                     f":SENS1:FSEGM{idx}:FREQ:STOP {stop:g}",
+                     f":SENS1:FSEGM{idx}:SWE:POIN {points}",
+                     f":SENS1:FSEGM{idx}:STAT 1"]
+    settings += [":SENS1:SWE:TYP FSEGM", ":TRIG:SOUR AUTO"]
+
+    with expected_protocol(
+        AnritsuMS4644B,
+        [(":SENS1:SWE:CW 0", None),
+         (":SENS1:FSEGM:COUN?", "1"),
+         (":SENS1:FSEGM:ADD", None),
+         (":SENS1:FSEGM:ADD", None),
+         (";".join(settings), None),
+         ("SYST:ERR?", "No Error")],
+    ) as instr:
+        vna = VNA.__new__(VNA)
+        vna.vectorstar = instr
+        vna.prepare_segmented_frequency_sweep(segments)
+
+    np.testing.assert_allclose(vna.cached_frequencies,
+                               np.concatenate([np.linspace(*segment) for segment in segments]))
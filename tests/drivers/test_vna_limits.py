@@ -0,0 +1,81 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+from types import SimpleNamespace
+
+from spynwave.drivers.vna_limits import (
+    load_cached_vna_limits, query_vna_limits, store_vna_limits
+)
+
+LIMITS = {
+    "frequency_min": 7e7,
+    "frequency_max": 3.5e10,
+    "frequency_points": 100000,
+    "frequency_cw": 1e10,
+    "bandwidth": 100.,
+    "power_level": -5.,
+}
+
+
+class FakeChannel:
+    """ Behaves as a VNA-channel that limits the frequency range to the calibration. """
+    FREQUENCY_RANGE = [1e7, 4e10]
+
+    def __init__(self):
+        self.cw_mode_enabled = True
+        self.frequency_CW = 1e10
+        self.number_of_points = 201
+        self._frequency_start = 1e9
+        self._frequency_stop = 2e9
+        self.bandwidth = 100.
+        self.pt_1 = SimpleNamespace(power_level=-5.)
+
+    @property
+    def frequency_start(self):
+        return self._frequency_start
+
+    @frequency_start.setter
+    def frequency_start(self, value):
+        self._frequency_start = max(value, 7e7)
+
+    @property
+    def frequency_stop(self):
+        return self._frequency_stop
+
+    @frequency_stop.setter
+    def frequency_stop(self, value):
+        self._frequency_stop = min(value, 3.5e10)
+
+
+def test_query_vna_limits():
+    vectorstar = SimpleNamespace(ch_1=FakeChannel())
+    assert query_vna_limits(vectorstar) == LIMITS
+
+    # The original settings are restored
+    channel = vectorstar.ch_1
+    assert channel.cw_mode_enabled
+    assert channel.number_of_points == 201
+    assert (channel.frequency_start, channel.frequency_stop) == (1e9, 2e9)
+
+
+def test_vna_limits_cache(tmp_path):
+    filename = tmp_path / "spynwave" / "vna_limits.yaml"
+    assert load_cached_vna_limits(filename) is None
+
+    store_vna_limits("Anritsu,MS4644B,1", LIMITS, filename)
+    store_vna_limits("Anritsu,MS4644B,2", dict(LIMITS, frequency_max=4e10), filename)
+    assert load_cached_vna_limits(filename) == ("Anritsu,MS4644B,2",
+                                                dict(LIMITS, frequency_max=4e10))
+
+    store_vna_limits("Anritsu,MS4644B,1", LIMITS, filename)
+    assert load_cached_vna_limits(filename) == ("Anritsu,MS4644B,1", LIMITS)
+
+
+def test_vna_limits_cache_corrupt(tmp_path):
+    filename = tmp_path / "vna_limits.yaml"
+    filename.write_text("not: [valid")
+    assert load_cached_vna_limits(filename) is None
+
+    store_vna_limits("Anritsu,MS4644B,1", LIMITS, filename)
+    assert load_cached_vna_limits(filename) == ("Anritsu,MS4644B,1", LIMITS)
@@ -0,0 +1,125 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+from time import sleep, time
+
+import numpy as np
+import pytest
+
+from spynwave.clock import clock
+from spynwave.procedures.threads import VNAControlThread
+
+
+class FakeVNA:
+    """ Records the order of triggers and readouts; each measurement is done measurement_duration
+    after it is triggered. """
+    cw_number_of_points = 1
+    measurement_duration = 0.01
+
+    def __init__(self, read_durations=()):
+        self.events = []
+        self.trigger_time = None
+        self.read_durations = list(read_durations)
+
+    def trigger_measurement(self):
+        self.events.append("trigger")
+        self.trigger_time = clock.time()
+
+    def measurement_done(self):
+        return self.trigger_time is not None and \
+            clock.time() - self.trigger_time >= self.measurement_duration
+
+    def grab_data(self, CW_mode=False, headerless=False):
+        self.events.append("read")
+        if self.read_durations:
+            sleep(self.read_durations.pop(0))
+        return {"S11 real": 1., "S11 imag": 0.}
+
+
+def run_briefly(thread, duration=0.05):
+    thread.start()
+    sleep(duration)
+    thread.stop()
+
+    start = time()
+    while thread.is_alive() and time() - start < 1:
+        sleep(0.001)
+    assert not thread.is_alive()
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_vna_control_thread_trigger_order(pipelined):
+    vna = FakeVNA()
+    thread = VNAControlThread(None, vna, delay=0.001, pipelined=pipelined)
+    run_briefly(thread, duration=0.1)
+
+    if pipelined:
+        # The next measurement is triggered before the data of the previous one is read
+        assert vna.events[:5] == ["trigger", "trigger", "read", "trigger", "read"]
+    else:
+        assert vna.events[:4] == ["trigger", "read", "trigger", "read"]
+
+    # The data of the first measurement is discarded
+    number_of_reads = vna.events.count("read")
+    assert number_of_reads > 2
+    assert thread.data_queue.qsize() == number_of_reads - 1
+
+
+def test_vna_control_thread_pipelined_completed_during_readout():
+    # The second readout is slower than a measurement, such that the next measurement completes
+    # during the readout
+    vna = FakeVNA(read_durations=[0, 3 * FakeVNA.measurement_duration])
+    thread = VNAControlThread(None, vna, delay=0.001, pipelined=True)
+    run_briefly(thread, duration=0.15)
+
+    assert vna.events[:7] == ["trigger", "trigger", "read", "trigger", "read", "trigger", "read"]
+
+    # The data of the first measurement and the ambiguous data are discarded
+    number_of_reads = vna.events.count("read")
+    assert number_of_reads > 3
+    assert thread.dropped_samples == 1
+    assert thread.data_queue.qsize() == number_of_reads - 2
+
+
+class FreeRunningVNA(FakeVNA):
+    cw_point_duration = 0.01
+
+    def __init__(self, done_times):
+        super().__init__()
+        self.done_times = list(done_times)
+
+    def start_free_running(self, rate):
+        self.events.append(f"start {rate}")
+
+    def stop_free_running(self):
+        self.events.append("stop")
+
+    def read_completed_timestamps(self):
+        return np.array(self.done_times.pop(0) if self.done_times else [])
+
+
+def test_vna_control_thread_free_running():
+    # The timestamps are read before and after every readout of the data
+    vna = FreeRunningVNA([[1.], [], [], [2., 3., 4.], []])
+    thread = VNAControlThread(None, vna, delay=0.001, free_running_rate=100)
+    run_briefly(thread)
+
+    assert vna.events == ["start 100", "read", "read", "stop"]
+    assert "trigger" not in vna.events
+
+    # Timestamped at the middle of the measurement that ends at the hardware timestamp
+    assert [t for t, _ in thread.get_datapoints()] == pytest.approx([0.995, 3.995])
+    assert thread.dropped_samples == 2
+
+
+def test_vna_control_thread_free_running_completed_during_readout():
+    # Measurement 2 completes while the data of measurement 1 is read
+    vna = FreeRunningVNA([[1.], [2.], [], []])
+    thread = VNAControlThread(None, vna, delay=0.001, free_running_rate=100)
+    run_briefly(thread)
+
+    assert vna.events == ["start 100", "read", "read", "stop"]
+    # The ambiguous data is discarded; the next readout is paired with measurement 2
+    assert [t for t, _ in thread.get_datapoints()] == pytest.approx([1.995])
+    assert thread.dropped_samples == 1
@@ -2,12 +2,13 @@
 This file is part of the SpynWave package.
 """
 
-# import pytest
-
+import pytest
 
+from pymeasure.adapters import ProtocolAdapter
 from pymeasure.test import expected_protocol
 
 from spynwave.pymeasure_patches.anritsuMS4644B import AnritsuMS4644B
+from spynwave.pymeasure_patches.pymeasure_prs.common_base import CommonBase, ReservedName
 
 
 def test_init():
@@ -49,3 +50,120 @@ def test_channel_trace_measurement_parameter():
     ) as instr:
         instr.ch_6.tr_1.measurement_parameter = "S11"
         assert instr.ch_2.tr_6.measurement_parameter == "S21"
+
+
+def test_unchanged_settings_are_not_written():
+    with expected_protocol(
+        AnritsuMS4644B,
+        [(":SENS1:BWID 10", None),
+         (":SENS1:BWID 100", None),
+         ("FDH1", None),
+         (":SENS1:FREQ:STAR 1e+09", None),
+         (":SENS1:FREQ:STAR 1e+09", None),
+         ("*RST", None),
+         (":SENS1:BWID 100", None)],
+    ) as instr:
+        instr.ch_1.bandwidth = 10
+        instr.ch_1.bandwidth = 100
+        instr.ch_1.bandwidth = 100
+        instr.datablock_header_format = 1
+        instr.datablock_header_format = 1
+        # The frequency range is not cached, as it depends on other settings
+        instr.ch_1.frequency_start = 1e9
+        instr.ch_1.frequency_start = 1e9
+        # Resetting the instrument invalidates the cache
+        instr.reset()
+        instr.ch_1.bandwidth = 100
+
+
+def test_settings_cache_shared_per_resource(monkeypatch):
+    monkeypatch.setattr(AnritsuMS4644B, "_settings_caches", {})
+
+    def connect(comm_pairs, resource_name="GPIB0::6::INSTR"):
+        adapter = ProtocolAdapter(comm_pairs)
+        adapter.resource_name = resource_name
+        return AnritsuMS4644B(adapter), adapter
+
+    instr, adapter = connect([(":SENS1:BWID 100", None)])
+    instr.ch_1.bandwidth = 100
+    assert adapter._index == 1
+
+    # A new instance for the same instrument keeps the cache; clearing the status does not
+    # invalidate the cache
+    instr, adapter = connect([("*CLS", None), ("*RST", None), (":SENS1:BWID 100", None)])
+    instr.clear()
+    instr.ch_1.bandwidth = 100
+    instr.reset()
+    instr.ch_1.bandwidth = 100
+    assert adapter._index == 3
+
+    # Other instruments have their own cache
+    instr, adapter = connect([(":SENS1:BWID 100", None)], resource_name="GPIB0::7::INSTR")
+    instr.ch_1.bandwidth = 100
+    assert adapter._index == 1
+
+
+def test_batch_settings():
+    with expected_protocol(
+        AnritsuMS4644B,
+        [(":TRIG:SOUR EXT;:SENS1:AVER:COUN 4;:SENS1:SWE:POIN 11", None),
+         (":SENS1:BWID?", "10"),
+         (":CALC1:PAR1:DEF S21", None),
+         ("SYST:ERR?", "No Error")],
+    ) as instr:
+        with instr.batch_settings():
+            instr.trigger_source = "EXT"
+            instr.ch_1.average_count = 4
+            instr.ch_1.number_of_points = 11
+            assert instr.check_errors() == []
+            # A query writes the queued settings first
+            assert instr.ch_1.bandwidth == 10
+            instr.ch_1.tr_1.measurement_parameter = "S21"
+            instr.trigger_source = "EXT"
+
+
+def test_batch_passes_through_the_settings_cache():
+    with expected_protocol(
+        AnritsuMS4644B,
+        [(":SENS1:BWID 10", None),
+         (":SENS1:BWID 100;:SENS1:AVER:COUN 4", None),
+         ("SYST:ERR?", "No Error"),
+         (":SENS1:BWID 10", None)],
+    ) as instr:
+        instr.ch_1.bandwidth = 10
+        with instr.batch():
+            instr.ch_1.bandwidth = 100
+            instr.ch_1.average_count = 4
+        instr.ch_1.bandwidth = 10
+
+
+def test_channel_batch_check_errors():
+    with expected_protocol(
+        AnritsuMS4644B,
+        [(":TRIG:SOUR EXT;:SENS1:AVER:COUN 4", None),
+         ("SYST:ERR?", "No Error")],
+    ) as instr:
+        with instr.ch_1.batch(check_errors=True):
+            instr.trigger_source = "EXT"
+            instr.ch_1.average_count = 4
+
+
+@pytest.mark.skipif(not issubclass(AnritsuMS4644B, CommonBase),
+                    reason="Only applies to the packaged pymeasure code")
+def test_channel_attribute_access_without_special_name_check():
+    # Accessing attributes of (nested) channels should not check for the special names of dynamic
+    # properties on every access (which made the access ~50 times slower); the special names are
+    # resolved once per class into ReservedName descriptors instead.
+    with expected_protocol(AnritsuMS4644B, []) as instr:
+        channel = instr.ch_1
+        channel_class = type(channel)
+
+        for cls in (type(instr), channel_class, type(channel.tr_1)):
+            assert all("__getattribute__" not in base.__dict__
+                       for base in cls.__mro__ if base is not object)
+
+    class DynamicChannel(channel_class):
+        bandwidth = channel_class.control("BWID?", "BWID %g", "Bandwidth.", dynamic=True)
+
+    assert "bandwidth_values" in DynamicChannel._special_names
+    assert isinstance(DynamicChannel.__dict__["bandwidth_values"], ReservedName)
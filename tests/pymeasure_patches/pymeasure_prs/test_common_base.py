@@ -0,0 +1,117 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+import pytest
+from pymeasure.instruments.validators import strict_range
+from pymeasure.test import expected_protocol
+
+from spynwave.pymeasure_patches.pymeasure_prs import Channel, Instrument
+
+
+class BatchChannel(Channel):
+    current = Channel.control(
+        "CH{ch}:CURR?", "CH{ch}:CURR %g",
+        """ A float property that controls the current of the channel. """,
+    )
+
+
+class BatchInstrument(Instrument):
+    channels = Instrument.ChannelCreator(BatchChannel, ["A", "B"])
+
+    voltage = Instrument.control(
+        "VOLT?", "VOLT %g",
+        """ A float property that controls the voltage. """,
+    )
+
+    frequency = Instrument.setting(
+        "FREQ %g",
+        """ A float property that sets the frequency. """,
+        check_set_errors=True,
+    )
+
+    def __init__(self, adapter, **kwargs):
+        super().__init__(adapter, "Batch instrument", **kwargs)
+
+
+class DynamicInstrument(Instrument):
+    voltage = Instrument.control(
+        "VOLT?", "VOLT %g",
+        """ A float property that controls the voltage. """,
+        validator=strict_range,
+        values=(0, 10),
+        dynamic=True,
+    )
+
+    def __init__(self, adapter, **kwargs):
+        super().__init__(adapter, "Dynamic instrument", **kwargs)
+
+
+class DynamicSubInstrument(DynamicInstrument):
+    voltage_values = (0, 5)
+
+
+def test_batch():
+    with expected_protocol(
+        BatchInstrument,
+        [("VOLT 1;CHA:CURR 0.1;FREQ 10", None),
+         ("CHB:CURR?", "0.2"),
+         ("VOLT 2", None),
+         ("SYST:ERR?", "0,No error")],
+    ) as instr:
+        with instr.ch_A.batch():
+            instr.voltage = 1
+            instr.ch_A.current = 0.1
+            with instr.batch():
+                instr.frequency = 10
+            # A query writes the queued commands first
+            assert instr.ch_B.current == 0.2
+            instr.voltage = 2
+
+
+def test_batch_without_error_check():
+    with expected_protocol(
+        BatchInstrument,
+        [("VOLT 1|CHB:CURR 0.5", None),
+         ("VOLT 2", None)],
+    ) as instr:
+        with instr.batch(separator="|"):
+            instr.voltage = 1
+            instr.ch_B.current = 0.5
+        instr.voltage = 2
+
+
+def test_batch_discarded_on_exception():
+    with expected_protocol(
+        BatchInstrument,
+        [("VOLT 2", None)],
+    ) as instr:
+        with pytest.raises(RuntimeError):
+            with instr.batch(check_errors=True):
+                instr.voltage = 1
+                raise RuntimeError()
+        instr.voltage = 2
+
+
+def test_dynamic_property():
+    with expected_protocol(
+        DynamicSubInstrument,
+        [("VOLT 4", None),
+         ("VOLT 8", None)],
+    ) as instr:
+        assert "voltage_values" in DynamicSubInstrument._special_names
+
+        # Redefined at subclass level
+        instr.voltage = 4
+        with pytest.raises(ValueError):
+            instr.voltage = 8
+
+        # Redefined at instance level
+        instr.voltage_values = (0, 20)
+        instr.voltage = 8
+
+        with pytest.raises(AttributeError):
+            instr.voltage_values
+
+    with expected_protocol(DynamicInstrument, [("VOLT 8", None)]) as instr:
+        instr.voltage = 8
@@ -0,0 +1,27 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+from time import time
+
+from spynwave.clock import Clock
+
+
+def test_clock_is_anchored_to_wall_clock():
+    clock = Clock()
+    assert abs(clock.time() - time()) < 0.1
+
+
+def test_clock_is_monotonic():
+    clock = Clock()
+    timestamps = [clock.time_ns() for _ in range(1000)]
+    assert timestamps == sorted(timestamps)
+
+
+def test_clock_anchor_resets_domain():
+    clock = Clock()
+    clock._wall_clock_ns -= 10**12
+    assert time() - clock.time() > 900
+
+    clock.anchor()
+    assert abs(clock.time() - time()) < 0.1
@@ -0,0 +1,40 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+# The interface requires Qt
+interface = pytest.importorskip("spynwave.interface", exc_type=ImportError)
+
+
+def window(running):
+    return SimpleNamespace(
+        manager=SimpleNamespace(is_running=lambda: running),
+        action_refresh_vna_limits=SimpleNamespace(enabled=None),
+        _vna_limits_worker=None,
+    )
+
+
+def test_vna_limits_not_refreshed_during_measurement(monkeypatch):
+    started = []
+    monkeypatch.setattr(interface, "VNALimitsWorker",
+                        lambda *args, **kwargs: started.append(True))
+
+    instance = window(running=True)
+    interface.PSWSWindow.update_inputs_from_vna(instance)
+
+    assert not started
+    assert instance._vna_limits_worker is None
+
+
+@pytest.mark.parametrize("running", [False, True])
+def test_vna_menu_disabled_during_measurement(running):
+    instance = window(running)
+    instance.action_refresh_vna_limits.setEnabled = \
+        lambda enabled: setattr(instance.action_refresh_vna_limits, "enabled", enabled)
+
+    interface.PSWSWindow._update_vna_menu(instance)
+    assert instance.action_refresh_vna_limits.enabled is not running
@@ -0,0 +1,60 @@
+"""
+This file is part of the SpynWave package.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from spynwave.procedure import PSWSProcedure
+
+
+def procedure(hardware_trigger_available, rf_pipelined=False, rf_free_running_rate=0.):
+    return SimpleNamespace(
+        rf_pipelined=rf_pipelined,
+        rf_free_running_rate=rf_free_running_rate,
+        vna=SimpleNamespace(hardware_trigger_available=hardware_trigger_available),
+    )
+
+
+@pytest.mark.parametrize("hardware_trigger_available", [False, True])
+def test_pipelined_requires_hardware_trigger(hardware_trigger_available):
+    settings = PSWSProcedure.vna_control_settings(
+        procedure(hardware_trigger_available, rf_pipelined=True))
+    assert settings["pipelined"] == hardware_trigger_available
+
+
+def test_free_running_requires_hardware_trigger():
+    with pytest.raises(ValueError):
+        PSWSProcedure.vna_control_settings(procedure(False, rf_free_running_rate=10.))
+
+    settings = PSWSProcedure.vna_control_settings(procedure(True, rf_free_running_rate=10.))
+    assert settings["free_running_rate"] == 10.
+
+
+def frequency_sweep_procedure(**kwargs):
+    procedure = PSWSProcedure()
+    procedure.set_parameters(dict(
+        measurement_type="Frequency sweep",
+        frequency_start=5,
+        frequency_end=15,
+        frequency_step=0.1,
+        frequency_dense_segment=True,
+        frequency_dense_center=30,
+        frequency_dense_span=1,
+    ) | kwargs)
+    return procedure
+
+
+def test_frequency_sweep_estimates_with_invalid_dense_segment():
+    # Falls back to the linear number of points
+    estimate = frequency_sweep_procedure().get_estimates_frequency_sweep()
+    linear_estimate = frequency_sweep_procedure(
+        frequency_dense_segment=False).get_estimates_frequency_sweep()
+    assert estimate == linear_estimate
+
+
+def test_frequency_sweep_startup_with_invalid_dense_segment():
+    procedure = frequency_sweep_procedure()
+    with pytest.raises(ValueError, match="Invalid dense frequency segment"):
+        procedure.startup_frequency_sweep()